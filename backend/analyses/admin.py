@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.http import Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
 from analyses.models import AIInsight, AnalysisRun, LogCluster, LogEvent
+from analyses.profiling import profile_artifact_response
 
 
 @admin.register(AnalysisRun)
@@ -8,6 +12,30 @@ class AnalysisRunAdmin(admin.ModelAdmin):
     list_display = ("id", "source", "status", "created_at", "started_at", "finished_at")
     list_filter = ("status", "created_at")
     search_fields = ("source__name", "source__owner__username")
+    readonly_fields = ("profile_download",)
+
+    @admin.display(description="Profile")
+    def profile_download(self, obj):
+        if not obj.profile_object_key:
+            return "-"
+        url = reverse("admin:analyses_analysisrun_profile", kwargs={"analysis_id": obj.id})
+        return format_html('<a href="{}">Download profile</a>', url)
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:analysis_id>/profile/",
+                self.admin_site.admin_view(self.download_profile),
+                name="analyses_analysisrun_profile",
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_profile(self, request, analysis_id: int):
+        response = profile_artifact_response(analysis_id)
+        if response is None:
+            raise Http404("Profile not found.")
+        return response
 
 
 @admin.register(LogEvent)
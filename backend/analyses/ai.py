@@ -5,6 +5,7 @@ from urllib import error, request
 
 from django.conf import settings
 
+from analyses.perf import DISABLED_PERF_RECORDER, PerfRecorder
 
 logger = logging.getLogger(__name__)
 
@@ -165,7 +166,7 @@ def _build_user_prompt(stats: dict[str, Any], cluster_context: list[dict[str, An
     )
 
 
-def _call_openai_compatible(user_prompt: str) -> dict[str, Any]:
+def _call_openai_compatible(user_prompt: str, perf: PerfRecorder = DISABLED_PERF_RECORDER) -> dict[str, Any]:
     if not settings.LLM_API_KEY:
         raise ValueError("LLM_API_KEY is required for non-mock providers.")
 
@@ -184,9 +185,10 @@ def _call_openai_compatible(user_prompt: str) -> dict[str, Any]:
             {"role": "user", "content": user_prompt},
         ],
     }
+    request_body = json.dumps(body).encode("utf-8")
     req = request.Request(
         settings.LLM_API_URL,
-        data=json.dumps(body).encode("utf-8"),
+        data=request_body,
         headers={
             "Authorization": f"Bearer {settings.LLM_API_KEY}",
             "Content-Type": "application/json",
@@ -195,10 +197,12 @@ def _call_openai_compatible(user_prompt: str) -> dict[str, Any]:
     )
 
     try:
-        with request.urlopen(req, timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS) as response:
-            response_payload = json.loads(response.read().decode("utf-8"))
+        with perf.measure("llm_request", rows=1, byte_count=len(request_body)):
+            with request.urlopen(req, timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS) as response:
+                response_body = response.read()
     except error.URLError as exc:
         raise RuntimeError(f"LLM request failed: {exc}") from exc
+    response_payload = json.loads(response_body.decode("utf-8"))
 
     content = (
         response_payload.get("choices", [{}])[0]
@@ -244,7 +248,11 @@ def _call_mock(stats: dict[str, Any], cluster_context: list[dict[str, Any]]) ->
     return _sanitize_ai_payload(payload)
 
 
-def generate_ai_insight(stats: dict[str, Any], cluster_context: list[dict[str, Any]]) -> dict[str, Any]:
+def generate_ai_insight(
+    stats: dict[str, Any],
+    cluster_context: list[dict[str, Any]],
+    perf: PerfRecorder = DISABLED_PERF_RECORDER,
+) -> dict[str, Any]:
     if not settings.LLM_ENABLED:
         return {
             "executive_summary": "",
@@ -257,7 +265,9 @@ def generate_ai_insight(stats: dict[str, Any], cluster_context: list[dict[str, A
 
     provider = settings.LLM_PROVIDER.strip().lower()
     if provider == "mock":
-        return _call_mock(stats, cluster_context)
+        with perf.measure("llm_request", rows=1):
+            return _call_mock(stats, cluster_context)
 
-    user_prompt = _build_user_prompt(stats, cluster_context)
-    return _call_openai_compatible(user_prompt)
+    with perf.measure("llm_prompt", rows=len(cluster_context)):
+        user_prompt = _build_user_prompt(stats, cluster_context)
+    return _call_openai_compatible(user_prompt, perf)
@@ -1,6 +1,9 @@
+import bisect
 import math
 import re
+from datetime import datetime
 
+from analyses.perf import DISABLED_PERF_RECORDER, PerfRecorder
 
 _TOKEN_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9_]{1,}")
 
@@ -55,10 +58,19 @@ def _cosine_similarity(left: dict[str, float], right: dict[str, float]) -> float
     return dot / (left_norm * right_norm)
 
 
-def merge_clusters_tfidf(clusters: list[dict], similarity_threshold: float) -> list[dict]:
+def merge_clusters_tfidf(
+    clusters: list[dict],
+    similarity_threshold: float,
+    perf: PerfRecorder = DISABLED_PERF_RECORDER,
+) -> list[dict]:
     if not clusters:
         return []
 
+    with perf.measure("tfidf_merge", rows=len(clusters)):
+        return _merge_clusters_tfidf(clusters, similarity_threshold)
+
+
+def _merge_clusters_tfidf(clusters: list[dict], similarity_threshold: float) -> list[dict]:
     vectors = _build_tfidf_vectors([cluster.get("sample_message", "") for cluster in clusters])
     parent = list(range(len(clusters)))
 
@@ -103,3 +115,119 @@ def merge_clusters_tfidf(clusters: list[dict], similarity_threshold: float) -> l
         )
 
     return sorted(merged, key=lambda item: (-item["count"], item["merged_fingerprint"]))
+
+
+CLUSTER_SAMPLE_EVENTS = 5
+
+
+class ClusterAccumulator:
+    """Per-fingerprint cluster aggregates collected while events stream through ingest.
+
+    Holds everything a ``LogCluster`` row and the baseline cluster stats need, so
+    clusters can be written without querying the run's events afterwards. The
+    state is JSON-serializable for checkpoints and shard results.
+    """
+
+    def __init__(self, state: dict | None = None):
+        self.clusters: dict[str, dict] = {}
+        for fingerprint, cluster in (state or {}).items():
+            self.clusters[fingerprint] = {
+                **cluster,
+                "first_seen": _parse_seen(cluster["first_seen"]),
+                "last_seen": _parse_seen(cluster["last_seen"]),
+                "services": set(cluster["services"]),
+            }
+
+    def add(self, event: dict) -> None:
+        line_no = event["line_no"]
+        cluster = self.clusters.get(event["fingerprint"])
+        if cluster is None:
+            cluster = self.clusters[event["fingerprint"]] = {
+                "count": 0,
+                "first_line": line_no,
+                "last_line": line_no,
+                "sample_message": event["message"],
+                "level": event["level"],
+                "service": event["service"],
+                "sample_lines": [],
+                "first_seen": None,
+                "last_seen": None,
+                "services": set(),
+            }
+        elif line_no < cluster["first_line"]:
+            cluster["first_line"] = line_no
+            cluster["sample_message"] = event["message"]
+            cluster["level"] = event["level"]
+            cluster["service"] = event["service"]
+
+        cluster["count"] += 1
+        if line_no > cluster["last_line"]:
+            cluster["last_line"] = line_no
+        sample_lines = cluster["sample_lines"]
+        if len(sample_lines) < CLUSTER_SAMPLE_EVENTS or line_no < sample_lines[-1]:
+            bisect.insort(sample_lines, line_no)
+            del sample_lines[CLUSTER_SAMPLE_EVENTS:]
+
+        timestamp = event["timestamp"]
+        if timestamp is not None:
+            if cluster["first_seen"] is None or timestamp < cluster["first_seen"]:
+                cluster["first_seen"] = timestamp
+            if cluster["last_seen"] is None or timestamp > cluster["last_seen"]:
+                cluster["last_seen"] = timestamp
+        if event["service"]:
+            cluster["services"].add(event["service"])
+
+    def merge(self, other: "ClusterAccumulator") -> None:
+        for fingerprint, theirs in other.clusters.items():
+            ours = self.clusters.get(fingerprint)
+            if ours is None:
+                self.clusters[fingerprint] = {
+                    **theirs,
+                    "sample_lines": list(theirs["sample_lines"]),
+                    "services": set(theirs["services"]),
+                }
+                continue
+            if theirs["first_line"] < ours["first_line"]:
+                for key in ("first_line", "sample_message", "level", "service"):
+                    ours[key] = theirs[key]
+            ours["count"] += theirs["count"]
+            ours["last_line"] = max(ours["last_line"], theirs["last_line"])
+            ours["sample_lines"] = sorted(ours["sample_lines"] + theirs["sample_lines"])[:CLUSTER_SAMPLE_EVENTS]
+            for key, pick in (("first_seen", min), ("last_seen", max)):
+                seen = [value for value in (ours[key], theirs[key]) if value is not None]
+                ours[key] = pick(seen) if seen else None
+            ours["services"] |= theirs["services"]
+
+    def state(self) -> dict:
+        return {
+            fingerprint: {
+                **cluster,
+                "sample_lines": list(cluster["sample_lines"]),
+                "first_seen": cluster["first_seen"].isoformat() if cluster["first_seen"] else None,
+                "last_seen": cluster["last_seen"].isoformat() if cluster["last_seen"] else None,
+                "services": sorted(cluster["services"]),
+            }
+            for fingerprint, cluster in self.clusters.items()
+        }
+
+    def ordered(self) -> list[tuple[str, dict]]:
+        return sorted(self.clusters.items(), key=lambda item: (-item[1]["count"], item[0]))
+
+    def baseline(self) -> list[dict]:
+        """Baseline clusters as stored in ``AnalysisRun.stats``, largest first."""
+        return [
+            {
+                "fingerprint": fingerprint,
+                "count": cluster["count"],
+                "first_line": cluster["first_line"],
+                "last_line": cluster["last_line"],
+                "sample_message": cluster["sample_message"],
+                "level": cluster["level"],
+                "service": cluster["service"],
+            }
+            for fingerprint, cluster in self.ordered()
+        ]
+
+
+def _parse_seen(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
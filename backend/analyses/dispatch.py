@@ -0,0 +1,229 @@
+# Fair-share admission of queued analyses. New runs wait in the database
+# (status queued, dispatched_at unset) and only reach the Celery broker when
+# their owner is under ANALYSIS_OWNER_MAX_ACTIVE and the workers under
+# ANALYSIS_DISPATCH_MAX_ACTIVE, taking turns between owners so one tenant's
+# bulk upload cannot hold the whole queue. A sharded run holds one slot per
+# shard task it put on the broker.
+
+import logging
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from analyses.models import AnalysisRun
+
+logger = logging.getLogger(__name__)
+
+_NEVER = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+def _owned_runs(owner_ids: Iterable[int] | None):
+    runs = AnalysisRun.objects.all()
+    if owner_ids is not None:
+        runs = runs.filter(source__owner_id__in=list(owner_ids))
+    return runs
+
+
+def _pending_runs(owner_ids: Iterable[int] | None = None):
+    return _owned_runs(owner_ids).filter(status=AnalysisRun.Status.QUEUED, dispatched_at__isnull=True)
+
+
+def _active_runs(owner_ids: Iterable[int] | None = None):
+    # Runs holding a slot: handed to the broker, suspended between invocations
+    # or running.
+    return _owned_runs(owner_ids).filter(
+        Q(status=AnalysisRun.Status.RUNNING)
+        | Q(status=AnalysisRun.Status.QUEUED, dispatched_at__isnull=False)
+    )
+
+
+def fair_share_order(
+    pending: dict[int, list[int]],
+    owner_order: list[int],
+    *,
+    active_counts: dict[int, int] | None = None,
+    owner_cap: int = 0,
+    capacity: int | None = None,
+) -> list[int]:
+    """Interleave each owner's pending runs round-robin, in ``owner_order``.
+
+    ``pending`` maps owner id to run ids, oldest first. Owners already running
+    ``owner_cap`` runs (0 for no cap) are skipped, and at most ``capacity``
+    runs are returned (None for no limit).
+    """
+    queues = {owner_id: deque(pending.get(owner_id, ())) for owner_id in owner_order}
+    active = dict(active_counts or {})
+    selected: list[int] = []
+    while capacity is None or len(selected) < capacity:
+        progressed = False
+        for owner_id in owner_order:
+            if capacity is not None and len(selected) >= capacity:
+                break
+            queue = queues[owner_id]
+            if not queue or (owner_cap and active.get(owner_id, 0) >= owner_cap):
+                continue
+            selected.append(queue.popleft())
+            active[owner_id] = active.get(owner_id, 0) + 1
+            progressed = True
+        if not progressed:
+            break
+    return selected
+
+
+def _owner_order(owner_ids: Iterable[int]) -> list[int]:
+    """Order owners with pending runs least recently served first."""
+    owner_ids = list(owner_ids)
+    served = (
+        AnalysisRun.objects.filter(source__owner_id__in=owner_ids)
+        .values("source__owner_id")
+        .annotate(
+            last_dispatched_at=Max("dispatched_at"),
+            oldest_pending_at=Min(
+                "created_at",
+                filter=Q(status=AnalysisRun.Status.QUEUED, dispatched_at__isnull=True),
+            ),
+        )
+    )
+    order_keys = {
+        row["source__owner_id"]: (row["last_dispatched_at"] or _NEVER, row["oldest_pending_at"])
+        for row in served
+    }
+    return sorted(owner_ids, key=lambda owner_id: (*order_keys[owner_id], owner_id))
+
+
+def _pending_by_owner(rows) -> tuple[dict[int, list[int]], list[int]]:
+    """Group ``(run id, owner id)`` rows and order owners least recently served first."""
+    pending: dict[int, list[int]] = {}
+    for run_id, owner_id in rows:
+        pending.setdefault(owner_id, []).append(run_id)
+    if not pending:
+        return pending, []
+    return pending, _owner_order(pending)
+
+
+def pending_queue_positions(owner_id: int) -> dict[int, int]:
+    """1-based dispatch position of each of ``owner_id``'s pending runs, by run id.
+
+    Matches :func:`fair_share_order` over every pending run, but only needs how
+    many runs each owner has waiting: the k-th run of an owner goes out in
+    round k, after the runs of earlier rounds and of the owners ahead of it in
+    this round. An estimate: it follows the round-robin order but not the
+    per-owner caps, which can hold an owner back until one of its runs finishes.
+    """
+    run_ids = list(_pending_runs([owner_id]).order_by("created_at", "id").values_list("id", flat=True))
+    if not run_ids:
+        return {}
+    waiting = dict(
+        _pending_runs()
+        .values("source__owner_id")
+        .annotate(count=Count("id"))
+        .values_list("source__owner_id", "count")
+    )
+    owner_order = _owner_order(waiting)
+    rank = owner_order.index(owner_id)
+    all_counts = sorted(waiting.values())
+    ahead_counts = sorted(waiting[other] for other in owner_order[:rank])
+
+    positions: dict[int, int] = {}
+    earlier_rounds = 0
+    for round_index, run_id in enumerate(run_ids):
+        ahead = len(ahead_counts) - bisect_right(ahead_counts, round_index)
+        positions[run_id] = earlier_rounds + ahead + 1
+        earlier_rounds += len(all_counts) - bisect_right(all_counts, round_index)
+    return positions
+
+
+def dispatch_expiry(dispatched_at: datetime) -> datetime:
+    """When a run dispatched at ``dispatched_at`` is reset to pending unless a worker has taken it."""
+    return dispatched_at + timedelta(seconds=settings.ANALYSIS_DISPATCH_STALE_SECONDS)
+
+
+def dispatch_pending_analyses(send, *, owner_ids: Iterable[int] | None = None) -> list[int]:
+    """Hand the next fair share of pending runs to ``send(analysis_id)``; returns their ids.
+
+    ``send(analysis_id, expires)`` normally puts the run on the Celery broker;
+    :class:`LocalBroker` works too. ``expires`` is when the reaper stops waiting
+    for a worker to pick the run up and sends it again, so the message must not
+    be executed after it. Runs are marked dispatched first and sent once that
+    commits, so a worker never waits on this transaction; if a send raises,
+    that run and the ones after it go back to pending.
+
+    ``owner_ids`` limits the pass to those owners' runs, counting only their
+    active runs against both caps, as if nobody else had queued anything.
+    """
+    if owner_ids is not None:
+        owner_ids = list(owner_ids)
+    with transaction.atomic():
+        # Locking the pending runs serializes concurrent dispatch passes.
+        rows = list(
+            _pending_runs(owner_ids)
+            .select_for_update(of=("self",))
+            .order_by("created_at", "id")
+            .values_list("id", "source__owner_id")
+        )
+        if not rows:
+            return []
+
+        active_counts = {
+            row["source__owner_id"]: row["slots"]
+            for row in _active_runs(owner_ids)
+            .values("source__owner_id")
+            .annotate(slots=Sum(Coalesce("shard_count", 1)))
+        }
+        capacity = None
+        if settings.ANALYSIS_DISPATCH_MAX_ACTIVE > 0:
+            capacity = max(0, settings.ANALYSIS_DISPATCH_MAX_ACTIVE - sum(active_counts.values()))
+        pending, owner_order = _pending_by_owner(rows)
+        selected = fair_share_order(
+            pending,
+            owner_order,
+            active_counts=active_counts,
+            owner_cap=max(0, settings.ANALYSIS_OWNER_MAX_ACTIVE),
+            capacity=capacity,
+        )
+        dispatched_at = timezone.now()
+        if selected:
+            AnalysisRun.objects.filter(id__in=selected).update(dispatched_at=dispatched_at, updated_at=dispatched_at)
+
+    expires = dispatch_expiry(dispatched_at)
+    dispatched: list[int] = []
+    for position, analysis_id in enumerate(selected):
+        try:
+            send(analysis_id, expires)
+        except Exception:
+            logger.exception("analysis dispatch failed analysis_id=%s", analysis_id)
+            AnalysisRun.objects.filter(
+                id__in=selected[position:], status=AnalysisRun.Status.QUEUED
+            ).update(dispatched_at=None)
+            break
+        dispatched.append(analysis_id)
+
+    if dispatched:
+        logger.info("analyses dispatched ids=%s", dispatched)
+    return dispatched
+
+
+class LocalBroker:
+    """In-process FIFO standing in for the Celery broker, for exercising the dispatcher.
+
+    Pass ``broker.send`` to :func:`dispatch_pending_analyses` and take runs off
+    with :meth:`receive` as a worker would.
+    """
+
+    def __init__(self):
+        self.messages: deque[int] = deque()
+        self.sent: list[int] = []
+
+    def send(self, analysis_id: int, expires: datetime | None = None) -> None:
+        self.messages.append(analysis_id)
+        self.sent.append(analysis_id)
+
+    def receive(self) -> int | None:
+        return self.messages.popleft() if self.messages else None
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from analyses.models import LogEvent
+
+EVENT_INSERT_BATCH_SIZE = 500
+
+
+def copy_supported() -> bool:
+    return connection.vendor == "postgresql" and settings.ANALYSIS_EVENT_COPY_ENABLED
+
+
+def load_log_events(analysis_id: int, rows: list[dict], *, generation: int = 0) -> None:
+    """Insert normalized event rows, through COPY on PostgreSQL and the ORM elsewhere."""
+    if not rows:
+        return
+    if copy_supported():
+        copy_log_events(analysis_id, rows, generation=generation)
+    else:
+        bulk_create_log_events(analysis_id, rows, generation=generation)
+
+
+def bulk_create_log_events(analysis_id: int, rows: list[dict], *, generation: int = 0) -> None:
+    LogEvent.objects.bulk_create(
+        [LogEvent(analysis_run_id=analysis_id, generation=generation, **row) for row in rows],
+        batch_size=EVENT_INSERT_BATCH_SIZE,
+    )
+
+
+def copy_log_events(analysis_id: int, rows: list[dict], *, generation: int = 0) -> None:
+    """Stream rows with ``COPY ... FROM STDIN`` instead of building model instances.
+
+    Values go through each field's ``get_db_prep_save``, the same conversion the
+    ORM applies, so stored rows are identical to ``bulk_create``'s.
+    """
+    meta = LogEvent._meta
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    quote = connection.ops.quote_name
+    fixed = {"analysis_run": analysis_id, "generation": generation, "created_at": timezone.now()}
+    statement = (
+        f"COPY {quote(meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) FROM STDIN"
+    )
+    preparers = [(field.name, field.get_db_prep_save) for field in fields]
+    with connection.cursor() as cursor, cursor.copy(statement) as copy:
+        for row in rows:
+            copy.write_row(
+                [
+                    prepare(fixed[name] if name in fixed else row[name], connection)
+                    for name, prepare in preparers
+                ]
+            )
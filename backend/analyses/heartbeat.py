@@ -0,0 +1,72 @@
+# Liveness of running analyses: while a task works on a run, a daemon thread
+# stamps AnalysisRun.heartbeat_at, and tasks.reap_stale_analyses recovers
+# running runs whose heartbeat has gone stale because their worker died.
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from analyses.models import AnalysisRun
+
+logger = logging.getLogger(__name__)
+
+
+def record_heartbeat(analysis_id: int, *, attempt: int | None = None) -> bool:
+    """Stamp the run's heartbeat; False once it is no longer running (under ``attempt``)."""
+    runs = AnalysisRun.objects.filter(id=analysis_id, status=AnalysisRun.Status.RUNNING)
+    if attempt is not None:
+        runs = runs.filter(attempt=attempt)
+    return bool(runs.update(heartbeat_at=timezone.now()))
+
+
+class AnalysisHeartbeat:
+    """Stamp a run's heartbeat every ``ANALYSIS_HEARTBEAT_INTERVAL_SECONDS`` until stopped.
+
+    The thread covers stretches without ingest batches, such as clustering and
+    the LLM request; it dies with the worker process, which is what lets the
+    reaper tell a crashed run from a slow one. It stops by itself once the run
+    leaves ``running``.
+    """
+
+    def __init__(self, analysis_id: int, *, attempt: int | None = None):
+        self.analysis_id = analysis_id
+        self.attempt = attempt
+        self.interval_seconds = settings.ANALYSIS_HEARTBEAT_INTERVAL_SECONDS
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "AnalysisHeartbeat":
+        if self.interval_seconds > 0:
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"analysis-heartbeat-{self.analysis_id}",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "AnalysisHeartbeat":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        try:
+            while not self._stopped.wait(self.interval_seconds):
+                if not record_heartbeat(self.analysis_id, attempt=self.attempt):
+                    break
+        except Exception:
+            logger.exception("analysis heartbeat failed analysis_id=%s", self.analysis_id)
+        finally:
+            # Django opens a connection per thread; do not leak this one.
+            connection.close()
@@ -1,11 +1,18 @@
+import bz2
 import gzip
+import lzma
+import zlib
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator
+from typing import BinaryIO, Callable, Iterator
 
 from django.core.files.storage import default_storage
 
 from sources.models import Source
 
+READ_BLOCK_SIZE = 1024 * 1024
+_MAGIC_SNIFF_BYTES = 8
+
 
 class SourceLineReaderError(Exception):
     pass
@@ -19,32 +26,175 @@ class LineReaderTruncatedByBytes(Exception):
     pass
 
 
-def _is_gzip(object_key: str, file_obj) -> bool:
-    if Path(object_key).suffix.lower() == ".gz":
-        return True
+@dataclass(frozen=True)
+class SourceCodec:
+    """Streaming decompressor for one upload container format.
+
+    ``open_stream`` wraps the stored file object in a readable binary stream that
+    decompresses lazily, so ``read(block_size)`` never inflates more than one
+    block at a time regardless of the compression ratio.
+    """
+
+    name: str
+    magic: bytes
+    extensions: tuple[str, ...]
+    content_types: tuple[str, ...]
+    open_stream: Callable[[BinaryIO], BinaryIO]
+    stream_errors: tuple[type[BaseException], ...]
+    is_available: Callable[[], bool] = lambda: True
+
+
+_CODECS: dict[str, SourceCodec] = {}
+
+
+def register_codec(codec: SourceCodec) -> None:
+    _CODECS[codec.name] = codec
+
+
+def get_registered_codecs() -> list[SourceCodec]:
+    return list(_CODECS.values())
+
+
+def _open_gzip(file_obj: BinaryIO) -> BinaryIO:
+    # GzipFile keeps reading after a member trailer, so concatenated members
+    # produced by `cat a.gz b.gz` or logrotate appends decode as one stream.
+    return gzip.GzipFile(fileobj=file_obj, mode="rb")
+
+
+def _open_bz2(file_obj: BinaryIO) -> BinaryIO:
+    return bz2.BZ2File(file_obj, mode="rb")
+
+
+def _open_xz(file_obj: BinaryIO) -> BinaryIO:
+    return lzma.LZMAFile(file_obj, mode="rb", format=lzma.FORMAT_XZ)
+
+
+def _open_zstd(file_obj: BinaryIO) -> BinaryIO:
+    try:
+        import zstandard
+    except ImportError as error:
+        raise SourceLineReaderError("zstd support requires the zstandard package.") from error
+
+    return zstandard.ZstdDecompressor().stream_reader(
+        file_obj,
+        read_size=READ_BLOCK_SIZE,
+        read_across_frames=True,
+    )
+
+
+def _zstd_errors() -> tuple[type[BaseException], ...]:
+    try:
+        import zstandard
+    except ImportError:
+        return ()
+    return (zstandard.ZstdError,)
+
+
+def _zstd_available() -> bool:
+    return bool(_zstd_errors())
 
-    header = file_obj.read(2)
+
+register_codec(
+    SourceCodec(
+        name="gzip",
+        magic=b"\x1f\x8b",
+        extensions=(".gz",),
+        content_types=("application/gzip", "application/x-gzip"),
+        open_stream=_open_gzip,
+        stream_errors=(OSError, EOFError, zlib.error),
+    )
+)
+register_codec(
+    SourceCodec(
+        name="bz2",
+        magic=b"BZh",
+        extensions=(".bz2",),
+        content_types=("application/x-bzip2",),
+        open_stream=_open_bz2,
+        stream_errors=(OSError, EOFError),
+    )
+)
+register_codec(
+    SourceCodec(
+        name="xz",
+        magic=b"\xfd7zXZ\x00",
+        extensions=(".xz",),
+        content_types=("application/x-xz",),
+        open_stream=_open_xz,
+        stream_errors=(OSError, EOFError, lzma.LZMAError),
+    )
+)
+register_codec(
+    SourceCodec(
+        name="zstd",
+        magic=b"\x28\xb5\x2f\xfd",
+        extensions=(".zst", ".zstd"),
+        content_types=("application/zstd",),
+        open_stream=_open_zstd,
+        stream_errors=(OSError, EOFError) + _zstd_errors(),
+        is_available=_zstd_available,
+    )
+)
+
+
+def get_codec_for_extension(suffix: str) -> SourceCodec | None:
+    for codec in _CODECS.values():
+        if suffix.lower() in codec.extensions:
+            return codec
+    return None
+
+
+def detect_codec(object_key: str, header: bytes) -> SourceCodec | None:
+    codec = get_codec_for_extension(Path(object_key).suffix)
+    if codec is not None:
+        return codec
+    for codec in _CODECS.values():
+        if header.startswith(codec.magic):
+            return codec
+    return None
+
+
+def sniff_codec(object_key: str, file_obj) -> SourceCodec | None:
+    header = file_obj.read(_MAGIC_SNIFF_BYTES)
     file_obj.seek(0)
-    return header == b"\x1f\x8b"
+    return detect_codec(object_key, header)
+
+
+def _iter_stream_blocks(stream: BinaryIO, block_size: int) -> Iterator[bytes]:
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def _skip_bytes(blocks: Iterator[bytes], count: int) -> Iterator[bytes]:
+    for block in blocks:
+        if count >= len(block):
+            count -= len(block)
+            continue
+        yield block[count:] if count else block
+        count = 0
 
 
-def _iter_upload_lines(source: Source) -> Iterator[bytes]:
+def _iter_upload_blocks(source: Source, *, block_size: int, start_offset: int = 0) -> Iterator[bytes]:
     if not source.file_object_key:
         raise SourceLineReaderError("Source upload key is missing.")
     if not default_storage.exists(source.file_object_key):
         raise SourceLineReaderError("Source upload does not exist.")
 
     with default_storage.open(source.file_object_key, "rb") as file_obj:
-        if _is_gzip(source.file_object_key, file_obj):
-            try:
-                with gzip.GzipFile(fileobj=file_obj, mode="rb") as gzip_file:
-                    for raw_line in gzip_file:
-                        yield raw_line
-            except OSError as error:
-                raise SourceLineReaderError("Invalid gzip stream.") from error
-        else:
-            for raw_line in file_obj:
-                yield raw_line
+        codec = sniff_codec(source.file_object_key, file_obj)
+        if codec is None:
+            file_obj.seek(start_offset)
+            yield from _iter_stream_blocks(file_obj, block_size)
+            return
+
+        try:
+            with codec.open_stream(file_obj) as stream:
+                yield from _skip_bytes(_iter_stream_blocks(stream, block_size), start_offset)
+        except codec.stream_errors as error:
+            raise SourceLineReaderError(f"Invalid {codec.name} stream.") from error
 
 
 def _iter_paste_lines(source: Source) -> Iterator[bytes]:
@@ -56,24 +206,373 @@ def _iter_paste_lines(source: Source) -> Iterator[bytes]:
         yield line.encode("utf-8", errors="replace") + b"\n"
 
 
+def _iter_paste_blocks(source: Source, *, block_size: int) -> Iterator[bytes]:
+    block = bytearray()
+    for raw_line in _iter_paste_lines(source):
+        block += raw_line
+        if len(block) >= block_size:
+            yield bytes(block)
+            block.clear()
+    if block:
+        yield bytes(block)
+
+
+def _decode_lines(data: bytes) -> list[str]:
+    # 0x0A never occurs inside a multi-byte UTF-8 sequence, so decoding a run of
+    # complete lines at once yields exactly the same text as decoding each line.
+    text = data.decode("utf-8", errors="replace")
+    if "\r" in text:
+        return [line.rstrip("\r") for line in text.split("\n")]
+    return text.split("\n")
+
+
+def _take_within_limits(
+    data: bytes, *, max_lines: int, max_bytes: int, line_count: int, bytes_processed: int
+) -> tuple[bytes, int, int, type[Exception] | None]:
+    """Return the prefix of ``data`` (complete lines) that fits the remaining budgets."""
+    offset = 0
+    while offset < len(data):
+        newline_at = data.find(b"\n", offset)
+        line_end = len(data) if newline_at == -1 else newline_at + 1
+        if bytes_processed + (line_end - offset) > max_bytes:
+            return data[:offset], line_count, bytes_processed, LineReaderTruncatedByBytes
+        if line_count + 1 > max_lines:
+            return data[:offset], line_count, bytes_processed, LineReaderTruncatedByLines
+        bytes_processed += line_end - offset
+        line_count += 1
+        offset = line_end
+    return data, line_count, bytes_processed, None
+
+
+def iter_line_batches_from_blocks(
+    blocks: Iterator[bytes],
+    *,
+    max_lines: int,
+    max_bytes: int,
+    start_line_count: int = 0,
+    start_offset: int = 0,
+) -> Iterator[tuple[list[str], int]]:
+    """Split raw byte blocks into decoded line batches, one batch per block.
+
+    Each batch is yielded with the stream offset just past its last line, which
+    is where a reader resuming after that batch has to start. Limits are applied
+    exactly as the per-line reader did: the line that would push the running
+    byte count past ``max_bytes`` (newline included) or the line count past
+    ``max_lines`` is not yielded, and the matching truncation exception is
+    raised after the lines that fit. ``start_line_count``/``start_offset``
+    describe lines already consumed before ``blocks`` begins.
+    """
+    line_count = start_line_count
+    bytes_processed = start_offset
+    pending = b""
+
+    for block in blocks:
+        data = pending + block if pending else block
+        last_newline = data.rfind(b"\n")
+        if last_newline == -1:
+            pending = data
+            if len(pending) + bytes_processed > max_bytes:
+                raise LineReaderTruncatedByBytes
+            continue
+
+        complete = data[: last_newline + 1]
+        pending = data[last_newline + 1 :]
+        block_lines = complete.count(b"\n")
+        if (
+            bytes_processed + len(complete) <= max_bytes
+            and line_count + block_lines <= max_lines
+        ):
+            bytes_processed += len(complete)
+            line_count += block_lines
+            yield _decode_lines(complete[:-1]), bytes_processed
+            continue
+
+        fitting, line_count, bytes_processed, truncation = _take_within_limits(
+            complete,
+            max_lines=max_lines,
+            max_bytes=max_bytes,
+            line_count=line_count,
+            bytes_processed=bytes_processed,
+        )
+        if fitting:
+            yield _decode_lines(fitting[:-1]), bytes_processed
+        if truncation is not None:
+            raise truncation
+
+    if pending:
+        if bytes_processed + len(pending) > max_bytes:
+            raise LineReaderTruncatedByBytes
+        if line_count + 1 > max_lines:
+            raise LineReaderTruncatedByLines
+        yield _decode_lines(pending), bytes_processed + len(pending)
+
+
+def iter_source_line_batches(
+    source: Source,
+    *,
+    max_lines: int,
+    max_bytes: int,
+    start_offset: int = 0,
+    start_line_count: int = 0,
+    block_size: int = READ_BLOCK_SIZE,
+) -> Iterator[tuple[list[str], int]]:
+    """Yield ``(lines, end_offset)`` batches for a source.
+
+    Offsets count decoded-stream bytes, so a resumed read seeks directly into
+    plain uploads and re-inflates up to ``start_offset`` for compressed ones.
+    """
+    if source.type == Source.SourceType.PASTE:
+        blocks = _skip_bytes(_iter_paste_blocks(source, block_size=block_size), start_offset)
+    else:
+        blocks = _iter_upload_blocks(source, block_size=block_size, start_offset=start_offset)
+
+    yield from iter_line_batches_from_blocks(
+        blocks,
+        max_lines=max_lines,
+        max_bytes=max_bytes,
+        start_line_count=start_line_count,
+        start_offset=start_offset,
+    )
+
+
 def iter_source_lines(
     source: Source, *, max_lines: int, max_bytes: int
 ) -> Iterator[str]:
-    line_count = 0
-    bytes_processed = 0
+    for batch, _ in iter_source_line_batches(source, max_lines=max_lines, max_bytes=max_bytes):
+        yield from batch
+
+
+def _open_plain_upload(source: Source):
+    if source.type != Source.SourceType.UPLOAD or not source.file_object_key:
+        return None
+    if not default_storage.exists(source.file_object_key):
+        return None
+
+    file_obj = default_storage.open(source.file_object_key, "rb")
+    if sniff_codec(source.file_object_key, file_obj) is not None:
+        file_obj.close()
+        return None
+    return file_obj
 
+
+def source_decoded_size(source: Source) -> int | None:
+    """Bytes a full read of the source decodes to, or None when only reading it would tell."""
     if source.type == Source.SourceType.PASTE:
-        iterator = _iter_paste_lines(source)
-    else:
-        iterator = _iter_upload_lines(source)
+        return sum(len(raw_line) for raw_line in _iter_paste_lines(source))
 
-    for raw_line in iterator:
-        bytes_processed += len(raw_line)
-        if bytes_processed > max_bytes:
-            raise LineReaderTruncatedByBytes
+    file_obj = _open_plain_upload(source)
+    if file_obj is None:
+        return None
+    with file_obj:
+        return file_obj.size
 
-        line_count += 1
-        if line_count > max_lines:
-            raise LineReaderTruncatedByLines
 
-        yield raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+def plan_upload_shards(
+    source: Source,
+    *,
+    max_lines: int,
+    max_bytes: int,
+    shard_bytes: int,
+    block_size: int = READ_BLOCK_SIZE,
+    is_continuation: Callable[[str | None, str, str | None], bool] | None = None,
+) -> tuple[list[dict], str | None] | None:
+    """Split an uncompressed upload into newline-aligned byte ranges.
+
+    Returns ``(shards, truncated_by)`` where each shard carries its byte range
+    and the global line number of its first line, or ``None`` when the source
+    cannot be read by offset (pastes and compressed uploads). The plan stops at
+    the same line where ``iter_source_lines`` would raise a truncation error.
+    When ``is_continuation(prev_line, line, next_line)`` is given, shard starts
+    are moved forward past lines that continue the previous shard's last event.
+    """
+    file_obj = _open_plain_upload(source)
+    if file_obj is None:
+        return None
+
+    shards: list[dict] = []
+    truncated_by = None
+    line_count = 0
+    block_start = 0
+    last_line_end = 0
+    shard_start = 0
+    shard_first_line = 1
+
+    def close_shard(end_offset: int) -> None:
+        nonlocal shard_start, shard_first_line
+        shards.append(
+            {
+                "index": len(shards),
+                "start_offset": shard_start,
+                "end_offset": end_offset,
+                "first_line_no": shard_first_line,
+                "line_count": line_count - shard_first_line + 1,
+            }
+        )
+        shard_start = end_offset
+        shard_first_line = line_count + 1
+
+    with file_obj:
+        pending = 0
+        for block in _iter_stream_blocks(file_obj, block_size):
+            block_end = block_start + len(block)
+            newline_count = block.count(b"\n")
+            last_newline = block.rfind(b"\n")
+            if (
+                newline_count
+                and block_start + last_newline + 1 <= max_bytes
+                and line_count + newline_count <= max_lines
+                and block_start + last_newline + 1 - shard_start < shard_bytes
+            ):
+                line_count += newline_count
+                last_line_end = block_start + last_newline + 1
+                pending = block_end - last_line_end
+                block_start = block_end
+                continue
+
+            position = 0
+            while truncated_by is None:
+                newline_at = block.find(b"\n", position)
+                if newline_at == -1:
+                    break
+                line_end = block_start + newline_at + 1
+                if line_end > max_bytes:
+                    truncated_by = "byte_limit"
+                elif line_count + 1 > max_lines:
+                    truncated_by = "line_limit"
+                else:
+                    line_count += 1
+                    last_line_end = line_end
+                    if last_line_end - shard_start >= shard_bytes:
+                        close_shard(last_line_end)
+                position = newline_at + 1
+
+            if truncated_by is not None:
+                break
+            pending = block_end - last_line_end
+            if last_line_end + pending > max_bytes:
+                truncated_by = "byte_limit"
+                break
+            block_start = block_end
+
+        if truncated_by is None and pending:
+            if last_line_end + pending > max_bytes:
+                truncated_by = "byte_limit"
+            elif line_count + 1 > max_lines:
+                truncated_by = "line_limit"
+            else:
+                line_count += 1
+                last_line_end += pending
+
+    if last_line_end > shard_start:
+        close_shard(last_line_end)
+    if is_continuation is not None and len(shards) > 1:
+        with _open_plain_upload(source) as file_obj:
+            shards = _align_shard_starts(file_obj, shards, is_continuation)
+    return shards, truncated_by
+
+
+def _decode_line(raw_line: bytes) -> str:
+    if raw_line.endswith(b"\n"):
+        raw_line = raw_line[:-1]
+    return raw_line.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _read_line_before(file_obj: BinaryIO, offset: int) -> str | None:
+    if offset == 0:
+        return None
+    window = 4096
+    while True:
+        start = max(0, offset - window)
+        file_obj.seek(start)
+        data = file_obj.read(offset - start)
+        line_start = data.rfind(b"\n", 0, len(data) - 1) + 1
+        if line_start > 0 or start == 0:
+            return _decode_line(data[line_start:])
+        window *= 4
+
+
+def _advance_to_event_start(
+    file_obj: BinaryIO,
+    offset: int,
+    line_no: int,
+    end_offset: int,
+    is_continuation: Callable[[str | None, str, str | None], bool],
+) -> tuple[int, int]:
+    prev_line = _read_line_before(file_obj, offset)
+    file_obj.seek(offset)
+    raw_line = file_obj.readline()
+    while offset < end_offset:
+        line_end = offset + len(raw_line)
+        raw_next = file_obj.readline() if line_end < end_offset else b""
+        line = _decode_line(raw_line)
+        if not is_continuation(prev_line, line, _decode_line(raw_next) if raw_next else None):
+            break
+        offset = line_end
+        line_no += 1
+        prev_line = line
+        raw_line = raw_next
+    return offset, line_no
+
+
+def _align_shard_starts(
+    file_obj: BinaryIO,
+    shards: list[dict],
+    is_continuation: Callable[[str | None, str, str | None], bool],
+) -> list[dict]:
+    end_offset = shards[-1]["end_offset"]
+    end_line_no = shards[-1]["first_line_no"] + shards[-1]["line_count"]
+    starts = [(0, 1)]
+    for shard in shards[1:]:
+        if shard["start_offset"] <= starts[-1][0]:
+            # An earlier boundary already moved past this one.
+            continue
+        start = _advance_to_event_start(
+            file_obj, shard["start_offset"], shard["first_line_no"], end_offset, is_continuation
+        )
+        if start[0] < end_offset:
+            starts.append(start)
+
+    aligned = []
+    for index, (start_offset, first_line_no) in enumerate(starts):
+        next_offset, next_line_no = starts[index + 1] if index + 1 < len(starts) else (end_offset, end_line_no)
+        aligned.append(
+            {
+                "index": index,
+                "start_offset": start_offset,
+                "end_offset": next_offset,
+                "first_line_no": first_line_no,
+                "line_count": next_line_no - first_line_no,
+            }
+        )
+    return aligned
+
+
+def iter_upload_range_line_batches(
+    source: Source,
+    *,
+    start_offset: int,
+    end_offset: int,
+    block_size: int = READ_BLOCK_SIZE,
+) -> Iterator[tuple[list[str], int]]:
+    """Yield ``(lines, end_offset)`` batches for a newline-aligned byte range of an upload."""
+    file_obj = _open_plain_upload(source)
+    if file_obj is None:
+        raise SourceLineReaderError("Source upload cannot be read by offset.")
+
+    def blocks() -> Iterator[bytes]:
+        with file_obj:
+            file_obj.seek(start_offset)
+            remaining = end_offset - start_offset
+            while remaining > 0:
+                block = file_obj.read(min(block_size, remaining))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+
+    yield from iter_line_batches_from_blocks(
+        blocks(),
+        max_lines=end_offset - start_offset + 1,
+        max_bytes=end_offset,
+        start_offset=start_offset,
+    )
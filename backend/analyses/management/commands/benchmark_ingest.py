@@ -0,0 +1,315 @@
+import json
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import billiard
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from analyses.event_loader import bulk_create_log_events, copy_log_events
+from analyses.line_reader import READ_BLOCK_SIZE, iter_line_batches_from_blocks
+from analyses.models import AnalysisRun
+from analyses.tasks import _ingest_line_batches, _new_line_stats
+from analyses.parsers import LockedLineParser, detect_dominant_parser, new_parser_detection_stats
+from analyses.redaction import Redactor
+from analyses.tests import REDACTION_PROBE_LINES, _legacy_parse_line, _legacy_redact_text
+from sources.models import Source
+
+DEFAULT_SAMPLE_DIR = settings.BASE_DIR.parent / "demo" / "sample_logs"
+def _build_scaled_corpus(sample_dir: Path, target_bytes: int, destination: Path) -> dict:
+    samples = sorted(path for path in sample_dir.iterdir() if path.is_file())
+    if not samples:
+        raise CommandError(f"No sample logs found in {sample_dir}.")
+
+    seed = b"".join(
+        path.read_bytes().rstrip(b"\n") + b"\n" for path in samples
+    )
+    repeats = max(1, target_bytes // len(seed))
+    with destination.open("wb") as handle:
+        for _ in range(repeats):
+            handle.write(seed)
+
+    return {
+        "samples": [path.name for path in samples],
+        "bytes": len(seed) * repeats,
+        "lines": seed.count(b"\n") * repeats,
+    }
+
+
+def _legacy_line_reader(path: Path, *, max_lines: int, max_bytes: int) -> int:
+    line_count = 0
+    bytes_processed = 0
+    with path.open("rb") as file_obj:
+        for raw_line in file_obj:
+            bytes_processed += len(raw_line)
+            if bytes_processed > max_bytes:
+                break
+            line_count += 1
+            if line_count > max_lines:
+                break
+            raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+    return line_count
+
+
+def _block_line_reader(path: Path, *, max_lines: int, max_bytes: int) -> int:
+    def blocks():
+        with path.open("rb") as file_obj:
+            while True:
+                block = file_obj.read(READ_BLOCK_SIZE)
+                if not block:
+                    return
+                yield block
+
+    line_count = 0
+    for batch, _ in iter_line_batches_from_blocks(blocks(), max_lines=max_lines, max_bytes=max_bytes):
+        line_count += len(batch)
+    return line_count
+
+
+def _parse_all(lines: list[str], parse) -> int:
+    for line in lines:
+        parse(line)
+    return len(lines)
+
+
+class _DiscardingWriter:
+    def __init__(self):
+        self.count = 0
+
+    def add(self, normalized: dict) -> None:
+        self.count += 1
+
+    def flush(self) -> None:
+        pass
+
+    def close(self, *, abandon: bool = False) -> None:
+        pass
+
+
+def _normalize_lines(lines: list[str], *, parse_workers: int, locked_parser: str | None) -> int:
+    stats = _new_line_stats()
+    stats["parser_detection"] = new_parser_detection_stats(locked_parser, 0)
+    batches = ((lines[start : start + 8192], 0) for start in range(0, len(lines), 8192))
+    writer = _DiscardingWriter()
+    _ingest_line_batches(0, batches, stats, parse_workers=parse_workers, writer=writer)
+    return writer.count
+
+
+class _CollectingWriter(_DiscardingWriter):
+    def __init__(self):
+        super().__init__()
+        self.rows: list[dict] = []
+
+    def add(self, normalized: dict) -> None:
+        super().add(normalized)
+        self.rows.append(normalized)
+
+
+def _insert_events(rows: list[dict], source, load) -> int:
+    # A fresh run per attempt keeps (analysis_run, line_no) unique across repeats.
+    analysis = AnalysisRun.objects.create(source=source, status=AnalysisRun.Status.COMPLETED)
+    for start in range(0, len(rows), 8192):
+        load(analysis.id, rows[start : start + 8192])
+    return len(rows)
+
+
+def _time_pool_sizes(lines: list[str], locked_parser: str | None, worker_counts: list[int], repeat: int, results) -> None:
+    # Runs in a daemonic child, as ingest does inside a Celery prefork worker.
+    results.put(
+        [
+            _time_best(_normalize_lines, repeat, lines=lines, parse_workers=workers, locked_parser=locked_parser)
+            for workers in worker_counts
+        ]
+    )
+
+
+def _time_best(func, repeat: int, **kwargs) -> tuple[float, int]:
+    best = None
+    result = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(**kwargs)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 0.0, result
+
+
+class Command(BaseCommand):
+    help = "Benchmark ingest stages against a scaled-up copy of the demo sample logs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            choices=["reader", "parser", "process_pool", "redaction", "event_insert"],
+            default="reader",
+            help="Pipeline stage to benchmark.",
+        )
+        parser.add_argument(
+            "--size-mb",
+            type=int,
+            default=20,
+            help="Approximate size of the synthetic corpus in megabytes.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of timed runs per variant; the best run is reported.",
+        )
+        parser.add_argument(
+            "--lines",
+            type=int,
+            default=50000,
+            help="Number of corpus lines fed to the process_pool and event_insert targets.",
+        )
+        parser.add_argument(
+            "--max-workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Largest pool size tried by the process_pool target.",
+        )
+        parser.add_argument(
+            "--sample-dir",
+            default=str(DEFAULT_SAMPLE_DIR),
+            help="Directory containing seed log files.",
+        )
+
+    def handle(self, *args, **options):
+        sample_dir = Path(options["sample_dir"])
+        if not sample_dir.is_dir():
+            raise CommandError(f"Sample directory {sample_dir} does not exist.")
+
+        repeat = max(1, int(options["repeat"]))
+        target_bytes = max(1, int(options["size_mb"])) * 1024 * 1024
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            corpus_path = Path(tmp_dir) / "corpus.log"
+            corpus = _build_scaled_corpus(sample_dir, target_bytes, corpus_path)
+            result = {"target": options["target"], "corpus": corpus, "repeat": repeat}
+            if options["target"] == "parser":
+                result["variants"] = self._benchmark_parser(corpus_path, repeat)
+            elif options["target"] == "process_pool":
+                result["variants"] = self._benchmark_process_pool(
+                    corpus_path, repeat, options["lines"], options["max_workers"]
+                )
+            elif options["target"] == "redaction":
+                result["variants"] = self._benchmark_redaction(corpus_path, repeat)
+            elif options["target"] == "event_insert":
+                result["database"] = connection.vendor
+                result["variants"] = self._benchmark_event_insert(corpus_path, repeat, options["lines"])
+            else:
+                result["variants"] = self._benchmark_reader(corpus_path, corpus, repeat)
+
+        self.stdout.write(json.dumps(result, indent=2, sort_keys=True))
+
+    def _benchmark_reader(self, corpus_path: Path, corpus: dict, repeat: int) -> dict:
+        limits = {"max_lines": corpus["lines"], "max_bytes": corpus["bytes"]}
+        variants = {}
+        for name, func in (("legacy_per_line", _legacy_line_reader), ("block", _block_line_reader)):
+            elapsed, line_count = _time_best(func, repeat, path=corpus_path, **limits)
+            variants[name] = {
+                "seconds": round(elapsed, 4),
+                "lines": line_count,
+                "lines_per_second": round(line_count / elapsed) if elapsed else None,
+                "mb_per_second": round(corpus["bytes"] / 1024 / 1024 / elapsed, 2) if elapsed else None,
+            }
+        return variants
+
+    def _benchmark_parser(self, corpus_path: Path, repeat: int) -> dict:
+        lines = corpus_path.read_text(encoding="utf-8", errors="replace").splitlines()
+        cascade = LockedLineParser(new_parser_detection_stats(None, 0))
+        locked = LockedLineParser(new_parser_detection_stats(detect_dominant_parser(lines[:200]), 200))
+        variants = {}
+        for name, parse in (
+            ("legacy_cascade", _legacy_parse_line),
+            ("dispatch_cascade", cascade.parse),
+            ("dispatch_locked", locked.parse),
+        ):
+            elapsed, line_count = _time_best(_parse_all, repeat, lines=lines, parse=parse)
+            variants[name] = {
+                "seconds": round(elapsed, 4),
+                "lines": line_count,
+                "ns_per_line": round(elapsed / line_count * 1e9) if line_count else None,
+            }
+        return variants
+
+    def _benchmark_process_pool(self, corpus_path: Path, repeat: int, line_limit: int, max_workers: int) -> dict:
+        lines = corpus_path.read_text(encoding="utf-8", errors="replace").splitlines()[:line_limit]
+        locked_parser = detect_dominant_parser(lines[:200])
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= max(1, max_workers):
+            worker_counts.append(worker_counts[-1] * 2)
+        if worker_counts[-1] != max_workers and max_workers > 1:
+            worker_counts.append(max_workers)
+
+        results = billiard.Queue()
+        worker_process = billiard.Process(
+            target=_time_pool_sizes,
+            args=(lines, locked_parser, worker_counts, repeat, results),
+            daemon=True,
+        )
+        worker_process.start()
+        timings = results.get()
+        worker_process.join()
+
+        variants = {}
+        baseline = None
+        for workers, (elapsed, event_count) in zip(worker_counts, timings):
+            baseline = baseline or elapsed
+            variants[f"workers_{workers}"] = {
+                "seconds": round(elapsed, 4),
+                "lines": len(lines),
+                "events": event_count,
+                "lines_per_second": round(len(lines) / elapsed) if elapsed else None,
+                "speedup": round(baseline / elapsed, 2) if elapsed else None,
+            }
+        return variants
+
+    def _benchmark_redaction(self, corpus_path: Path, repeat: int) -> dict:
+        lines = corpus_path.read_text(encoding="utf-8", errors="replace").splitlines()
+        lines.extend(REDACTION_PROBE_LINES * max(1, len(lines) // 100))
+        redactor = Redactor.from_settings()
+        # Differential check first: the compiled redactor must match byte for byte.
+        mismatches = [line for line in set(lines) if redactor.redact(line) != _legacy_redact_text(line)]
+        if mismatches:
+            raise CommandError(f"Compiled redactor differs from the legacy rules on: {mismatches[0]!r}")
+
+        variants = {}
+        for name, redact in (("legacy", _legacy_redact_text), ("compiled", redactor.redact)):
+            elapsed, line_count = _time_best(_parse_all, repeat, lines=lines, parse=redact)
+            variants[name] = {
+                "seconds": round(elapsed, 4),
+                "lines": line_count,
+                "ns_per_line": round(elapsed / line_count * 1e9) if line_count else None,
+            }
+        return variants
+
+    def _benchmark_event_insert(self, corpus_path: Path, repeat: int, line_limit: int) -> dict:
+        lines = corpus_path.read_text(encoding="utf-8", errors="replace").splitlines()[:line_limit]
+        stats = _new_line_stats()
+        stats["parser_detection"] = new_parser_detection_stats(detect_dominant_parser(lines[:200]), 200)
+        writer = _CollectingWriter()
+        _ingest_line_batches(0, [(lines, 0)], stats, writer=writer)
+
+        loaders = [("orm_bulk_create", bulk_create_log_events)]
+        if connection.vendor == "postgresql":
+            loaders.append(("copy", copy_log_events))
+
+        variants = {}
+        # Everything written here is rolled back, including the scratch owner.
+        with transaction.atomic():
+            owner = get_user_model().objects.create(username=f"benchmark-{uuid.uuid4().hex[:12]}")
+            source = Source.objects.create(owner=owner, name="benchmark", type=Source.SourceType.PASTE)
+            for name, load in loaders:
+                elapsed, row_count = _time_best(_insert_events, repeat, rows=writer.rows, source=source, load=load)
+                variants[name] = {
+                    "seconds": round(elapsed, 4),
+                    "rows": row_count,
+                    "rows_per_second": round(row_count / elapsed) if elapsed else None,
+                }
+            transaction.set_rollback(True)
+        return variants
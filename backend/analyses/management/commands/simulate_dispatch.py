@@ -0,0 +1,152 @@
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from analyses.dispatch import LocalBroker, dispatch_pending_analyses
+from analyses.models import AnalysisRun
+from sources.models import Source
+
+
+def _parse_run_counts(value: str) -> list[int]:
+    try:
+        counts = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError as exc:
+        raise CommandError(f"--runs expects comma-separated integers, got {value!r}.") from exc
+    if not counts or any(count < 0 for count in counts):
+        raise CommandError("--runs needs at least one owner and no negative counts.")
+    return counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate fair-share dispatch of queued analyses against an in-process broker. "
+        "Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs",
+            default="200,5,5",
+            help="Queued runs per owner, comma-separated; earlier owners queue first.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Runs the simulated workers can process at once.",
+        )
+        parser.add_argument(
+            "--run-ticks",
+            type=int,
+            default=1,
+            help="Ticks each run keeps its worker busy.",
+        )
+        parser.add_argument(
+            "--owner-max-active",
+            type=int,
+            default=settings.ANALYSIS_OWNER_MAX_ACTIVE,
+            help="Overrides ANALYSIS_OWNER_MAX_ACTIVE.",
+        )
+        parser.add_argument(
+            "--dispatch-max-active",
+            type=int,
+            default=settings.ANALYSIS_DISPATCH_MAX_ACTIVE,
+            help="Overrides ANALYSIS_DISPATCH_MAX_ACTIVE.",
+        )
+
+    def handle(self, *args, **options):
+        run_counts = _parse_run_counts(options["runs"])
+        workers = max(1, int(options["workers"]))
+        run_ticks = max(1, int(options["run_ticks"]))
+        with override_settings(
+            ANALYSIS_OWNER_MAX_ACTIVE=options["owner_max_active"],
+            ANALYSIS_DISPATCH_MAX_ACTIVE=options["dispatch_max_active"],
+        ), transaction.atomic():
+            result = self._simulate(run_counts, workers, run_ticks)
+            transaction.set_rollback(True)
+        result["settings"] = {
+            "owner_max_active": options["owner_max_active"],
+            "dispatch_max_active": options["dispatch_max_active"],
+            "workers": workers,
+            "run_ticks": run_ticks,
+        }
+        self.stdout.write(json.dumps(result, indent=2, sort_keys=True))
+
+    def _simulate(self, run_counts: list[int], workers: int, run_ticks: int) -> dict:
+        prefix = f"dispatch-sim-{uuid.uuid4().hex[:8]}"
+        owner_labels = {}
+        for position, count in enumerate(run_counts):
+            owner = get_user_model().objects.create(username=f"{prefix}-{position}")
+            owner_labels[owner.id] = f"owner-{position}"
+            for index in range(count):
+                source = Source.objects.create(
+                    owner=owner,
+                    name=f"{prefix}-{position}-{index}.log",
+                    type=Source.SourceType.PASTE,
+                    content_text="simulated",
+                )
+                AnalysisRun.objects.create(source=source, status=AnalysisRun.Status.QUEUED)
+        run_owners = dict(
+            AnalysisRun.objects.filter(source__owner_id__in=owner_labels).values_list("id", "source__owner_id")
+        )
+
+        broker = LocalBroker()
+        running: dict[int, int] = {}
+        started_at_tick: dict[int, int] = {}
+        start_order: list[str] = []
+        max_active = {label: 0 for label in owner_labels.values()}
+        tick = 0
+        while True:
+            finished = [analysis_id for analysis_id, remaining in running.items() if remaining <= 0]
+            for analysis_id in finished:
+                del running[analysis_id]
+            if finished:
+                AnalysisRun.objects.filter(id__in=finished).update(
+                    status=AnalysisRun.Status.COMPLETED, finished_at=timezone.now()
+                )
+
+            # Only the scratch owners' runs: real pending runs stay where they are.
+            dispatch_pending_analyses(broker.send, owner_ids=owner_labels)
+            while len(running) < workers:
+                analysis_id = broker.receive()
+                if analysis_id is None:
+                    break
+                AnalysisRun.objects.filter(id=analysis_id).update(
+                    status=AnalysisRun.Status.RUNNING, started_at=timezone.now()
+                )
+                running[analysis_id] = run_ticks
+                started_at_tick[analysis_id] = tick
+                start_order.append(owner_labels[run_owners[analysis_id]])
+
+            active = {label: 0 for label in owner_labels.values()}
+            for analysis_id in list(running) + list(broker.messages):
+                active[owner_labels[run_owners[analysis_id]]] += 1
+            for label, count in active.items():
+                max_active[label] = max(max_active[label], count)
+
+            if not running and not broker.messages:
+                break
+            running = {analysis_id: remaining - 1 for analysis_id, remaining in running.items()}
+            tick += 1
+
+        owners = {}
+        for owner_id, label in owner_labels.items():
+            ticks = sorted(
+                started_at_tick[analysis_id]
+                for analysis_id, run_owner_id in run_owners.items()
+                if run_owner_id == owner_id and analysis_id in started_at_tick
+            )
+            owners[label] = {
+                "runs": len(ticks),
+                "first_start_tick": ticks[0] if ticks else None,
+                "last_start_tick": ticks[-1] if ticks else None,
+                "mean_start_tick": round(sum(ticks) / len(ticks), 2) if ticks else None,
+                "max_active": max_active[label],
+            }
+        return {"ticks": tick, "owners": owners, "start_order_head": start_order[:30]}
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-16 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0009_integrationconfig_workspacepreference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='checkpoint',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
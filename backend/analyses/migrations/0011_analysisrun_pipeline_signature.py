@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-16 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0010_analysisrun_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='pipeline_signature',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0011_analysisrun_pipeline_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='redaction_policy_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='redaction_policy_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
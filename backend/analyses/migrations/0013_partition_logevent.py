@@ -0,0 +1,108 @@
+from django.db import migrations
+
+TABLE = "analyses_logevent"
+LEGACY = "analyses_logevent_legacy"
+CURRENT = "analyses_logevent_current"
+HASH_PARTITIONS = 16
+
+
+def partition_log_events(apps, schema_editor):
+    """Turn analyses_logevent into a table partitioned by analysis_run_id.
+
+    The parent is range partitioned: the existing table is attached, without
+    copying rows, as the partition for all runs that exist now, and later runs go
+    to a partition that is itself split into a fixed number of hash partitions.
+    The parent takes over the original constraint and index names so later schema
+    migrations keep working. PostgreSQL only.
+
+    The CHECK constraint spares the attach its partition-bound scan and the
+    existing foreign key, unique constraint and indexes are reused, but the
+    primary key has to become (id, analysis_run_id): that index is built over
+    every existing row while the table is locked ACCESS EXCLUSIVE.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone()[0] == "p":
+            return
+
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f') ORDER BY conname",
+            [TABLE],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid) "
+            "ORDER BY i.relname",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM analyses_analysisrun")
+        upper_bound = int(cursor.fetchone()[0])
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {quote(TABLE)}")
+        next_id = int(cursor.fetchone()[0])
+
+        statements = [f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY)}"]
+        for position, (name, _) in enumerate(indexes):
+            statements.append(f"ALTER INDEX {quote(name)} RENAME TO {quote(f'{LEGACY}_idx{position}')}")
+        for position, (name, kind, _) in enumerate(constraints):
+            if kind == "p":
+                # Replaced by the parent's (id, analysis_run_id) key on attach.
+                statements.append(f"ALTER TABLE {quote(LEGACY)} DROP CONSTRAINT {quote(name)}")
+            else:
+                statements.append(
+                    f"ALTER TABLE {quote(LEGACY)} RENAME CONSTRAINT {quote(name)} "
+                    f"TO {quote(f'{LEGACY}_con{position}')}"
+                )
+        statements += [
+            # Partitioned tables cannot own identity columns; use a plain sequence.
+            f"ALTER TABLE {quote(LEGACY)} ALTER COLUMN id DROP IDENTITY IF EXISTS",
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(LEGACY)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (analysis_run_id)",
+            f"CREATE SEQUENCE {quote(TABLE + '_id_seq')} OWNED BY {quote(TABLE)}.id",
+            f"SELECT setval('{TABLE}_id_seq', {next_id}, false)",
+            f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')",
+        ]
+        for name, kind, definition in constraints:
+            if kind == "p":
+                # Unique constraints on a partitioned table must include the partition key.
+                definition = "PRIMARY KEY (id, analysis_run_id)"
+            statements.append(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+        for _, definition in indexes:
+            statements.append(definition)
+        statements += [
+            f"ALTER TABLE {quote(LEGACY)} ADD CONSTRAINT {quote(LEGACY + '_runs')} "
+            f"CHECK (analysis_run_id < {upper_bound})",
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(LEGACY)} "
+            f"FOR VALUES FROM (MINVALUE) TO ({upper_bound})",
+            f"CREATE TABLE {quote(CURRENT)} PARTITION OF {quote(TABLE)} "
+            f"FOR VALUES FROM ({upper_bound}) TO (MAXVALUE) PARTITION BY HASH (analysis_run_id)",
+        ]
+        for remainder in range(HASH_PARTITIONS):
+            statements.append(
+                f"CREATE TABLE {quote(f'{CURRENT}_{remainder:02d}')} PARTITION OF {quote(CURRENT)} "
+                f"FOR VALUES WITH (MODULUS {HASH_PARTITIONS}, REMAINDER {remainder})"
+            )
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyses", "0012_analysisrun_redaction_policy"),
+    ]
+
+    operations = [
+        # Not reversible in place: going back leaves the partitioned table, which
+        # the previous schema state still reads and writes correctly.
+        migrations.RunPython(partition_log_events, migrations.RunPython.noop),
+    ]
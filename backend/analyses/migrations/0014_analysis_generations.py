@@ -0,0 +1,49 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0013_partition_logevent'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='logcluster',
+            name='logcluster_unique_fingerprint_per_analysis',
+        ),
+        migrations.RemoveConstraint(
+            model_name='logevent',
+            name='logevent_unique_line_per_analysis',
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='active_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='latest_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logcluster',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logevent',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='logcluster',
+            constraint=models.UniqueConstraint(fields=('analysis_run', 'generation', 'fingerprint'), name='logcluster_unique_fingerprint_per_generation'),
+        ),
+        migrations.AddConstraint(
+            model_name='logevent',
+            constraint=models.UniqueConstraint(fields=('analysis_run', 'generation', 'line_no'), name='logevent_unique_line_per_generation'),
+        ),
+    ]
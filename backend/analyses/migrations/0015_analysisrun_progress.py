@@ -0,0 +1,38 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0014_analysis_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='progress_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='progress_lines',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='progress_stage',
+            field=models.CharField(blank=True, choices=[('ingesting', 'Ingesting'), ('clustering', 'Clustering'), ('insights', 'Generating insights')], default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='progress_total_bytes',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='progress_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
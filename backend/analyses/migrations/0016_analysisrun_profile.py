@@ -0,0 +1,23 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0015_analysisrun_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='profile_object_key',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='analysisrun',
+            name='profile_requested',
+            field=models.BooleanField(default=False),
+        ),
+    ]
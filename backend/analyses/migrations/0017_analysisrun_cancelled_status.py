@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0016_analysisrun_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisrun',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='queued', max_length=16),
+        ),
+    ]
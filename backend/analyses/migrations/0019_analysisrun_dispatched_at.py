@@ -0,0 +1,26 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:41
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_queued_runs_dispatched(apps, schema_editor):
+    # Runs queued before the dispatcher existed were sent to the broker already.
+    AnalysisRun = apps.get_model("analyses", "AnalysisRun")
+    AnalysisRun.objects.filter(status__in=["queued", "running"]).update(dispatched_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0018_analysisrun_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_queued_runs_dispatched, migrations.RunPython.noop),
+    ]
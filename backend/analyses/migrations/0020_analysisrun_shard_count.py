@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0019_analysisrun_dispatched_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='shard_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-17 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0020_analysisrun_shard_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='progress_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
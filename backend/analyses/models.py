@@ -11,6 +11,12 @@ class AnalysisRun(models.Model):
         RUNNING = "running", "Running"
         COMPLETED = "completed", "Completed"
         FAILED = "failed", "Failed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    class ProgressStage(models.TextChoices):
+        INGESTING = "ingesting", "Ingesting"
+        CLUSTERING = "clustering", "Clustering"
+        INSIGHTS = "insights", "Generating insights"
 
     source = models.ForeignKey(Source, on_delete=models.CASCADE, related_name="analyses")
     status = models.CharField(
@@ -22,6 +28,39 @@ class AnalysisRun(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
     stats = models.JSONField(default=dict, blank=True)
+    checkpoint = models.JSONField(default=dict, blank=True)
+    pipeline_signature = models.CharField(max_length=64, blank=True, default="")
+    # Policy the run's events were redacted under; blank when unknown or mixed.
+    redaction_policy_version = models.PositiveIntegerField(null=True, blank=True)
+    redaction_policy_hash = models.CharField(max_length=64, blank=True, default="")
+    # Events and clusters are written under latest_generation; readers only see
+    # active_generation, which is switched over when a run completes.
+    active_generation = models.PositiveIntegerField(default=0)
+    latest_generation = models.PositiveIntegerField(default=0)
+    # Live progress of a running analysis, published at most once per ingest batch.
+    progress_stage = models.CharField(max_length=16, choices=ProgressStage.choices, blank=True, default="")
+    progress_lines = models.PositiveBigIntegerField(default=0)
+    progress_bytes = models.PositiveBigIntegerField(default=0)
+    progress_total_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    progress_updated_at = models.DateTimeField(null=True, blank=True)
+    # When the counters above last started from zero, i.e. the last fresh claim;
+    # rates are measured from here rather than from the first start.
+    progress_started_at = models.DateTimeField(null=True, blank=True)
+    # Set when the fair-share dispatcher hands the run to the broker (see
+    # analyses.dispatch); queued runs without it are still waiting their turn.
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    # Stamped periodically while a worker holds the run; a stale heartbeat on a
+    # running run means its worker died (see tasks.reap_stale_analyses).
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Set when the run fans out into shard tasks, which may wait in the broker
+    # with nothing stamping the heartbeat; the reaper gives those runs longer.
+    shard_count = models.PositiveIntegerField(null=True, blank=True)
+    # Bumped whenever a worker claims the run, so an invocation given up on by
+    # the reaper can no longer write checkpoints once the run is requeued.
+    attempt = models.PositiveIntegerField(default=0)
+    # Profile analyze_source with cProfile and tracemalloc (see analyses.profiling).
+    profile_requested = models.BooleanField(default=False)
+    profile_object_key = models.CharField(max_length=1024, blank=True, default="")
     error_message = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -55,6 +94,7 @@ class LogEvent(models.Model):
         on_delete=models.CASCADE,
         related_name="log_events",
     )
+    generation = models.PositiveIntegerField(default=0)
     timestamp = models.DateTimeField(null=True, blank=True)
     level = models.CharField(max_length=16, default="unknown", db_index=True)
     service = models.CharField(max_length=128, blank=True, default="")
@@ -71,8 +111,8 @@ class LogEvent(models.Model):
         ordering = ["line_no"]
         constraints = [
             models.UniqueConstraint(
-                fields=["analysis_run", "line_no"],
-                name="logevent_unique_line_per_analysis",
+                fields=["analysis_run", "generation", "line_no"],
+                name="logevent_unique_line_per_generation",
             ),
         ]
         indexes = [
@@ -91,6 +131,7 @@ class LogCluster(models.Model):
         on_delete=models.CASCADE,
         related_name="clusters",
     )
+    generation = models.PositiveIntegerField(default=0)
     fingerprint = models.CharField(max_length=64, db_index=True)
     title = models.CharField(max_length=255)
     count = models.PositiveIntegerField()
@@ -104,8 +145,8 @@ class LogCluster(models.Model):
         ordering = ["-count", "fingerprint"]
         constraints = [
             models.UniqueConstraint(
-                fields=["analysis_run", "fingerprint"],
-                name="logcluster_unique_fingerprint_per_analysis",
+                fields=["analysis_run", "generation", "fingerprint"],
+                name="logcluster_unique_fingerprint_per_generation",
             ),
         ]
         indexes = [
@@ -0,0 +1,122 @@
+import re
+
+# Indented lines that belong to a stack trace: Java/JVM frames and their
+# "... N more" / "Suppressed:" markers, Python frames and the caret lines that
+# Python 3.11+ prints under the failing expression.
+_INDENTED_TRACE_PATTERN = re.compile(
+    r"^\s+(?:at\s|\.\.\.\s\d+\s+more\b|Suppressed:|Caused by:|File \")|^\s+[\^~]+\s*$"
+)
+_PYTHON_FRAME_PATTERN = re.compile(r'^\s+File "')
+_JAVA_FRAME_PATTERN = re.compile(r"^\s+at\s")
+_EXCEPTION_LINE_PATTERN = re.compile(
+    r"^(?:[A-Za-z_$][\w$]*\.)*[A-Za-z_$][\w$]*(?:Exception|Error|Throwable|Fault|Exit|Interrupt)\b(?::|$)"
+)
+_CONTINUATION_PREFIXES = ("Caused by:", "Traceback (most recent call last):")
+
+
+def _is_indented(line: str | None) -> bool:
+    return line is not None and line[:1] in (" ", "\t") and bool(line.strip())
+
+
+def is_continuation_line(prev_line: str | None, line: str, next_line: str | None) -> bool:
+    """Whether ``line`` continues the event that ``prev_line`` belongs to.
+
+    The decision only looks at the neighbouring lines, never at how long the
+    current event already is, so a shard boundary placed on a line for which this
+    returns ``False`` splits events exactly where a serial pass would.
+    """
+    if line[:1] in (" ", "\t"):
+        if _INDENTED_TRACE_PATTERN.match(line):
+            return True
+        # Python prints the source line of each frame indented under it.
+        return prev_line is not None and bool(_PYTHON_FRAME_PATTERN.match(prev_line)) and bool(line.strip())
+    if line.startswith(_CONTINUATION_PREFIXES):
+        return True
+    if _EXCEPTION_LINE_PATTERN.match(line):
+        # Python's final "ValueError: ..." line follows the last frame, while a
+        # Java exception header is followed by its first "at" frame.
+        return _is_indented(prev_line) or (
+            next_line is not None and bool(_JAVA_FRAME_PATTERN.match(next_line))
+        )
+    return False
+
+
+_NO_EVENTS: tuple = ()
+
+
+class EventAssembler:
+    """Group physical lines into events, attaching stack-trace continuation lines.
+
+    Lines are pushed one at a time and completed events come back as
+    ``(line_no, lines, line_count)`` tuples, where ``line_no`` is the event's first
+    line. Each line is held back until the next one arrives (one line of
+    lookahead). Events keep at most ``max_event_lines`` lines of text; further
+    continuation lines are still consumed and counted in ``line_count``.
+    """
+
+    def __init__(self, *, enabled: bool, max_event_lines: int, state: dict | None = None):
+        self.enabled = enabled
+        self.max_event_lines = max(1, max_event_lines)
+        state = state or {}
+        self.prev_line: str | None = state.get("prev_line")
+        held = state.get("held")
+        self.held: tuple[int, str] | None = tuple(held) if held else None
+        event = state.get("event")
+        self.event: tuple[int, list[str], int] | None = (
+            (event["line_no"], event["lines"], event["line_count"]) if event else None
+        )
+
+    def state(self) -> dict:
+        return {
+            "prev_line": self.prev_line,
+            "held": list(self.held) if self.held else None,
+            "event": (
+                {"line_no": self.event[0], "lines": self.event[1], "line_count": self.event[2]}
+                if self.event
+                else None
+            ),
+        }
+
+    def pending_line_no(self) -> int | None:
+        """First line number not yet returned as part of a completed event."""
+        if self.event is not None:
+            return self.event[0]
+        if self.held is not None:
+            return self.held[0]
+        return None
+
+    def push(self, line_no: int, line: str):
+        if not self.enabled:
+            return ((line_no, [line], 1),)
+        held = self.held
+        self.held = (line_no, line)
+        if held is None:
+            return _NO_EVENTS
+        return self._place(held, line)
+
+    def finish(self):
+        if not self.enabled:
+            return _NO_EVENTS
+        completed = []
+        if self.held is not None:
+            completed.extend(self._place(self.held, None))
+            self.held = None
+        if self.event is not None:
+            completed.append(self.event)
+            self.event = None
+        return completed
+
+    def _place(self, held: tuple[int, str], next_line: str | None):
+        line_no, line = held
+        event = self.event
+        prev_line = self.prev_line
+        self.prev_line = line
+        if event is not None and is_continuation_line(prev_line, line, next_line):
+            event_line_no, lines, line_count = event
+            if len(lines) < self.max_event_lines:
+                lines.append(line)
+            self.event = (event_line_no, lines, line_count + 1)
+            return _NO_EVENTS
+
+        self.event = (line_no, [line], 1)
+        return (event,) if event is not None else _NO_EVENTS
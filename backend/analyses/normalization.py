@@ -1,16 +1,20 @@
 import hashlib
 import re
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 from django.utils.dateparse import parse_datetime
 
-from analyses.redaction import redact_text
+from analyses.redaction import CachingRedactor, Redactor
 
 
 _NUMBER_PATTERN = re.compile(r"\d+")
 _EXCEPTION_PATTERN = re.compile(
     r"\b([A-Z][A-Za-z0-9_]*(?:Exception|Error|Fault))\b"
 )
+_PYTHON_FRAME_PATTERN = re.compile(r'^\s+File "([^"]+)", line \d+, in (.+)$')
+_JAVA_FRAME_PATTERN = re.compile(r"^\s+at\s+([^\s(]+)")
+TRACE_FINGERPRINT_FRAMES = 3
 
 
 def _normalize_message_for_fingerprint(message: str) -> str:
@@ -32,31 +36,215 @@ def compute_fingerprint(level: str, service: str, message: str) -> str:
     return hashlib.sha256(base.encode("utf-8")).hexdigest()[:32]
 
 
+def extract_trace_signature(lines: list[str]) -> tuple[str, list[str]] | None:
+    """Return the exception type and the frames nearest the raise for a stack trace.
+
+    Python tracebacks list the innermost frame last and end with the exception
+    line; Java traces start with the exception header and the innermost frame.
+    Line numbers are left out so the signature survives unrelated edits.
+    """
+    continuation = lines[1:]
+    python_frames = []
+    java_frames = []
+    for line in continuation:
+        python_match = _PYTHON_FRAME_PATTERN.match(line)
+        if python_match:
+            python_frames.append(f"{python_match.group(1)}:{python_match.group(2)}")
+            continue
+        java_match = _JAVA_FRAME_PATTERN.match(line)
+        if java_match:
+            java_frames.append(java_match.group(1))
+
+    if python_frames:
+        frames = python_frames[-TRACE_FINGERPRINT_FRAMES:]
+        header_lines = reversed(continuation)
+    elif java_frames:
+        frames = java_frames[:TRACE_FINGERPRINT_FRAMES]
+        header_lines = iter(continuation)
+    else:
+        return None
+
+    exception_type = "none"
+    for line in header_lines:
+        if line[:1] in (" ", "\t"):
+            continue
+        exception_type = extract_exception_type(line)
+        if exception_type != "none":
+            break
+    if exception_type == "none":
+        exception_type = extract_exception_type(lines[0])
+    return exception_type, frames
+
+
+def compute_trace_fingerprint(exception_type: str, frames: list[str]) -> str:
+    base = "|".join([exception_type, *frames])
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:32]
+
+
+_MONTH_ABBREVIATIONS = {
+    name: index
+    for index, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"),
+        start=1,
+    )
+}
+TIMESTAMP_CACHE_SIZE = 4096
+
+
+def _strptime_or_none(candidate: str, fmt: str) -> datetime | None:
+    try:
+        return datetime.strptime(candidate, fmt)
+    except ValueError:
+        return None
+
+
+def _parse_iso_timestamp(candidate: str) -> datetime | None:
+    try:
+        return datetime.fromisoformat(candidate)
+    except ValueError:
+        return None
+
+
+def _parse_django_timestamp(candidate: str) -> datetime | None:
+    # parse_datetime raises for well-formed but impossible values (month 13);
+    # treat those like any other unparseable timestamp.
+    try:
+        return parse_datetime(candidate)
+    except ValueError:
+        return None
+
+
+def _parse_space_timestamp(candidate: str) -> datetime | None:
+    return _strptime_or_none(candidate, "%Y-%m-%d %H:%M:%S")
+
+
+def _parse_nginx_error_timestamp(candidate: str) -> datetime | None:
+    # Fixed-width "YYYY/MM/DD HH:MM:SS" is sliced by hand; anything looser goes
+    # through strptime so the accepted inputs stay exactly the same.
+    if (
+        len(candidate) == 19
+        and candidate[4] == "/"
+        and candidate[7] == "/"
+        and candidate[10] == " "
+        and candidate[13] == ":"
+        and candidate[16] == ":"
+    ):
+        digits = candidate[0:4] + candidate[5:7] + candidate[8:10] + candidate[11:13] + candidate[14:16] + candidate[17:19]
+        if digits.isascii() and digits.isdigit():
+            try:
+                return datetime(
+                    int(candidate[0:4]),
+                    int(candidate[5:7]),
+                    int(candidate[8:10]),
+                    int(candidate[11:13]),
+                    int(candidate[14:16]),
+                    int(candidate[17:19]),
+                )
+            except ValueError:
+                pass
+    return _strptime_or_none(candidate, "%Y/%m/%d %H:%M:%S")
+
+
+@lru_cache(maxsize=64)
+def _utc_offset(value: str) -> timezone:
+    # "+HHMM" / "-HHMM"; minutes past 59 are rejected like strptime's %z.
+    hours, minutes = int(value[1:3]), int(value[3:5])
+    if minutes >= 60:
+        raise ValueError(f"invalid UTC offset {value!r}")
+    offset = timedelta(hours=hours, minutes=minutes)
+    return timezone(-offset if value[0] == "-" else offset)
+
+
+def _parse_nginx_access_timestamp(candidate: str) -> datetime | None:
+    # Fixed-width "DD/Mon/YYYY:HH:MM:SS +HHMM", avoiding strptime's slow %b/%z.
+    if (
+        len(candidate) == 26
+        and candidate[2] == "/"
+        and candidate[6] == "/"
+        and candidate[11] == ":"
+        and candidate[14] == ":"
+        and candidate[17] == ":"
+        and candidate[20] == " "
+        and candidate[21] in "+-"
+    ):
+        month = _MONTH_ABBREVIATIONS.get(candidate[3:6].lower())
+        digits = candidate[0:2] + candidate[7:11] + candidate[12:14] + candidate[15:17] + candidate[18:20] + candidate[22:26]
+        if month is not None and digits.isascii() and digits.isdigit():
+            try:
+                return datetime(
+                    int(candidate[7:11]),
+                    month,
+                    int(candidate[0:2]),
+                    int(candidate[12:14]),
+                    int(candidate[15:17]),
+                    int(candidate[18:20]),
+                    tzinfo=_utc_offset(candidate[21:26]),
+                )
+            except ValueError:
+                pass
+    return _strptime_or_none(candidate, "%d/%b/%Y:%H:%M:%S %z")
+
+
+# Tried in order; the first layout that parses wins.
+_TIMESTAMP_LAYOUTS = (
+    ("iso", _parse_iso_timestamp),
+    ("django", _parse_django_timestamp),
+    ("space", _parse_space_timestamp),
+    ("nginx_error", _parse_nginx_error_timestamp),
+    ("nginx_access", _parse_nginx_access_timestamp),
+)
+# Layouts no earlier layout can parse, so trying them first cannot change a result.
+_LOCKABLE_TIMESTAMP_LAYOUTS = {"iso", "nginx_error", "nginx_access"}
+
+
+def _with_default_timezone(parsed: datetime) -> datetime:
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class TimestampParser:
+    """Timestamp parser for one source that locks onto the layout that last worked.
+
+    Results are memoized per distinct string, since bursty logs repeat the same
+    second-resolution timestamp on many consecutive lines.
+    """
+
+    def __init__(self, cache_size: int = TIMESTAMP_CACHE_SIZE):
+        self.locked_layout: str | None = None
+        self._locked_func = None
+        self._parse_candidate = lru_cache(maxsize=cache_size)(self._parse_uncached)
+
+    def parse(self, value) -> datetime | None:
+        if not value:
+            return None
+        return self._parse_candidate(str(value).strip())
+
+    def _parse_uncached(self, candidate: str) -> datetime | None:
+        if self._locked_func is not None:
+            parsed = self._locked_func(candidate)
+            if parsed is not None:
+                return _with_default_timezone(parsed)
+
+        for name, layout in _TIMESTAMP_LAYOUTS:
+            parsed = layout(candidate)
+            if parsed is not None:
+                if name in _LOCKABLE_TIMESTAMP_LAYOUTS:
+                    self.locked_layout = name
+                    self._locked_func = layout
+                return _with_default_timezone(parsed)
+        return None
+
+
 def parse_timestamp_value(value: str | None):
     if not value:
         return None
 
     candidate = str(value).strip()
-    parsed = parse_datetime(candidate)
-    if parsed is not None:
-        if parsed.tzinfo is None:
-            return parsed.replace(tzinfo=timezone.utc)
-        return parsed
-
-    formats = [
-        "%Y-%m-%d %H:%M:%S",
-        "%Y/%m/%d %H:%M:%S",
-        "%d/%b/%Y:%H:%M:%S %z",
-    ]
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(candidate, fmt)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt
-        except ValueError:
-            continue
-
+    for _, layout in _TIMESTAMP_LAYOUTS:
+        parsed = layout(candidate)
+        if parsed is not None:
+            return _with_default_timezone(parsed)
     return None
 
 
@@ -66,7 +254,11 @@ def normalize_event_fields(
     raw_line: str,
     parsed: dict,
     parser_name: str,
+    timestamp_parser: TimestampParser | None = None,
+    redactor: Redactor | CachingRedactor | None = None,
 ) -> dict:
+    redact_text = (redactor or Redactor.from_settings()).redact
+
     def _redact_optional(value: str | None) -> tuple[str | None, int, set[str]]:
         if not value:
             return None, 0, set()
@@ -77,11 +269,22 @@ def normalize_event_fields(
     level = str(parsed.get("level") or "unknown").lower()
     service = str(parsed.get("service") or "").strip()
     message = str(parsed.get("message") or raw_line)
-    timestamp = parse_timestamp_value(parsed.get("timestamp"))
+    if timestamp_parser is not None:
+        timestamp = timestamp_parser.parse(parsed.get("timestamp"))
+    else:
+        timestamp = parse_timestamp_value(parsed.get("timestamp"))
     trace_id = parsed.get("trace_id")
     request_id = parsed.get("request_id")
     redacted_message, message_redaction_count, message_redaction_types = redact_text(message)
-    redacted_raw, raw_redaction_count, raw_redaction_types = redact_text(raw_line)
+    if raw_line == message:
+        # Single-line text and unparsed events carry the whole line as message.
+        redacted_raw, raw_redaction_count, raw_redaction_types = (
+            redacted_message,
+            message_redaction_count,
+            message_redaction_types,
+        )
+    else:
+        redacted_raw, raw_redaction_count, raw_redaction_types = redact_text(raw_line)
     redacted_trace_id, trace_redaction_count, trace_redaction_types = _redact_optional(
         str(trace_id) if trace_id else None
     )
@@ -101,6 +304,15 @@ def normalize_event_fields(
         | trace_redaction_types
         | request_redaction_types
     )
+    fingerprint = None
+    if "\n" in redacted_raw:
+        trace_signature = extract_trace_signature(redacted_raw.split("\n"))
+        if trace_signature is not None:
+            exception_type, frames = trace_signature
+            fingerprint = compute_trace_fingerprint(exception_type, frames)
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(level, service, redacted_message)
+
     tags = {"parser": parser_name}
     if total_redactions > 0:
         tags["redaction_count"] = total_redactions
@@ -112,7 +324,7 @@ def normalize_event_fields(
         "service": service,
         "message": redacted_message,
         "raw": redacted_raw,
-        "fingerprint": compute_fingerprint(level, service, redacted_message),
+        "fingerprint": fingerprint,
         "trace_id": redacted_trace_id,
         "request_id": redacted_request_id,
         "line_no": line_no,
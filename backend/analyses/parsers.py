@@ -1,6 +1,13 @@
 import json
+import logging
 import re
-from typing import Any
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 _LEVEL_MAP = {
@@ -54,9 +61,57 @@ def _normalize_level(value: Any) -> str:
     return _LEVEL_MAP.get(normalized, "unknown")
 
 
+@dataclass(frozen=True)
+class JsonBackend:
+    name: str
+    loads: Callable[[str], Any]
+
+
+def _orjson_backend() -> JsonBackend | None:
+    try:
+        import orjson
+    except ImportError:
+        return None
+
+    def loads(line: str) -> Any:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # orjson rejects a few inputs stdlib accepts (NaN, huge ints, lone
+            # surrogates); retry so both backends accept exactly the same lines.
+            return json.loads(line)
+
+    return JsonBackend(name="orjson", loads=loads)
+
+
+_STDLIB_JSON_BACKEND = JsonBackend(name="stdlib", loads=json.loads)
+
+
+@lru_cache(maxsize=1)
+def get_json_backend() -> JsonBackend:
+    preferred = settings.ANALYSIS_JSON_DECODER
+    if preferred in {"auto", "orjson"}:
+        backend = _orjson_backend()
+        if backend is not None:
+            return backend
+        if preferred == "orjson":
+            logger.warning("ANALYSIS_JSON_DECODER=orjson but orjson is not installed; using stdlib json")
+    return _STDLIB_JSON_BACKEND
+
+
+def _may_be_json_object(line: str) -> bool:
+    # json.loads skips leading whitespace, so only fall back to lstrip() for it.
+    first = line[:1]
+    if first == "{":
+        return True
+    return first.isspace() and line.lstrip()[:1] == "{"
+
+
 def parse_json_log_line(line: str) -> dict[str, Any] | None:
+    if not _may_be_json_object(line):
+        return None
     try:
-        parsed = json.loads(line)
+        parsed = get_json_backend().loads(line)
     except json.JSONDecodeError:
         return None
 
@@ -81,11 +136,7 @@ def parse_json_log_line(line: str) -> dict[str, Any] | None:
     }
 
 
-def parse_timestamp_level_text_line(line: str) -> dict[str, Any] | None:
-    match = _TIMESTAMP_LEVEL_PATTERN.match(line) or _BRACKETED_PATTERN.match(line)
-    if not match:
-        return None
-
+def _text_line_result(match: re.Match[str], line: str) -> dict[str, Any]:
     timestamp = match.group("timestamp")
     level = _normalize_level(match.group("level"))
     rest = match.group("rest").strip()
@@ -109,41 +160,177 @@ def parse_timestamp_level_text_line(line: str) -> dict[str, Any] | None:
     }
 
 
+def _nginx_access_result(match: re.Match[str], line: str) -> dict[str, Any]:
+    status_code = int(match.group("status"))
+    if status_code >= 500:
+        level = "error"
+    elif status_code >= 400:
+        level = "warn"
+    else:
+        level = "info"
+
+    method = match.group("method")
+    path = match.group("path")
+    message = f"{method} {path} -> {status_code}"
+
+    return {
+        "timestamp": match.group("timestamp"),
+        "level": level,
+        "service": "nginx",
+        "message": message,
+        "trace_id": None,
+        "request_id": None,
+        "raw": line,
+    }
+
+
+def _nginx_error_result(match: re.Match[str], line: str) -> dict[str, Any]:
+    return {
+        "timestamp": match.group("timestamp"),
+        "level": _normalize_level(match.group("level")),
+        "service": "nginx",
+        "message": match.group("message"),
+        "trace_id": None,
+        "request_id": None,
+        "raw": line,
+    }
+
+
+# The text and nginx matchers dispatch on the line's leading characters so each
+# line is scanned by a single pattern: ``[`` -> bracketed text, ``YYYY-`` ->
+# timestamp/level text, ``YYYY/`` -> nginx error log, anything else (an IP or
+# hostname) -> nginx access log. Every other pattern is anchored on a prefix the
+# line does not have, so the results equal trying all four in cascade order.
+
+
+def parse_timestamp_level_text_line(line: str) -> dict[str, Any] | None:
+    if line[:1] == "[":
+        match = _BRACKETED_PATTERN.match(line)
+    elif line[4:5] == "-":
+        match = _TIMESTAMP_LEVEL_PATTERN.match(line)
+    else:
+        return None
+    if not match:
+        return None
+    return _text_line_result(match, line)
+
+
 def parse_nginx_log_line(line: str) -> dict[str, Any] | None:
-    access_match = _NGINX_ACCESS_PATTERN.match(line)
-    if access_match:
-        status_code = int(access_match.group("status"))
-        if status_code >= 500:
-            level = "error"
-        elif status_code >= 400:
-            level = "warn"
-        else:
-            level = "info"
-
-        method = access_match.group("method")
-        path = access_match.group("path")
-        message = f"{method} {path} -> {status_code}"
-
-        return {
-            "timestamp": access_match.group("timestamp"),
-            "level": level,
-            "service": "nginx",
-            "message": message,
-            "trace_id": None,
-            "request_id": None,
-            "raw": line,
-        }
+    if line[4:5] != "/":
+        access_match = _NGINX_ACCESS_PATTERN.match(line)
+        return _nginx_access_result(access_match, line) if access_match else None
 
     error_match = _NGINX_ERROR_PATTERN.match(line)
+    # The access pattern takes precedence but needs a ``[`` at the fourth token,
+    # which for an error line is the start of its message.
+    if error_match is None or error_match.group("message")[:1] == "[":
+        access_match = _NGINX_ACCESS_PATTERN.match(line)
+        if access_match:
+            return _nginx_access_result(access_match, line)
     if error_match:
-        return {
-            "timestamp": error_match.group("timestamp"),
-            "level": _normalize_level(error_match.group("level")),
-            "service": "nginx",
-            "message": error_match.group("message"),
-            "trace_id": None,
-            "request_id": None,
-            "raw": line,
-        }
-
+        return _nginx_error_result(error_match, line)
     return None
+
+
+LINE_PARSERS = (
+    ("json", parse_json_log_line),
+    ("text", parse_timestamp_level_text_line),
+    ("nginx", parse_nginx_log_line),
+)
+_LINE_PARSER_FUNCS = dict(LINE_PARSERS)
+
+
+def _unparsed_line(line: str) -> dict[str, Any]:
+    return {
+        "timestamp": None,
+        "level": "unknown",
+        "service": None,
+        "message": line,
+        "trace_id": None,
+        "request_id": None,
+        "raw": line,
+    }
+
+
+def _earlier_parser_may_match(parser_name: str, line: str) -> bool:
+    """Whether a parser ahead of ``parser_name`` in the cascade could claim ``line``.
+
+    JSON objects must start with ``{`` (json.loads also skips leading whitespace)
+    and both text patterns are anchored on ``[`` or a ``YYYY-`` date, so any other
+    first character rules the earlier parsers out without running them.
+    """
+    if parser_name == "json":
+        return False
+    first = line[:1]
+    if not first or first == "{" or first.isspace():
+        return True
+    if parser_name == "nginx":
+        return first == "[" or (line[4:5] == "-" and line[:4].isdigit())
+    return False
+
+
+def detect_dominant_parser(sample_lines) -> str | None:
+    """Return the parser that claims the most sample lines under the full cascade."""
+    hits: dict[str, int] = {}
+    for line in sample_lines:
+        for name, parser in LINE_PARSERS:
+            if parser(line) is not None:
+                hits[name] = hits.get(name, 0) + 1
+                break
+    if not hits:
+        return None
+    return max(hits, key=hits.get)
+
+
+def new_parser_detection_stats(locked_parser: str | None, sample_lines: int) -> dict[str, Any]:
+    return {
+        "locked_parser": locked_parser,
+        "sample_lines": sample_lines,
+        "fast_path_hits": 0,
+        "fast_path_misses": 0,
+        "parsers": {name: {"hits": 0, "misses": 0} for name, _ in LINE_PARSERS},
+    }
+
+
+class LockedLineParser:
+    """Try the detected parser first and fall back to the ordered cascade on a miss.
+
+    Results are identical to running the cascade on every line: the fast path is
+    skipped whenever a parser earlier in the cascade could also match the line.
+    Hit/miss counters are written into the ``detection_stats`` dict in place.
+    """
+
+    def __init__(self, detection_stats: dict[str, Any]):
+        self.detection_stats = detection_stats
+        self.counters = detection_stats["parsers"]
+        self.locked_parser = detection_stats.get("locked_parser")
+        self.locked_func = _LINE_PARSER_FUNCS.get(self.locked_parser)
+        names = [name for name, _ in LINE_PARSERS]
+        self.cascade_after_locked = (
+            LINE_PARSERS[names.index(self.locked_parser) + 1 :] if self.locked_func is not None else LINE_PARSERS
+        )
+
+    def parse(self, line: str) -> tuple[dict[str, Any], str]:
+        locked_parser = self.locked_parser
+        if self.locked_func is not None and not _earlier_parser_may_match(locked_parser, line):
+            parsed = self.locked_func(line)
+            if parsed is not None:
+                self.counters[locked_parser]["hits"] += 1
+                self.detection_stats["fast_path_hits"] += 1
+                return parsed, locked_parser
+            # Earlier parsers were already ruled out, so resume the cascade after it.
+            self.counters[locked_parser]["misses"] += 1
+            self.detection_stats["fast_path_misses"] += 1
+            cascade = self.cascade_after_locked
+        else:
+            if self.locked_func is not None:
+                self.detection_stats["fast_path_misses"] += 1
+            cascade = LINE_PARSERS
+
+        for name, parser in cascade:
+            parsed = parser(line)
+            if parsed is not None:
+                self.counters[name]["hits"] += 1
+                return parsed, name
+            self.counters[name]["misses"] += 1
+        return _unparsed_line(line), "raw"
@@ -0,0 +1,189 @@
+# Per-stage instrumentation for the analysis pipeline. Stages are accumulated in
+# stats["perf"]["stages"] as {"wall_seconds", "cpu_seconds", "rows", "bytes",
+# "calls"}; stages timed per event inside hot loops only record wall time and
+# leave cpu_seconds null. With the threaded pipeline, QUEUE_WAIT_STAGES add the
+# wall time each thread spent blocked on its queues.
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, Iterator
+
+from django.conf import settings
+
+# Reader thread waiting for room in the transform queue, transform (ingest)
+# thread waiting for batches or for room in the writer queue, and writer thread
+# waiting for rows.
+QUEUE_WAIT_STAGES = ("read_wait", "transform_wait", "insert_wait")
+
+
+def _new_stage() -> dict:
+    return {"wall_seconds": 0.0, "cpu_seconds": None, "rows": 0, "bytes": 0, "calls": 0}
+
+
+class PerfRecorder:
+    """Accumulate wall time, CPU time, rows and bytes per named stage.
+
+    Entries live in the ``stages`` dict handed in, normally a run's
+    ``stats["perf"]["stages"]``, so checkpoints and shard results carry them
+    along with the other stats. CPU time is the calling thread's, which keeps
+    the reader and writer threads of the ingest pipeline apart.
+    """
+
+    enabled = True
+
+    def __init__(self, stages: dict | None = None):
+        self.stages = stages if stages is not None else {}
+
+    def register(self, *names: str) -> None:
+        # Create entries up front: other threads may add to them while the
+        # stats are being copied into a checkpoint.
+        for name in names:
+            self.stages.setdefault(name, _new_stage())
+
+    def add(
+        self,
+        stage: str,
+        *,
+        wall_seconds: float = 0.0,
+        cpu_seconds: float | None = None,
+        rows: int = 0,
+        byte_count: int = 0,
+        calls: int = 1,
+    ) -> None:
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = _new_stage()
+        entry["wall_seconds"] = round(entry["wall_seconds"] + wall_seconds, 6)
+        if cpu_seconds is not None:
+            entry["cpu_seconds"] = round((entry["cpu_seconds"] or 0.0) + cpu_seconds, 6)
+        entry["rows"] += rows
+        entry["bytes"] += byte_count
+        entry["calls"] += calls
+
+    @contextmanager
+    def measure(self, stage: str, *, rows: int = 0, byte_count: int = 0) -> Iterator[None]:
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(
+                stage,
+                wall_seconds=time.perf_counter() - wall_started,
+                cpu_seconds=time.thread_time() - cpu_started,
+                rows=rows,
+                byte_count=byte_count,
+            )
+
+    def merge(self, stages: dict) -> None:
+        for name, entry in stages.items():
+            self.add(
+                name,
+                wall_seconds=entry["wall_seconds"],
+                cpu_seconds=entry.get("cpu_seconds"),
+                rows=entry["rows"],
+                byte_count=entry["bytes"],
+                calls=entry["calls"],
+            )
+
+
+class _DisabledPerfRecorder(PerfRecorder):
+    enabled = False
+
+    def register(self, *names: str) -> None:
+        pass
+
+    def add(self, stage: str, **counters) -> None:
+        pass
+
+    def measure(self, stage: str, **counters):
+        return nullcontext()
+
+    def merge(self, stages: dict) -> None:
+        pass
+
+
+DISABLED_PERF_RECORDER = _DisabledPerfRecorder()
+
+
+def measured_batches(batches: Iterable) -> Iterator[tuple[list, int, float, float]]:
+    """Yield ``(lines, end_offset, wall_seconds, cpu_seconds)`` for each batch pulled from ``batches``.
+
+    Nothing is recorded here: the batches may be read ahead on another thread,
+    and only the ones actually consumed should be added to a recorder.
+    """
+    iterator = iter(batches)
+    try:
+        while True:
+            wall_started = time.perf_counter()
+            cpu_started = time.thread_time()
+            try:
+                lines, end_offset = next(iterator)
+            except StopIteration:
+                return
+            yield (
+                lines,
+                end_offset,
+                time.perf_counter() - wall_started,
+                time.thread_time() - cpu_started,
+            )
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def new_perf_recorder(stats: dict) -> PerfRecorder:
+    """Recorder writing into ``stats["perf"]["stages"]``, or a no-op one when disabled."""
+    if not settings.ANALYSIS_PERF_ENABLED:
+        return DISABLED_PERF_RECORDER
+    return PerfRecorder(stats.setdefault("perf", {}).setdefault("stages", {}))
+
+
+class EventClock:
+    """Wall-clock totals for stages timed once per event, folded into a recorder per batch.
+
+    Plain attribute additions keep the cost per event to a few ``perf_counter``
+    calls; entering a ``measure`` block for every event would not be negligible.
+    """
+
+    __slots__ = ("parse", "normalize", "redact", "events", "cluster", "clustered")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.parse = 0.0
+        self.normalize = 0.0
+        self.redact = 0.0
+        self.events = 0
+        self.cluster = 0.0
+        self.clustered = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "parse": self.parse,
+            "normalize": self.normalize,
+            "redact": self.redact,
+            "events": self.events,
+            "cluster": self.cluster,
+            "clustered": self.clustered,
+        }
+
+    def fold_into(self, perf: PerfRecorder) -> None:
+        add_event_timings(perf, self.as_dict())
+        self.reset()
+
+
+def add_event_timings(perf: PerfRecorder, timings: dict) -> None:
+    events = timings["events"]
+    if events:
+        # Redaction runs inside normalization; report normalization without it.
+        perf.add("parse", wall_seconds=timings["parse"], rows=events, calls=events)
+        perf.add("normalize", wall_seconds=timings["normalize"] - timings["redact"], rows=events, calls=events)
+        perf.add("redact", wall_seconds=timings["redact"], rows=events, calls=events)
+    # Counted apart: with a parse pool, events are normalized in the workers but
+    # clustered in the ingest process.
+    clustered = timings["clustered"]
+    if clustered:
+        perf.add("cluster", wall_seconds=timings["cluster"], rows=clustered, calls=clustered)
@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+from django.db import connections, transaction
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class StageTimer:
+    """Time one pipeline stage spent blocked on a queue, waiting for its neighbours.
+
+    The work itself is timed by the stages of ``analyses.perf.PerfRecorder``.
+    """
+
+    def __init__(self):
+        self.idle_seconds = 0.0
+
+
+def _put(target: queue.Queue, item, stop: threading.Event, timer: StageTimer) -> bool:
+    started = time.perf_counter()
+    try:
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+    finally:
+        timer.idle_seconds += time.perf_counter() - started
+
+
+class BackgroundReader:
+    """Reader stage: drain an iterator on a background thread into a bounded queue.
+
+    Exceptions raised by the iterator (truncation, unreadable sources) are handed
+    over and re-raised in the consuming thread at the point the next item would
+    have been returned, so callers handle them exactly as with the bare iterator.
+    """
+
+    def __init__(self, items: Iterable, *, queue_size: int, consumer_timer: StageTimer):
+        self.timer = StageTimer()
+        self.consumer_timer = consumer_timer
+        self._items = items
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ingest-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        iterator = iter(self._items)
+        try:
+            for item in iterator:
+                if not _put(self._queue, (item, None), self._stop, self.timer):
+                    return
+            _put(self._queue, (_DONE, None), self._stop, self.timer)
+        except BaseException as exc:  # noqa: BLE001 - re-raised in the consumer
+            _put(self._queue, (_DONE, exc), self._stop, self.timer)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def __iter__(self) -> Iterator:
+        while True:
+            started = time.perf_counter()
+            item, error = self._queue.get()
+            self.consumer_timer.idle_seconds += time.perf_counter() - started
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class BackgroundWriter:
+    """Writer stage: batch rows and write them on a background thread.
+
+    ``commit(callback)`` queues a callback that runs in a transaction after every
+    row queued before it has been written, which keeps checkpoints behind the
+    rows they cover. Write errors are raised in the producing thread on its next
+    call.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[list], None],
+        *,
+        batch_size: int,
+        queue_size: int,
+        producer_timer: StageTimer,
+    ):
+        self.timer = StageTimer()
+        self.producer_timer = producer_timer
+        self.pending: list = []
+        self._write_batch = write_batch
+        self._batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                started = time.perf_counter()
+                kind, payload = self._queue.get()
+                self.timer.idle_seconds += time.perf_counter() - started
+                try:
+                    if kind is _DONE:
+                        return
+                    if self._error is not None or self._stop.is_set():
+                        continue
+                    if kind == "rows":
+                        self._write_batch(payload)
+                    else:
+                        with transaction.atomic():
+                            payload()
+                except BaseException as exc:  # noqa: BLE001 - re-raised in the producer
+                    self._error = exc
+                finally:
+                    self._queue.task_done()
+        finally:
+            connections.close_all()
+
+    def _send(self, kind, payload) -> None:
+        self._raise_error()
+        if not _put(self._queue, (kind, payload), self._stop, self.producer_timer):
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def add(self, row) -> None:
+        self.pending.append(row)
+        if len(self.pending) >= self._batch_size:
+            self._send("rows", self.pending)
+            self.pending = []
+
+    def commit(self, callback: Callable[[], None]) -> None:
+        if self.pending:
+            self._send("rows", self.pending)
+            self.pending = []
+        self._send("call", callback)
+
+    def flush(self) -> None:
+        """Write everything queued so far and wait for it to land."""
+        if self.pending:
+            self._send("rows", self.pending)
+            self.pending = []
+        started = time.perf_counter()
+        self._queue.join()
+        self.producer_timer.idle_seconds += time.perf_counter() - started
+        self._raise_error()
+
+    def close(self, *, abandon: bool = False) -> None:
+        if abandon:
+            self._stop.set()
+        self._queue.put((_DONE, None))
+        self._thread.join()
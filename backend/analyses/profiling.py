@@ -0,0 +1,229 @@
+# Opt-in profiling of analyze_source: cProfile plus tracemalloc, saved as a zip
+# artifact in storage and linked from AnalysisRun.profile_object_key.
+
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+import tracemalloc
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from django.utils import timezone
+
+from analyses.models import AnalysisRun
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOP_FUNCTIONS = 60
+PROFILE_TOP_ALLOCATIONS = 30
+PROFILE_TRACEMALLOC_FRAMES = 5
+# Take a new allocation snapshot once the traced heap has grown by this factor.
+_SNAPSHOT_GROWTH = 1.1
+
+
+class _Capture:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.snapshot_bytes = 0
+
+
+_active_capture: _Capture | None = None
+
+
+def profiling_requested(analysis_id: int) -> bool:
+    # Duplicate deliveries for running or completed runs return straight away
+    # and must not replace the profile of the invocation that did the work.
+    runs = AnalysisRun.objects.filter(id=analysis_id).exclude(
+        status__in=[AnalysisRun.Status.RUNNING, AnalysisRun.Status.COMPLETED]
+    )
+    if not settings.ANALYSIS_PROFILING_ENABLED:
+        runs = runs.filter(profile_requested=True)
+    return runs.exists()
+
+
+def profiling_active() -> bool:
+    return _active_capture is not None
+
+
+def sample_allocations() -> None:
+    """Keep a snapshot of the largest traced heap seen so far; a no-op unless profiling.
+
+    Called at checkpoints and before finalization, where the run's working set
+    is still alive, instead of only at the end when most of it has been freed.
+    """
+    capture = _active_capture
+    if capture is None:
+        return
+    current_bytes, _ = tracemalloc.get_traced_memory()
+    if capture.snapshot is None or current_bytes > capture.snapshot_bytes * _SNAPSHOT_GROWTH:
+        capture.snapshot = tracemalloc.take_snapshot()
+        capture.snapshot_bytes = current_bytes
+
+
+def run_profiled(analysis_id: int, func, *args):
+    """Run ``func(*args)`` under cProfile and tracemalloc and store the artifact.
+
+    Only the calling thread is profiled: with ANALYSIS_PIPELINE_THREADED the
+    reader and writer threads, and any parse pool processes, are not covered.
+    The artifact is saved whether ``func`` returns or raises.
+    """
+    global _active_capture
+
+    capture = _Capture()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+    else:
+        tracemalloc.reset_peak()
+    _active_capture = capture
+    started = time.perf_counter()
+    capture.profiler.enable()
+    try:
+        return func(*args)
+    finally:
+        capture.profiler.disable()
+        elapsed_seconds = time.perf_counter() - started
+        sample_allocations()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        _active_capture = None
+        try:
+            _save_profile_artifact(analysis_id, capture, peak_bytes, elapsed_seconds)
+        except Exception:
+            logger.exception("analysis profile could not be saved analysis_id=%s", analysis_id)
+
+
+def _function_report(stats: pstats.Stats) -> str:
+    stream = io.StringIO()
+    stats.stream = stream
+    for sort_key in ("cumulative", "tottime"):
+        stream.write(f"=== sorted by {sort_key} ===\n")
+        stats.sort_stats(sort_key).print_stats(PROFILE_TOP_FUNCTIONS)
+    return stream.getvalue()
+
+
+def _allocation_report(snapshot: tracemalloc.Snapshot | None, snapshot_bytes: int, peak_bytes: int) -> str:
+    lines = [f"peak traced bytes: {peak_bytes}"]
+    if snapshot is None:
+        return "\n".join(lines) + "\n"
+
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]
+    )
+    lines.append(f"snapshot traced bytes: {snapshot_bytes}")
+    lines.append("")
+    lines.append(f"top {PROFILE_TOP_ALLOCATIONS} allocation sites at the snapshot:")
+    for statistic in snapshot.statistics("traceback")[:PROFILE_TOP_ALLOCATIONS]:
+        lines.append(f"{statistic.size} bytes in {statistic.count} blocks")
+        lines.extend(f"    {line}" for line in statistic.traceback.format(most_recent_first=True))
+    return "\n".join(lines) + "\n"
+
+
+def _previous_profile(object_key: str, generation: int) -> tuple[dict, pstats.Stats, str] | None:
+    """Summary, stats and allocation report so far, unless the run has since been claimed afresh."""
+    if not object_key or not default_storage.exists(object_key):
+        return None
+    with default_storage.open(object_key, "rb") as handle, zipfile.ZipFile(handle) as archive:
+        summary = json.loads(archive.read("summary.json"))
+        if summary.get("generation") != generation:
+            return None
+        stats = pstats.Stats()
+        stats.stats = marshal.loads(archive.read("profile.pstats"))
+        stats.get_top_level_stats()
+        allocations = archive.read("allocations.txt").decode()
+    return summary, stats, allocations
+
+
+def _save_profile_artifact(
+    analysis_id: int, capture: _Capture, peak_bytes: int, elapsed_seconds: float
+) -> str:
+    previous_key, generation = (
+        AnalysisRun.objects.filter(id=analysis_id).values_list("profile_object_key", "latest_generation").first()
+    )
+    invocation = {
+        "captured_at": timezone.now().isoformat(),
+        "elapsed_seconds": round(elapsed_seconds, 4),
+        "peak_traced_bytes": peak_bytes,
+        "snapshot_traced_bytes": capture.snapshot_bytes,
+    }
+    stats = pstats.Stats(capture.profiler)
+    invocations = [invocation]
+    allocations = ""
+    # A run suspended by its invocation budget is profiled in slices; each
+    # artifact accumulates the slices before it, so the last one covers the run.
+    try:
+        previous = _previous_profile(previous_key, generation)
+    except Exception:
+        logger.exception("analysis profile could not be merged object_key=%s", previous_key)
+        previous = None
+    if previous is not None:
+        previous_summary, previous_stats, allocations = previous
+        stats.add(previous_stats)
+        invocations = previous_summary["invocations"] + invocations
+    allocations += f"=== invocation {len(invocations)} ===\n" + _allocation_report(
+        capture.snapshot, capture.snapshot_bytes, peak_bytes
+    )
+    summary = {
+        "analysis_id": analysis_id,
+        "generation": generation,
+        "captured_at": invocation["captured_at"],
+        "elapsed_seconds": round(sum(item["elapsed_seconds"] for item in invocations), 4),
+        "peak_traced_bytes": max(item["peak_traced_bytes"] for item in invocations),
+        "invocations": invocations,
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("summary.json", json.dumps(summary, indent=2, sort_keys=True))
+        # Loadable with pstats.Stats("profile.pstats") or snakeviz.
+        archive.writestr("profile.pstats", marshal.dumps(stats.stats))
+        archive.writestr("profile.txt", _function_report(stats))
+        archive.writestr("allocations.txt", allocations)
+
+    stamp = timezone.now().strftime("%Y%m%dT%H%M%S")
+    object_key = default_storage.save(
+        f"analysis_profiles/{analysis_id}/profile-{stamp}.zip",
+        ContentFile(buffer.getvalue()),
+    )
+    AnalysisRun.objects.filter(id=analysis_id).update(profile_object_key=object_key)
+    if previous_key and previous_key != object_key:
+        delete_profile_artifacts([previous_key])
+    logger.info("analysis profile saved analysis_id=%s object_key=%s", analysis_id, object_key)
+    return object_key
+
+
+def delete_profile_artifacts(object_keys: list[str]) -> None:
+    for object_key in object_keys:
+        if not object_key:
+            continue
+        try:
+            if default_storage.exists(object_key):
+                default_storage.delete(object_key)
+        except Exception:
+            logger.exception("analysis profile delete failed object_key=%s", object_key)
+
+
+def profile_artifact_response(analysis_id: int) -> FileResponse | None:
+    object_key = (
+        AnalysisRun.objects.filter(id=analysis_id).values_list("profile_object_key", flat=True).first()
+    )
+    if not object_key or not default_storage.exists(object_key):
+        return None
+    return FileResponse(
+        default_storage.open(object_key, "rb"),
+        as_attachment=True,
+        filename=f"analysis-{analysis_id}-profile.zip",
+        content_type="application/zip",
+    )
@@ -1,4 +1,9 @@
+import hashlib
+import json
 import re
+import time
+from collections import OrderedDict
+from functools import cached_property, lru_cache
 from typing import Callable
 
 from django.conf import settings
@@ -40,41 +45,208 @@ def _redact_key_value_secret(match: re.Match[str]) -> str:
     return f"{match.group('key')}{match.group('sep')}[REDACTED_SECRET]"
 
 
+# Bump when a rule changes in a way the policy hash cannot see (e.g. a replacement
+# function's behaviour), so stored events are re-redacted on read.
+REDACTION_POLICY_VERSION = 1
+
+_DIGIT_SEARCH = re.compile(r"\d").search
+_BEARER_SEARCH = re.compile(r"bearer", flags=re.IGNORECASE).search
+
+
+def _contains(*literals: str) -> Callable[[str], bool]:
+    return lambda text: any(literal in text for literal in literals)
+
+
+def _has_digit_and(literal: str) -> Callable[[str], bool]:
+    return lambda text: literal in text and _DIGIT_SEARCH(text) is not None
+
+
+def _has_digit(text: str) -> bool:
+    return _DIGIT_SEARCH(text) is not None
+
+
+def _has_bearer(text: str) -> bool:
+    return _BEARER_SEARCH(text) is not None
+
+
+# (name, pattern, replacement, prerequisite). A prerequisite is a cheap check
+# for something every match must contain; when it fails the scan is skipped.
+_EMAIL_RULES = [("email", _EMAIL_PATTERN, "[REDACTED_EMAIL]", _contains("@"))]
+_PHONE_RULES = [("phone", _PHONE_PATTERN, "[REDACTED_PHONE]", _has_digit)]
+_IP_RULES = [("ip", _IPV4_PATTERN, "[REDACTED_IP]", _has_digit_and("."))]
+_JWT_RULES = [("jwt", _JWT_PATTERN, "[REDACTED_JWT]", _contains("eyJ"))]
+_API_KEY_RULES = [
+    ("bearer_token", _BEARER_TOKEN_PATTERN, "Bearer [REDACTED_TOKEN]", _has_bearer),
+    ("aws_access_key", _AWS_KEY_PATTERN, "[REDACTED_AWS_KEY]", _contains("AKIA", "ASIA")),
+    ("stripe_key", _STRIPE_KEY_PATTERN, "[REDACTED_API_KEY]", _contains("sk_")),
+    ("query_secret", _QUERY_SECRET_PATTERN, _redact_query_secret, _contains("=")),
+    ("key_value_secret", _KEY_VALUE_SECRET_PATTERN, _redact_key_value_secret, _contains(":", "=")),
+]
+
+
+class Redactor:
+    """Redaction rules compiled from one snapshot of the ``REDACTION_*`` settings.
+
+    Build one per task (or per worker process) instead of re-reading settings for
+    every value; ``redact`` returns exactly what ``redact_text`` returns.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool,
+        mask_emails: bool,
+        mask_phone_numbers: bool,
+        mask_ip_addresses: bool,
+        mask_jwts: bool,
+        mask_api_keys: bool,
+    ):
+        self.enabled = enabled
+        self.rules: list[
+            tuple[str, re.Pattern[str], str | Callable[[re.Match[str]], str], Callable[[str], bool]]
+        ] = []
+        if not enabled:
+            return
+        if mask_emails:
+            self.rules.extend(_EMAIL_RULES)
+        if mask_phone_numbers:
+            self.rules.extend(_PHONE_RULES)
+        if mask_ip_addresses:
+            self.rules.extend(_IP_RULES)
+        if mask_jwts:
+            self.rules.extend(_JWT_RULES)
+        if mask_api_keys:
+            self.rules.extend(_API_KEY_RULES)
+
+    @cached_property
+    def policy_hash(self) -> str:
+        """Hash of the active rules; equal hashes redact identically."""
+        payload = {
+            "enabled": self.enabled,
+            "rules": [
+                [
+                    rule_name,
+                    pattern.pattern,
+                    pattern.flags,
+                    replacement if isinstance(replacement, str) else replacement.__name__,
+                ]
+                for rule_name, pattern, replacement, _ in self.rules
+            ],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_settings(cls) -> "Redactor":
+        return _cached_redactor(*_redaction_settings())
+
+    def redact(self, value: str | None) -> tuple[str, int, list[str]]:
+        if value is None:
+            return "", 0, []
+
+        text = str(value)
+        if not self.enabled:
+            return text, 0, []
+
+        total_count = 0
+        redaction_types: list[str] = []
+        for rule_name, pattern, replacement, prerequisite in self.rules:
+            # Checked against the partly redacted text, which is what the
+            # pattern would scan.
+            if not prerequisite(text):
+                continue
+            text, count = pattern.subn(replacement, text)
+            if count > 0:
+                total_count += count
+                redaction_types.append(rule_name)
+
+        if len(redaction_types) > 1:
+            redaction_types.sort()
+        return text, total_count, redaction_types
+
+
+class CachingRedactor:
+    """Bounded LRU cache of redaction results in front of a ``Redactor``.
+
+    Keyed on the exact input string: log files repeat a few hundred message
+    shapes thousands of times, so most lines skip the rule scans entirely.
+    """
+
+    def __init__(self, redactor: Redactor, max_entries: int):
+        self.redactor = redactor
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Set to an analyses.perf.EventClock to time the redactions actually run.
+        self.clock = None
+        self._entries: OrderedDict[str, tuple[str, int, tuple[str, ...]]] = OrderedDict()
+
+    def redact(self, value: str | None) -> tuple[str, int, list[str]]:
+        if value is None or self.max_entries <= 0:
+            return self._redact(value)
+
+        text = str(value)
+        entry = self._entries.get(text)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(text)
+            return entry[0], entry[1], list(entry[2])
+
+        self.misses += 1
+        redacted, count, redaction_types = self._redact(text)
+        self._entries[text] = (redacted, count, tuple(redaction_types))
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return redacted, count, redaction_types
+
+    def _redact(self, value: str | None) -> tuple[str, int, list[str]]:
+        if self.clock is None:
+            return self.redactor.redact(value)
+        started = time.perf_counter()
+        try:
+            return self.redactor.redact(value)
+        finally:
+            self.clock.redact += time.perf_counter() - started
+
+    def counters(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def _redaction_settings() -> tuple[bool, ...]:
+    return (
+        settings.REDACTION_ENABLED,
+        settings.REDACTION_MASK_EMAILS,
+        settings.REDACTION_MASK_PHONE_NUMBERS,
+        settings.REDACTION_MASK_IP_ADDRESSES,
+        settings.REDACTION_MASK_JWTS,
+        settings.REDACTION_MASK_API_KEYS,
+    )
+
+
+@lru_cache(maxsize=8)
+def _cached_redactor(
+    enabled: bool,
+    mask_emails: bool,
+    mask_phone_numbers: bool,
+    mask_ip_addresses: bool,
+    mask_jwts: bool,
+    mask_api_keys: bool,
+) -> Redactor:
+    return Redactor(
+        enabled=enabled,
+        mask_emails=mask_emails,
+        mask_phone_numbers=mask_phone_numbers,
+        mask_ip_addresses=mask_ip_addresses,
+        mask_jwts=mask_jwts,
+        mask_api_keys=mask_api_keys,
+    )
+
+
+def is_current_redaction_policy(version: int | None, policy_hash: str) -> bool:
+    """Whether values stored under ``version``/``policy_hash`` need no re-redaction."""
+    return version == REDACTION_POLICY_VERSION and policy_hash == Redactor.from_settings().policy_hash
+
+
 def redact_text(value: str | None) -> tuple[str, int, list[str]]:
-    if value is None:
-        return "", 0, []
-
-    text = str(value)
-    if not settings.REDACTION_ENABLED:
-        return text, 0, []
-
-    total_count = 0
-    redaction_types: set[str] = set()
-
-    rules: list[tuple[str, re.Pattern[str], str | Callable[[re.Match[str]], str]]] = []
-    if settings.REDACTION_MASK_EMAILS:
-        rules.append(("email", _EMAIL_PATTERN, "[REDACTED_EMAIL]"))
-    if settings.REDACTION_MASK_PHONE_NUMBERS:
-        rules.append(("phone", _PHONE_PATTERN, "[REDACTED_PHONE]"))
-    if settings.REDACTION_MASK_IP_ADDRESSES:
-        rules.append(("ip", _IPV4_PATTERN, "[REDACTED_IP]"))
-    if settings.REDACTION_MASK_JWTS:
-        rules.append(("jwt", _JWT_PATTERN, "[REDACTED_JWT]"))
-    if settings.REDACTION_MASK_API_KEYS:
-        rules.extend(
-            [
-                ("bearer_token", _BEARER_TOKEN_PATTERN, "Bearer [REDACTED_TOKEN]"),
-                ("aws_access_key", _AWS_KEY_PATTERN, "[REDACTED_AWS_KEY]"),
-                ("stripe_key", _STRIPE_KEY_PATTERN, "[REDACTED_API_KEY]"),
-                ("query_secret", _QUERY_SECRET_PATTERN, _redact_query_secret),
-                ("key_value_secret", _KEY_VALUE_SECRET_PATTERN, _redact_key_value_secret),
-            ]
-        )
-
-    for rule_name, pattern, replacement in rules:
-        text, count = pattern.subn(replacement, text)
-        if count > 0:
-            total_count += count
-            redaction_types.add(rule_name)
-
-    return text, total_count, sorted(redaction_types)
+    return Redactor.from_settings().redact(value)
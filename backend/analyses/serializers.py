@@ -4,6 +4,7 @@ from zoneinfo import ZoneInfo
 
 from rest_framework.exceptions import ValidationError
 
+from analyses.dispatch import pending_queue_positions
 from analyses.models import (
     AIInsight,
     AnalysisRun,
@@ -32,6 +33,8 @@ class AIInsightSummarySerializer(serializers.ModelSerializer):
 class AnalysisRunSerializer(serializers.ModelSerializer):
     source_id = serializers.IntegerField(source="source.id", read_only=True)
     ai_insight = AIInsightSummarySerializer(read_only=True)
+    progress = serializers.SerializerMethodField()
+    queue_position = serializers.SerializerMethodField()
 
     class Meta:
         model = AnalysisRun
@@ -46,9 +49,51 @@ class AnalysisRunSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "ai_insight",
+            "progress",
+            "queue_position",
         ]
         read_only_fields = fields
 
+    def get_queue_position(self, analysis: AnalysisRun) -> int | None:
+        """1-based place among runs waiting for dispatch, 0 once handed to a worker."""
+        if analysis.status != AnalysisRun.Status.QUEUED:
+            return None
+        if analysis.dispatched_at is not None:
+            return 0
+        # Computed once per owner and response, also when serializing many runs.
+        positions = self.context.setdefault("queue_positions", {})
+        owner_id = analysis.source.owner_id
+        if owner_id not in positions:
+            positions[owner_id] = pending_queue_positions(owner_id)
+        return positions[owner_id].get(analysis.id)
+
+    def get_progress(self, analysis: AnalysisRun) -> dict | None:
+        if analysis.status != AnalysisRun.Status.RUNNING:
+            return None
+
+        elapsed_seconds = 0.0
+        # The counters restart with each fresh claim, e.g. a retry of a failed
+        # run, so the rate is measured from then; older runs only have started_at.
+        progress_started_at = analysis.progress_started_at or analysis.started_at
+        if progress_started_at and analysis.progress_updated_at:
+            elapsed_seconds = (analysis.progress_updated_at - progress_started_at).total_seconds()
+        lines_per_second = None
+        eta_seconds = None
+        if elapsed_seconds > 0:
+            lines_per_second = round(analysis.progress_lines / elapsed_seconds, 1)
+            if analysis.progress_total_bytes is not None and analysis.progress_bytes > 0:
+                remaining_bytes = max(0, analysis.progress_total_bytes - analysis.progress_bytes)
+                eta_seconds = round(remaining_bytes * elapsed_seconds / analysis.progress_bytes)
+        return {
+            "stage": analysis.progress_stage,
+            "lines_processed": analysis.progress_lines,
+            "bytes_processed": analysis.progress_bytes,
+            "total_bytes": analysis.progress_total_bytes,
+            "lines_per_second": lines_per_second,
+            "eta_seconds": eta_seconds,
+            "updated_at": analysis.progress_updated_at,
+        }
+
 
 class LogClusterSerializer(serializers.ModelSerializer):
     analysis_id = serializers.IntegerField(source="analysis_run.id", read_only=True)
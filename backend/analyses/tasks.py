@@ -1,9 +1,21 @@
+import copy
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import timedelta
 
-from celery import shared_task
+import billiard
+from celery import chord, group, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_process_shutdown
 from django.conf import settings
-from django.db.models import Count, Max, Min
-from django.db import transaction
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 
 from auditlog.models import AuditLogEvent
@@ -12,210 +24,788 @@ from analyses.line_reader import (
     LineReaderTruncatedByBytes,
     LineReaderTruncatedByLines,
     SourceLineReaderError,
+    iter_source_line_batches,
     iter_source_lines,
+    iter_upload_range_line_batches,
+    plan_upload_shards,
+    source_decoded_size,
 )
 from analyses.ai import generate_ai_insight
-from analyses.parsers import (
-    parse_json_log_line,
-    parse_nginx_log_line,
-    parse_timestamp_level_text_line,
-)
-from analyses.clustering import merge_clusters_tfidf
+from analyses.parsers import LockedLineParser, detect_dominant_parser, new_parser_detection_stats
+from analyses.event_loader import EVENT_INSERT_BATCH_SIZE, load_log_events
+from analyses.clustering import ClusterAccumulator, merge_clusters_tfidf
 from analyses.models import AIInsight, AnalysisRun, LogCluster, LogEvent
-from analyses.normalization import normalize_event_fields
+from analyses.multiline import EventAssembler, is_continuation_line
+from analyses.perf import (
+    QUEUE_WAIT_STAGES,
+    EventClock,
+    PerfRecorder,
+    add_event_timings,
+    measured_batches,
+    new_perf_recorder,
+)
+from analyses.profiling import profiling_active, profiling_requested, run_profiled, sample_allocations
+from analyses.pipeline import BackgroundReader, BackgroundWriter, StageTimer
+from analyses.dispatch import dispatch_expiry, dispatch_pending_analyses
+from analyses.heartbeat import AnalysisHeartbeat
+from analyses.normalization import TimestampParser, normalize_event_fields
+from analyses.redaction import REDACTION_POLICY_VERSION, CachingRedactor, Redactor
+from sources.models import Source
 
 logger = logging.getLogger(__name__)
 
 
-def _parse_line(raw_line: str) -> tuple[dict, str]:
-    parsed_json = parse_json_log_line(raw_line)
-    if parsed_json is not None:
-        return parsed_json, "json"
+PARSE_CHUNK_SIZE = 500
+# Bump whenever parsing, normalization or clustering changes what a run stores,
+# so completed runs are no longer reused for identical uploads.
+PIPELINE_VERSION = 2
+
+
+class AnalysisSuspended(Exception):
+    """Raised after a checkpoint once an invocation has spent its time budget."""
+
+
+class AnalysisCancelled(Exception):
+    """Raised by a batch callback once the run is no longer ``running``, e.g. after a cancel."""
+
+
+def _event_loader(analysis_id: int, generation: int, perf: PerfRecorder):
+    def load(rows: list[dict]) -> None:
+        with perf.measure("insert", rows=len(rows)):
+            load_log_events(analysis_id, rows, generation=generation)
+
+    return load
+
+
+class _EventWriter:
+    def __init__(self, load):
+        self.load = load
+        self.pending: list[dict] = []
+
+    def add(self, normalized: dict) -> None:
+        self.pending.append(normalized)
+        if len(self.pending) >= EVENT_INSERT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.load(self.pending)
+            self.pending = []
+
+    def commit(self, callback) -> None:
+        with transaction.atomic():
+            self.flush()
+            callback()
+
+    def close(self, *, abandon: bool = False) -> None:
+        pass
+
+
+def _add_redaction_cache_stats(stats: dict, counters: dict) -> None:
+    totals = stats.setdefault("redaction_cache", {"hits": 0, "misses": 0, "evictions": 0})
+    for key in ("hits", "misses", "evictions"):
+        totals[key] += counters.get(key, 0)
+    lookups = totals["hits"] + totals["misses"]
+    totals["hit_rate"] = round(totals["hits"] / lookups, 4) if lookups else None
 
-    parsed_text = parse_timestamp_level_text_line(raw_line)
-    if parsed_text is not None:
-        return parsed_text, "text"
 
-    parsed_nginx = parse_nginx_log_line(raw_line)
-    if parsed_nginx is not None:
-        return parsed_nginx, "nginx"
+class _InvocationCounters:
+    """Fold an invocation's running counters into ``stats`` as they grow.
 
+    A suspended run resumes from its last checkpoint's stats, so counters kept
+    for the whole invocation are folded in before every checkpoint, adding only
+    what changed since the previous fold.
+    """
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+        self._redaction_cache: dict = {}
+        self._queue_waits: dict = {}
+
+    def fold_redaction_cache(self, counters: dict) -> None:
+        _add_redaction_cache_stats(
+            self.stats,
+            {key: count - self._redaction_cache.get(key, 0) for key, count in counters.items()},
+        )
+        self._redaction_cache = dict(counters)
+
+    def fold_queue_waits(self, perf: PerfRecorder, waits: dict) -> None:
+        for stage, seconds in waits.items():
+            perf.add(stage, wall_seconds=seconds - self._queue_waits.get(stage, 0.0), calls=0)
+        self._queue_waits = dict(waits)
+
+
+def _new_line_stats() -> dict:
     return {
-        "timestamp": None,
-        "level": "unknown",
-        "service": None,
-        "message": raw_line,
-        "trace_id": None,
-        "request_id": None,
-        "raw": raw_line,
-    }, "raw"
-
-
-def _process_source_lines(source, analysis_id: int) -> dict:
-    stats = {
         "total_lines": 0,
         "truncated": False,
         "json_lines": 0,
         "text_lines": 0,
         "nginx_lines": 0,
         "unparsed_lines": 0,
+        "multiline_events": 0,
+        "continuation_lines": 0,
         "error_count": 0,
         "level_counts": {},
         "service_counts": {},
         "services": [],
-        "guardrails": {
-            "max_lines": settings.ANALYSIS_TASK_MAX_LINES,
-            "max_bytes": settings.ANALYSIS_READER_MAX_BYTES,
-            "task_soft_time_limit_seconds": settings.ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS,
-            "task_time_limit_seconds": settings.ANALYSIS_TASK_TIME_LIMIT_SECONDS,
-        },
     }
-    event_batch = []
 
-    LogEvent.objects.filter(analysis_run_id=analysis_id).delete()
 
-    try:
-        for line_no, raw_line in enumerate(
-            iter_source_lines(
+def _guardrail_stats() -> dict:
+    return {
+        "max_lines": settings.ANALYSIS_TASK_MAX_LINES,
+        "max_bytes": settings.ANALYSIS_READER_MAX_BYTES,
+        "task_soft_time_limit_seconds": settings.ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS,
+        "task_time_limit_seconds": settings.ANALYSIS_TASK_TIME_LIMIT_SECONDS,
+    }
+
+
+def _detect_source_parser(source) -> dict:
+    """Sample the head of a source once and lock the ingest loop to its dominant parser."""
+    sample_size = settings.ANALYSIS_PARSER_DETECTION_SAMPLE_LINES
+    sample: list[str] = []
+    if sample_size > 0:
+        try:
+            for line in iter_source_lines(
                 source,
-                max_lines=settings.ANALYSIS_TASK_MAX_LINES,
+                max_lines=sample_size,
                 max_bytes=settings.ANALYSIS_READER_MAX_BYTES,
-            ),
-            start=1,
-        ):
-            stats["total_lines"] += 1
-            parsed, parser_name = _parse_line(raw_line)
-            if parser_name == "json":
-                stats["json_lines"] += 1
-            elif parser_name == "text":
-                stats["text_lines"] += 1
-            elif parser_name == "nginx":
-                stats["nginx_lines"] += 1
-            else:
-                stats["unparsed_lines"] += 1
+            ):
+                sample.append(line)
+        except (LineReaderTruncatedByLines, LineReaderTruncatedByBytes, SourceLineReaderError):
+            pass
+    return new_parser_detection_stats(detect_dominant_parser(sample), len(sample))
 
-            normalized = normalize_event_fields(
-                line_no=line_no,
-                raw_line=raw_line,
-                parsed=parsed,
-                parser_name=parser_name,
-            )
-            level = normalized["level"]
-            stats["level_counts"][level] = stats["level_counts"].get(level, 0) + 1
-            if level in {"error", "fatal"}:
-                stats["error_count"] += 1
-
-            if normalized["service"]:
-                service = normalized["service"]
-                stats["service_counts"][service] = stats["service_counts"].get(service, 0) + 1
-
-            event_batch.append(
-                LogEvent(
-                    analysis_run_id=analysis_id,
-                    **normalized,
-                )
-            )
-            if len(event_batch) >= 500:
-                LogEvent.objects.bulk_create(event_batch, batch_size=500)
-                event_batch = []
-
-        if event_batch:
-            LogEvent.objects.bulk_create(event_batch, batch_size=500)
-    except LineReaderTruncatedByLines:
-        if event_batch:
-            LogEvent.objects.bulk_create(event_batch, batch_size=500)
-        stats["truncated"] = True
-        stats["truncated_by"] = "line_limit"
-    except LineReaderTruncatedByBytes:
-        if event_batch:
-            LogEvent.objects.bulk_create(event_batch, batch_size=500)
-        stats["truncated"] = True
-        stats["truncated_by"] = "byte_limit"
-    except SourceLineReaderError:
-        if event_batch:
-            LogEvent.objects.bulk_create(event_batch, batch_size=500)
-        stats["reader_error"] = "unreadable_source"
 
-    stats["services"] = sorted(stats["service_counts"].keys())
-    return stats
+def _new_event_assembler(state: dict | None = None) -> EventAssembler:
+    return EventAssembler(
+        enabled=settings.ANALYSIS_MULTILINE_ENABLED,
+        max_event_lines=settings.ANALYSIS_MULTILINE_MAX_EVENT_LINES,
+        state=state,
+    )
 
 
-def _build_baseline_clusters(analysis_id: int) -> list[dict]:
-    grouped = (
-        LogEvent.objects.filter(analysis_run_id=analysis_id)
-        .values("fingerprint")
-        .annotate(
-            count=Count("id"),
-            first_line=Min("line_no"),
-            last_line=Max("line_no"),
-        )
-        .order_by("-count", "fingerprint")
+def _normalize_event(
+    line_parser: LockedLineParser,
+    timestamp_parser: TimestampParser,
+    redactor: CachingRedactor,
+    clock: EventClock | None,
+    event_line_no: int,
+    event_lines: list[str],
+    line_count: int,
+) -> tuple[dict, str]:
+    first_line = event_lines[0]
+    if clock is not None:
+        started = time.perf_counter()
+    parsed, parser_name = line_parser.parse(first_line)
+    if clock is not None:
+        parsed_at = time.perf_counter()
+        clock.parse += parsed_at - started
+    normalized = normalize_event_fields(
+        line_no=event_line_no,
+        raw_line=first_line if line_count == 1 else "\n".join(event_lines),
+        parsed=parsed,
+        parser_name=parser_name,
+        timestamp_parser=timestamp_parser,
+        redactor=redactor,
     )
+    if clock is not None:
+        clock.normalize += time.perf_counter() - parsed_at
+        clock.events += 1
+    if line_count > 1:
+        normalized["tags"]["line_count"] = line_count
+        if line_count > len(event_lines):
+            normalized["tags"]["lines_truncated"] = line_count - len(event_lines)
+    return normalized, parser_name
+
+
+def _new_redactor() -> CachingRedactor:
+    return CachingRedactor(Redactor.from_settings(), settings.ANALYSIS_REDACTION_CACHE_SIZE)
+
+
+# Set in each pool worker so the redaction cache outlives a single chunk.
+_worker_redactor: CachingRedactor | None = None
+
+
+def _normalize_event_chunk(
+    locked_parser: str | None, events: list, timed: bool = False
+) -> tuple[list[tuple[dict, str]], dict, dict, dict | None]:
+    """Parse and normalize a chunk of assembled events in a pool worker process."""
+    detection = new_parser_detection_stats(locked_parser, 0)
+    line_parser = LockedLineParser(detection)
+    timestamp_parser = TimestampParser()
+    redactor = _worker_redactor or _new_redactor()
+    clock = redactor.clock = EventClock() if timed else None
+    before = redactor.counters()
+    try:
+        results = [
+            _normalize_event(line_parser, timestamp_parser, redactor, clock, *event) for event in events
+        ]
+    finally:
+        redactor.clock = None
+    cache_counters = {key: count - before[key] for key, count in redactor.counters().items()}
+    return results, detection, cache_counters, clock.as_dict() if clock is not None else None
+
+
+# Connections inherited from the forking process, kept referenced so they are
+# never finalized here: closing one would end the parent's session too.
+_inherited_connections: list = []
+
+
+def _init_parse_worker() -> None:
+    # Forked workers inherit a configured Django; spawned ones need setting up.
+    import django
 
-    clusters = []
-    for group in grouped:
-        sample = (
-            LogEvent.objects.filter(
-                analysis_run_id=analysis_id, fingerprint=group["fingerprint"]
+    global _worker_redactor
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is not None:
+            _inherited_connections.append(conn.connection)
+            conn.connection = None
+    django.setup()
+    _worker_redactor = _new_redactor()
+
+
+_parse_pool = None
+_parse_pool_key: tuple | None = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool(parse_workers: int):
+    """Return this process's parse pool, started on first use and reused by later ingests.
+
+    billiard, unlike multiprocessing, lets a daemonic Celery prefork child start
+    processes of its own. The pool is rebuilt when its size or the redaction
+    settings its workers were initialized with change.
+    """
+    global _parse_pool, _parse_pool_key
+    if parse_workers <= 1:
+        return None
+    key = (
+        os.getpid(),
+        parse_workers,
+        Redactor.from_settings().policy_hash,
+        settings.ANALYSIS_REDACTION_CACHE_SIZE,
+    )
+    with _parse_pool_lock:
+        if _parse_pool_key != key:
+            if _parse_pool is not None and _parse_pool_key[0] == key[0]:
+                _stop_parse_pool(_parse_pool)
+            _parse_pool = billiard.Pool(processes=parse_workers, initializer=_init_parse_worker)
+            _parse_pool_key = key
+        return _parse_pool
+
+
+@worker_process_shutdown.connect
+def _close_parse_pool(**kwargs) -> None:
+    global _parse_pool, _parse_pool_key
+    with _parse_pool_lock:
+        if _parse_pool is not None and _parse_pool_key[0] == os.getpid():
+            _stop_parse_pool(_parse_pool)
+        _parse_pool = _parse_pool_key = None
+
+
+def _stop_parse_pool(pool) -> None:
+    # Let idle workers exit on their sentinel: terminate() can leave a worker
+    # blocked on the task queue lock it takes, and then hang joining it.
+    pool.close()
+    pool.join()
+
+
+class _ParallelNormalizer:
+    """Send chunks of events to a process pool and hand results back in order."""
+
+    def __init__(
+        self,
+        pool,
+        parse_workers: int,
+        locked_parser: str | None,
+        on_chunk,
+        *,
+        timed: bool = False,
+    ):
+        self.pool = pool
+        self.locked_parser = locked_parser
+        self.timed = timed
+        self.on_chunk = on_chunk
+        self.max_in_flight = parse_workers * 2
+        self.chunk: list = []
+        self.in_flight: deque = deque()
+
+    def add(self, event) -> None:
+        self.chunk.append(event)
+        if len(self.chunk) >= PARSE_CHUNK_SIZE:
+            self._submit()
+
+    def drain(self) -> None:
+        self._submit()
+        while self.in_flight:
+            self.on_chunk(*self.in_flight.popleft().get())
+
+    def _submit(self) -> None:
+        if not self.chunk:
+            return
+        self.in_flight.append(
+            self.pool.apply_async(_normalize_event_chunk, (self.locked_parser, self.chunk, self.timed))
+        )
+        self.chunk = []
+        while len(self.in_flight) > self.max_in_flight:
+            self.on_chunk(*self.in_flight.popleft().get())
+
+
+def _ingest_line_batches(
+    analysis_id: int,
+    line_batches,
+    stats: dict,
+    *,
+    generation: int = 0,
+    first_line_no: int = 1,
+    start_offset: int = 0,
+    assembler: EventAssembler | None = None,
+    parse_workers: int = 0,
+    writer: _EventWriter | None = None,
+    clusters: ClusterAccumulator | None = None,
+    on_batch=None,
+) -> None:
+    perf = new_perf_recorder(stats)
+    perf.register("read", "parse", "normalize", "redact", "cluster", "insert")
+    clock = EventClock() if perf.enabled else None
+    # Read time is measured where batches are read, which may be the reader
+    # thread, but only added to stats here once a batch is consumed.
+    line_batches = measured_batches(line_batches)
+    transform_timer = StageTimer()
+    reader = None
+    if writer is None and settings.ANALYSIS_PIPELINE_THREADED:
+        # Reader, transform (this thread) and writer stages overlap decompression,
+        # parsing and inserts; the bounded queues cap the memory held in flight.
+        # The time each one waits on its queue is reported as a *_wait stage.
+        perf.register(*QUEUE_WAIT_STAGES)
+        line_batches = reader = BackgroundReader(
+            line_batches,
+            queue_size=settings.ANALYSIS_PIPELINE_QUEUE_SIZE,
+            consumer_timer=transform_timer,
+        )
+        writer = BackgroundWriter(
+            _event_loader(analysis_id, generation, perf),
+            batch_size=EVENT_INSERT_BATCH_SIZE,
+            queue_size=settings.ANALYSIS_PIPELINE_QUEUE_SIZE,
+            producer_timer=transform_timer,
+        )
+    writer = writer or _EventWriter(_event_loader(analysis_id, generation, perf))
+    line_parser = LockedLineParser(stats["parser_detection"])
+    timestamp_parser = TimestampParser()
+    redactor = _new_redactor()
+    redactor.clock = clock
+    assembler = assembler or _new_event_assembler()
+    clusters = clusters if clusters is not None else ClusterAccumulator()
+    line_no = first_line_no - 1
+    offset = start_offset
+    invocation_counters = _InvocationCounters(stats)
+
+    def fold_invocation_counters() -> None:
+        # Pool workers report their cache counters with each chunk instead.
+        if pool is None:
+            invocation_counters.fold_redaction_cache(redactor.counters())
+        if reader is not None:
+            invocation_counters.fold_queue_waits(
+                perf,
+                dict(
+                    zip(
+                        QUEUE_WAIT_STAGES,
+                        (reader.timer.idle_seconds, transform_timer.idle_seconds, writer.timer.idle_seconds),
+                    )
+                ),
             )
-            .order_by("line_no")
-            .first()
+
+    def record_event(normalized: dict, parser_name: str) -> None:
+        if parser_name == "json":
+            stats["json_lines"] += 1
+        elif parser_name == "text":
+            stats["text_lines"] += 1
+        elif parser_name == "nginx":
+            stats["nginx_lines"] += 1
+        else:
+            stats["unparsed_lines"] += 1
+
+        line_count = normalized["tags"].get("line_count", 1)
+        if line_count > 1:
+            stats["multiline_events"] += 1
+            stats["continuation_lines"] += line_count - 1
+
+        level = normalized["level"]
+        stats["level_counts"][level] = stats["level_counts"].get(level, 0) + 1
+        if level in {"error", "fatal"}:
+            stats["error_count"] += 1
+
+        if normalized["service"]:
+            service = normalized["service"]
+            stats["service_counts"][service] = stats["service_counts"].get(service, 0) + 1
+
+        if clock is None:
+            clusters.add(normalized)
+        else:
+            started = time.perf_counter()
+            clusters.add(normalized)
+            clock.cluster += time.perf_counter() - started
+            clock.clustered += 1
+        writer.add(normalized)
+
+    def record_chunk(
+        results: list[tuple[dict, str]], detection: dict, cache_counters: dict, timings: dict | None
+    ) -> None:
+        _merge_parser_detection_stats(stats, detection)
+        _add_redaction_cache_stats(stats, cache_counters)
+        if timings is not None:
+            add_event_timings(perf, timings)
+        for normalized, parser_name in results:
+            record_event(normalized, parser_name)
+
+    pool = _get_parse_pool(parse_workers)
+    if pool is None:
+        def ingest_event(event) -> None:
+            record_event(*_normalize_event(line_parser, timestamp_parser, redactor, clock, *event))
+
+        def drain() -> None:
+            pass
+    else:
+        parallel = _ParallelNormalizer(
+            pool,
+            parse_workers,
+            stats["parser_detection"]["locked_parser"],
+            record_chunk,
+            timed=perf.enabled,
         )
-        clusters.append(
+        ingest_event = parallel.add
+        drain = parallel.drain
+
+    try:
+        try:
+            for lines, end_offset, read_wall_seconds, read_cpu_seconds in line_batches:
+                perf.add(
+                    "read",
+                    wall_seconds=read_wall_seconds,
+                    cpu_seconds=read_cpu_seconds,
+                    rows=len(lines),
+                    byte_count=end_offset - offset,
+                )
+                offset = end_offset
+                for raw_line in lines:
+                    line_no += 1
+                    stats["total_lines"] += 1
+                    for event in assembler.push(line_no, raw_line):
+                        ingest_event(event)
+
+                # Checkpoints must only cover events that reached the writer.
+                drain()
+                if clock is not None:
+                    clock.fold_into(perf)
+                if on_batch is not None:
+                    fold_invocation_counters()
+                    on_batch(writer, line_no, end_offset)
+        except LineReaderTruncatedByLines:
+            stats["truncated"] = True
+            stats["truncated_by"] = "line_limit"
+        except LineReaderTruncatedByBytes:
+            stats["truncated"] = True
+            stats["truncated_by"] = "byte_limit"
+        except SourceLineReaderError:
+            stats["reader_error"] = "unreadable_source"
+
+        for event in assembler.finish():
+            ingest_event(event)
+        drain()
+        if clock is not None:
+            clock.fold_into(perf)
+        writer.flush()
+    except BaseException:
+        writer.close(abandon=True)
+        raise
+    else:
+        writer.close()
+    finally:
+        if reader is not None:
+            reader.close()
+        fold_invocation_counters()
+
+
+def _process_source_lines(
+    source,
+    analysis_id: int,
+    generation: int,
+    *,
+    checkpoint: dict | None = None,
+    deadline: float | None = None,
+    attempt: int | None = None,
+) -> tuple[dict, ClusterAccumulator]:
+    """Ingest a source serially into ``generation``, committing a resumable checkpoint after every block.
+
+    Events past the checkpointed line may have been flushed by an interrupted
+    invocation, so a resumed run drops them before continuing from the saved
+    byte offset with the saved partial stats and cluster accumulators.
+    """
+    checkpoint = checkpoint or {}
+    if checkpoint:
+        stats = checkpoint["stats"]
+        start_line_no = checkpoint["line_no"]
+        start_offset = checkpoint["byte_offset"]
+        if "parser_detection" not in stats:
+            stats["parser_detection"] = _detect_source_parser(source)
+        for key in ("multiline_events", "continuation_lines"):
+            stats.setdefault(key, 0)
+        assembler = _new_event_assembler(checkpoint.get("assembler"))
+        _discard_uncheckpointed_events(analysis_id, generation, checkpoint)
+        if "clusters" in checkpoint:
+            clusters = ClusterAccumulator(checkpoint["clusters"])
+        else:
+            clusters = _clusters_from_events(analysis_id, generation)
+    else:
+        stats = _new_line_stats()
+        stats["guardrails"] = _guardrail_stats()
+        stats["parser_detection"] = _detect_source_parser(source)
+        start_line_no = 0
+        start_offset = 0
+        assembler = _new_event_assembler()
+        clusters = ClusterAccumulator()
+
+    invocations = checkpoint.get("invocations", 1)
+
+    def save_checkpoint(writer, line_no: int, end_offset: int) -> None:
+        # Snapshot now: with the threaded writer the update runs after the
+        # transform stage has already moved on to the next batch.
+        checkpoint_state = copy.deepcopy(
             {
-                "fingerprint": group["fingerprint"],
-                "count": group["count"],
-                "first_line": group["first_line"],
-                "last_line": group["last_line"],
-                "sample_message": sample.message if sample else "",
-                "level": sample.level if sample else "unknown",
-                "service": sample.service if sample else "",
+                "byte_offset": end_offset,
+                "line_no": line_no,
+                "invocations": invocations,
+                "assembler": assembler.state(),
+                "stats": stats,
+                "clusters": clusters.state(),
             }
         )
 
-    return clusters
+        def write_checkpoint() -> None:
+            # Inserts are timed where rows are written; here, after the rows
+            # this checkpoint covers, is the one point their count is exact.
+            insert_stage = stats.get("perf", {}).get("stages", {}).get("insert")
+            if insert_stage is not None:
+                checkpoint_state["stats"]["perf"]["stages"]["insert"] = dict(insert_stage)
+            # The status doubles as the cancellation flag: once the run is no
+            # longer running, or was claimed again after being reaped, this
+            # batch's events roll back with the update.
+            runs = AnalysisRun.objects.filter(id=analysis_id, status=AnalysisRun.Status.RUNNING)
+            if attempt is not None:
+                runs = runs.filter(attempt=attempt)
+            updated = runs.update(
+                checkpoint=checkpoint_state,
+                progress_lines=line_no,
+                progress_bytes=end_offset,
+                progress_updated_at=timezone.now(),
+                heartbeat_at=timezone.now(),
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                raise AnalysisCancelled
 
+        writer.commit(write_checkpoint)
+        sample_allocations()
+        if deadline is not None and time.monotonic() >= deadline:
+            writer.flush()
+            raise AnalysisSuspended
 
-def _persist_log_clusters(analysis_id: int, baseline_clusters: list[dict]) -> None:
-    LogCluster.objects.filter(analysis_run_id=analysis_id).delete()
-
-    clusters_to_create = []
-    for cluster in baseline_clusters:
-        events_qs = LogEvent.objects.filter(
-            analysis_run_id=analysis_id,
-            fingerprint=cluster["fingerprint"],
-        ).order_by("line_no")
-        sample_lines = list(events_qs.values_list("line_no", flat=True)[:5])
-        timestamped = events_qs.exclude(timestamp__isnull=True)
-        first_seen = timestamped.order_by("timestamp").values_list("timestamp", flat=True).first()
-        last_seen = timestamped.order_by("-timestamp").values_list("timestamp", flat=True).first()
-        affected_services = sorted(
-            set(
-                events_qs.exclude(service="")
-                .values_list("service", flat=True)
-            )
+    _ingest_line_batches(
+        analysis_id,
+        iter_source_line_batches(
+            source,
+            max_lines=settings.ANALYSIS_TASK_MAX_LINES,
+            max_bytes=settings.ANALYSIS_READER_MAX_BYTES,
+            start_offset=start_offset,
+            start_line_count=start_line_no,
+        ),
+        stats,
+        generation=generation,
+        first_line_no=start_line_no + 1,
+        start_offset=start_offset,
+        assembler=assembler,
+        parse_workers=settings.ANALYSIS_PARSE_WORKERS,
+        clusters=clusters,
+        on_batch=save_checkpoint,
+    )
+
+    stats["services"] = sorted(stats["service_counts"].keys())
+    return stats, clusters
+
+
+def _discard_uncheckpointed_events(analysis_id: int, generation: int, checkpoint: dict) -> None:
+    """Delete events an interrupted invocation flushed past its last checkpoint."""
+    last_line_no = checkpoint.get("line_no", 0)
+    # The event still being assembled at the checkpoint may have been
+    # completed and flushed by the interrupted invocation.
+    pending_line_no = _new_event_assembler(checkpoint.get("assembler")).pending_line_no()
+    if pending_line_no is not None:
+        last_line_no = pending_line_no - 1
+    LogEvent.objects.filter(
+        analysis_run_id=analysis_id,
+        generation=generation,
+        line_no__gt=last_line_no,
+    ).delete()
+
+
+def _progress_total_bytes(source) -> int | None:
+    total_bytes = source_decoded_size(source)
+    if total_bytes is None:
+        return None
+    return min(total_bytes, settings.ANALYSIS_READER_MAX_BYTES)
+
+
+def _set_progress_stage(analysis_id: int, stage: str) -> None:
+    AnalysisRun.objects.filter(id=analysis_id).update(progress_stage=stage, progress_updated_at=timezone.now())
+
+
+def _shard_progress_publisher(analysis_id: int, shard: dict):
+    """Return an ``on_batch`` callback adding each shard batch to the run's progress."""
+    position = {"line_no": shard["first_line_no"] - 1, "offset": shard["start_offset"]}
+
+    def publish(writer, line_no: int, end_offset: int) -> None:  # noqa: ARG001
+        # Shards run concurrently, so counters are incremented in the database.
+        updated = AnalysisRun.objects.filter(id=analysis_id, status=AnalysisRun.Status.RUNNING).update(
+            progress_lines=F("progress_lines") + (line_no - position["line_no"]),
+            progress_bytes=F("progress_bytes") + (end_offset - position["offset"]),
+            progress_updated_at=timezone.now(),
+            heartbeat_at=timezone.now(),
         )
-        title = (cluster.get("sample_message") or cluster["fingerprint"])[:255]
-        clusters_to_create.append(
+        if not updated:
+            raise AnalysisCancelled
+        position["line_no"], position["offset"] = line_no, end_offset
+
+    return publish
+
+
+def _plan_analysis_shards(source) -> tuple[list[dict], str | None] | None:
+    if not settings.ANALYSIS_SHARDING_ENABLED or source.type != Source.SourceType.UPLOAD:
+        return None
+
+    try:
+        upload_size = default_storage.size(source.file_object_key)
+    except (OSError, NotImplementedError):
+        return None
+    readable_bytes = min(upload_size, settings.ANALYSIS_READER_MAX_BYTES)
+    if readable_bytes < settings.ANALYSIS_SHARD_MIN_BYTES:
+        return None
+
+    max_shards = max(1, settings.ANALYSIS_SHARD_MAX_COUNT)
+    shard_bytes = max(settings.ANALYSIS_SHARD_TARGET_BYTES, -(-readable_bytes // max_shards))
+    plan = plan_upload_shards(
+        source,
+        max_lines=settings.ANALYSIS_TASK_MAX_LINES,
+        max_bytes=settings.ANALYSIS_READER_MAX_BYTES,
+        shard_bytes=shard_bytes,
+        is_continuation=is_continuation_line if settings.ANALYSIS_MULTILINE_ENABLED else None,
+    )
+    if plan is None or len(plan[0]) < 2:
+        return None
+    return plan
+
+
+def _merge_parser_detection_stats(stats: dict, shard_detection: dict) -> None:
+    detection = stats.setdefault(
+        "parser_detection",
+        new_parser_detection_stats(shard_detection["locked_parser"], shard_detection["sample_lines"]),
+    )
+    detection["fast_path_hits"] += shard_detection["fast_path_hits"]
+    detection["fast_path_misses"] += shard_detection["fast_path_misses"]
+    for name, counters in shard_detection["parsers"].items():
+        detection["parsers"][name]["hits"] += counters["hits"]
+        detection["parsers"][name]["misses"] += counters["misses"]
+
+
+def _merge_shard_stats(shard_results: list[dict], truncated_by: str | None) -> dict:
+    """Combine per-shard counters in shard order so the result matches a serial run.
+
+    Dict counters are merged in shard order, which keeps their key order equal to
+    first-seen order across the whole file, exactly as the serial loop builds it.
+    """
+    stats = _new_line_stats()
+    stats["guardrails"] = _guardrail_stats()
+    counter_keys = (
+        "total_lines",
+        "json_lines",
+        "text_lines",
+        "nginx_lines",
+        "unparsed_lines",
+        "multiline_events",
+        "continuation_lines",
+        "error_count",
+    )
+    for result in sorted(shard_results, key=lambda item: item["index"]):
+        shard_stats = result["stats"]
+        for key in counter_keys:
+            stats[key] += shard_stats[key]
+        for key in ("level_counts", "service_counts"):
+            merged = stats[key]
+            for name, count in shard_stats[key].items():
+                merged[name] = merged.get(name, 0) + count
+        _merge_parser_detection_stats(stats, shard_stats["parser_detection"])
+        if "redaction_cache" in shard_stats:
+            _add_redaction_cache_stats(stats, shard_stats["redaction_cache"])
+        if "stages" in shard_stats.get("perf", {}):
+            # Summed over shards, so wall times are total work rather than elapsed time.
+            new_perf_recorder(stats).merge(shard_stats["perf"]["stages"])
+        if shard_stats.get("reader_error") and "reader_error" not in stats:
+            stats["reader_error"] = shard_stats["reader_error"]
+
+    if truncated_by is not None:
+        stats["truncated"] = True
+        stats["truncated_by"] = truncated_by
+    stats["services"] = sorted(stats["service_counts"].keys())
+    stats["sharding"] = {"shard_count": len(shard_results)}
+    return stats
+
+
+def _clusters_from_events(analysis_id: int, generation: int) -> ClusterAccumulator:
+    # Checkpoints written before cluster accumulators existed: rebuild them from
+    # the events kept so far.
+    clusters = ClusterAccumulator()
+    events = (
+        LogEvent.objects.filter(analysis_run_id=analysis_id, generation=generation)
+        .order_by("line_no")
+        .values("line_no", "fingerprint", "message", "level", "service", "timestamp")
+    )
+    for event in events.iterator(chunk_size=2000):
+        clusters.add(event)
+    return clusters
+
+
+def _merge_shard_clusters(shard_results: list[dict]) -> ClusterAccumulator:
+    clusters = ClusterAccumulator()
+    for result in sorted(shard_results, key=lambda item: item["index"]):
+        clusters.merge(ClusterAccumulator(result["clusters"]))
+    return clusters
+
+
+def _persist_log_clusters(analysis_id: int, generation: int, clusters: ClusterAccumulator) -> None:
+    LogCluster.objects.filter(analysis_run_id=analysis_id, generation=generation).delete()
+    LogCluster.objects.bulk_create(
+        [
             LogCluster(
                 analysis_run_id=analysis_id,
-                fingerprint=cluster["fingerprint"],
-                title=title,
+                generation=generation,
+                fingerprint=fingerprint,
+                title=(cluster["sample_message"] or fingerprint)[:255],
                 count=cluster["count"],
-                first_seen=first_seen,
-                last_seen=last_seen,
-                sample_events=sample_lines,
-                affected_services=affected_services,
+                first_seen=cluster["first_seen"],
+                last_seen=cluster["last_seen"],
+                sample_events=cluster["sample_lines"],
+                affected_services=sorted(cluster["services"]),
             )
-        )
-
-    if clusters_to_create:
-        LogCluster.objects.bulk_create(clusters_to_create, batch_size=200)
+            for fingerprint, cluster in clusters.ordered()
+        ],
+        batch_size=200,
+    )
 
 
-def _build_cluster_context(analysis_id: int) -> list[dict]:
+def _build_cluster_context(analysis_id: int, generation: int) -> list[dict]:
     return list(
-        LogCluster.objects.filter(analysis_run_id=analysis_id)
+        LogCluster.objects.filter(analysis_run_id=analysis_id, generation=generation)
         .order_by("-count", "fingerprint")
         .values("id", "fingerprint", "title", "count", "first_seen", "last_seen")[
             : settings.LLM_MAX_CLUSTER_CONTEXT
@@ -223,12 +813,329 @@ def _build_cluster_context(analysis_id: int) -> list[dict]:
     )
 
 
+def _finalize_analysis(
+    analysis_id: int, generation: int, computed_stats: dict, clusters: ClusterAccumulator
+) -> dict:
+    _set_progress_stage(analysis_id, AnalysisRun.ProgressStage.CLUSTERING)
+    sample_allocations()
+    perf = new_perf_recorder(computed_stats)
+    with perf.measure("cluster_persist", rows=len(clusters.clusters)):
+        baseline_clusters = clusters.baseline()
+        _persist_log_clusters(analysis_id, generation, clusters)
+    computed_stats["clusters_baseline"] = baseline_clusters
+    if settings.CLUSTER_TFIDF_ENABLED:
+        computed_stats["clusters_tfidf"] = merge_clusters_tfidf(
+            baseline_clusters,
+            settings.CLUSTER_TFIDF_SIMILARITY_THRESHOLD,
+            perf,
+        )
+    else:
+        computed_stats["clusters_tfidf"] = baseline_clusters
+
+    ai_insight_payload = None
+    ai_status = "skipped"
+    if settings.LLM_ENABLED:
+        _set_progress_stage(analysis_id, AnalysisRun.ProgressStage.INSIGHTS)
+        try:
+            cluster_context = _build_cluster_context(analysis_id, generation)
+            ai_insight_payload = generate_ai_insight(computed_stats, cluster_context, perf)
+            ai_status = "completed"
+        except Exception:
+            logger.exception("ai insight generation failed analysis_id=%s", analysis_id)
+            ai_status = "failed"
+    computed_stats["ai_status"] = ai_status
+    return _complete_analysis(analysis_id, generation, computed_stats, ai_insight_payload)
+
+
+def _complete_analysis(
+    analysis_id: int, generation: int, computed_stats: dict, ai_insight_payload: dict | None
+) -> dict:
+    with transaction.atomic():
+        analysis = AnalysisRun.objects.select_for_update().get(id=analysis_id)
+        if analysis.status != AnalysisRun.Status.RUNNING:
+            # Cancelled, or given up on by the reaper while finalizing.
+            logger.info(
+                "analysis task not completed analysis_id=%s status=%s", analysis_id, analysis.status
+            )
+            return {"analysis_id": analysis_id, "status": analysis.status}
+        analysis.status = AnalysisRun.Status.COMPLETED
+        analysis.stats = computed_stats
+        analysis.checkpoint = {}
+        analysis.finished_at = timezone.now()
+        # Readers switch to the new events, clusters and insight in this commit.
+        analysis.active_generation = generation
+        analysis.save(
+            update_fields=["status", "stats", "checkpoint", "finished_at", "active_generation", "updated_at"]
+        )
+        if ai_insight_payload is not None:
+            AIInsight.objects.update_or_create(
+                analysis_run=analysis,
+                defaults=ai_insight_payload,
+            )
+        safe_log_audit_event(
+            owner_id=analysis.source.owner_id,
+            actor_id=None,
+            event_type=AuditLogEvent.EventType.ANALYZE_FINISH,
+            source_id=analysis.source_id,
+            analysis_id=analysis.id,
+            metadata={
+                "status": analysis.status,
+                "error_count": computed_stats.get("error_count", 0),
+                "truncated": bool(computed_stats.get("truncated", False)),
+            },
+        )
+        schedule_generation_gc(analysis_id)
+        schedule_dispatch()
+
+    logger.info("analysis task completed analysis_id=%s", analysis_id)
+    return {"analysis_id": analysis_id, "status": AnalysisRun.Status.COMPLETED}
+
+
+def _pipeline_signature() -> str:
+    """Hash of every setting that changes what a run stores for a given upload."""
+    payload = {
+        "version": PIPELINE_VERSION,
+        "reader": [settings.ANALYSIS_TASK_MAX_LINES, settings.ANALYSIS_READER_MAX_BYTES],
+        "multiline": [settings.ANALYSIS_MULTILINE_ENABLED, settings.ANALYSIS_MULTILINE_MAX_EVENT_LINES],
+        "redaction": [REDACTION_POLICY_VERSION, Redactor.from_settings().policy_hash],
+        "clustering": [settings.CLUSTER_TFIDF_ENABLED, settings.CLUSTER_TFIDF_SIMILARITY_THRESHOLD],
+        "llm": [settings.LLM_ENABLED, settings.LLM_PROVIDER, settings.LLM_MODEL],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _find_reusable_analysis(analysis: AnalysisRun) -> AnalysisRun | None:
+    source = analysis.source
+    if not settings.ANALYSIS_RESULT_REUSE_ENABLED or not source.content_digest:
+        return None
+    return (
+        AnalysisRun.objects.filter(
+            status=AnalysisRun.Status.COMPLETED,
+            source__owner_id=source.owner_id,
+            source__content_digest=source.content_digest,
+            pipeline_signature=analysis.pipeline_signature,
+        )
+        .exclude(id=analysis.id)
+        .order_by("-finished_at")
+        .first()
+    )
+
+
+def _clone_log_events(reused: AnalysisRun, analysis_id: int, generation: int) -> None:
+    # Copy rows inside the database instead of round-tripping them through Python.
+    meta = LogEvent._meta
+    quote = connection.ops.quote_name
+    copied_columns = ", ".join(
+        quote(field.column)
+        for field in meta.concrete_fields
+        if field.name not in {"id", "analysis_run", "generation", "created_at"}
+    )
+    analysis_column = quote(meta.get_field("analysis_run").column)
+    generation_column = quote(meta.get_field("generation").column)
+    created_column = quote(meta.get_field("created_at").column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(meta.db_table)} "
+            f"({analysis_column}, {generation_column}, {created_column}, {copied_columns}) "
+            f"SELECT %s, %s, %s, {copied_columns} FROM {quote(meta.db_table)} "
+            f"WHERE {analysis_column} = %s AND {generation_column} = %s",
+            [
+                analysis_id,
+                generation,
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+                reused.id,
+                reused.active_generation,
+            ],
+        )
+
+
+def _clone_log_clusters(reused: AnalysisRun, analysis_id: int, generation: int) -> dict[int, int]:
+    reused_clusters = list(
+        LogCluster.objects.filter(analysis_run_id=reused.id, generation=reused.active_generation)
+    )
+    LogCluster.objects.bulk_create(
+        [
+            LogCluster(
+                analysis_run_id=analysis_id,
+                generation=generation,
+                fingerprint=cluster.fingerprint,
+                title=cluster.title,
+                count=cluster.count,
+                first_seen=cluster.first_seen,
+                last_seen=cluster.last_seen,
+                sample_events=cluster.sample_events,
+                affected_services=cluster.affected_services,
+            )
+            for cluster in reused_clusters
+        ],
+        batch_size=200,
+    )
+    cloned_ids = dict(
+        LogCluster.objects.filter(analysis_run_id=analysis_id, generation=generation).values_list(
+            "fingerprint", "id"
+        )
+    )
+    return {cluster.id: cloned_ids[cluster.fingerprint] for cluster in reused_clusters}
+
+
+def _clone_ai_insight_payload(reused_analysis_id: int, cluster_id_map: dict[int, int]) -> dict | None:
+    insight = AIInsight.objects.filter(analysis_run_id=reused_analysis_id).first()
+    if insight is None:
+        return None
+
+    def remap(cluster_ids):
+        return [cluster_id_map[cluster_id] for cluster_id in cluster_ids if cluster_id in cluster_id_map]
+
+    root_causes = []
+    for root_cause in insight.root_causes:
+        if isinstance(root_cause, dict) and "evidence_cluster_ids" in root_cause:
+            root_cause = {
+                **root_cause,
+                "evidence_cluster_ids": remap(root_cause["evidence_cluster_ids"]),
+            }
+        root_causes.append(root_cause)
+
+    return {
+        "executive_summary": insight.executive_summary,
+        "root_causes": root_causes,
+        "overall_confidence": insight.overall_confidence,
+        "evidence_references": remap(insight.evidence_references),
+        "remediation": insight.remediation,
+        "runbook": insight.runbook,
+    }
+
+
+def _reuse_analysis(reused: AnalysisRun, analysis_id: int, generation: int) -> dict:
+    with transaction.atomic():
+        _clone_log_events(reused, analysis_id, generation)
+        cluster_id_map = _clone_log_clusters(reused, analysis_id, generation)
+        ai_insight_payload = _clone_ai_insight_payload(reused.id, cluster_id_map)
+
+    computed_stats = dict(reused.stats)
+    computed_stats["reused_from_analysis_id"] = reused.id
+    logger.info(
+        "analysis task reused completed results analysis_id=%s reused_analysis_id=%s",
+        analysis_id,
+        reused.id,
+    )
+    return _complete_analysis(analysis_id, generation, computed_stats, ai_insight_payload)
+
+
+def _mark_analysis_failed(analysis_id: int, error_message: str = "Analysis execution failed.") -> None:
+    with transaction.atomic():
+        analysis = AnalysisRun.objects.select_for_update().select_related("source").get(id=analysis_id)
+        if analysis.status == AnalysisRun.Status.CANCELLED:
+            return
+        analysis.status = AnalysisRun.Status.FAILED
+        analysis.error_message = error_message
+        analysis.finished_at = timezone.now()
+        analysis.save(update_fields=["status", "error_message", "finished_at", "updated_at"])
+        safe_log_audit_event(
+            owner_id=analysis.source.owner_id,
+            actor_id=None,
+            event_type=AuditLogEvent.EventType.ANALYZE_FAIL,
+            source_id=analysis.source_id,
+            analysis_id=analysis.id,
+            metadata={"status": analysis.status, "error_message": analysis.error_message},
+        )
+        schedule_generation_gc(analysis_id)
+        schedule_dispatch()
+
+
+def _requeue_from_checkpoint(analysis_id: int) -> bool:
+    with transaction.atomic():
+        analysis = AnalysisRun.objects.select_for_update().get(id=analysis_id)
+        checkpoint = dict(analysis.checkpoint or {})
+        if not checkpoint or analysis.status != AnalysisRun.Status.RUNNING:
+            return False
+
+        invocations = checkpoint.get("invocations", 1) + 1
+        if invocations > settings.ANALYSIS_TASK_MAX_INVOCATIONS:
+            return False
+
+        checkpoint["invocations"] = invocations
+        analysis.checkpoint = checkpoint
+        analysis.status = AnalysisRun.Status.QUEUED
+        # Sent straight back to the broker, keeping its dispatch slot.
+        analysis.dispatched_at = timezone.now()
+        analysis.save(update_fields=["checkpoint", "status", "dispatched_at", "updated_at"])
+        expires = dispatch_expiry(analysis.dispatched_at)
+        transaction.on_commit(lambda: _send_analysis(analysis_id, expires))
+
+    logger.info(
+        "analysis task suspended analysis_id=%s line_no=%s invocation=%s",
+        analysis_id,
+        checkpoint.get("line_no"),
+        invocations,
+    )
+    return True
+
+
+def _dispatch_shards(analysis, shards: list[dict], truncated_by: str | None) -> dict:
+    analysis_id = analysis.id
+    generation = analysis.latest_generation
+    detection = _detect_source_parser(analysis.source)
+    # Stamped before any shard can start, so the reaper applies the sharded
+    # threshold from here until the chord finalizes.
+    AnalysisRun.objects.filter(id=analysis_id).update(
+        shard_count=len(shards), heartbeat_at=timezone.now(), updated_at=timezone.now()
+    )
+    chord(
+        group(
+            analyze_source_shard.s(
+                analysis_id, {**shard, "parser_detection": detection, "generation": generation}
+            )
+            for shard in shards
+        )
+    )(finalize_sharded_analysis.s(analysis_id, truncated_by, generation))
+    logger.info("analysis task fanned out analysis_id=%s shards=%s", analysis_id, len(shards))
+    return {"analysis_id": analysis_id, "status": AnalysisRun.Status.RUNNING, "shards": len(shards)}
+
+
+def schedule_generation_gc(analysis_id: int) -> None:
+    """Collect the run's unused generations once the current transaction commits."""
+    transaction.on_commit(lambda: collect_stale_generations.delay(analysis_id))
+
+
+def _send_analysis(analysis_id: int, expires) -> None:
+    # Celery discards the message unexecuted once it expires, which is when the
+    # reaper resets the run and dispatches it again.
+    analyze_source.apply_async(args=(analysis_id,), expires=expires)
+
+
+def schedule_dispatch() -> None:
+    """Dispatch pending runs once the current transaction commits, e.g. after a slot frees up.
+
+    Failures are logged only: the runs stay pending and the periodic
+    ``dispatch_analyses`` task picks them up.
+    """
+
+    def dispatch() -> None:
+        try:
+            dispatch_pending_analyses(_send_analysis)
+        except Exception:
+            logger.exception("analysis dispatch pass failed")
+
+    transaction.on_commit(dispatch)
+
+
+@shared_task
+def dispatch_analyses() -> dict:
+    return {"dispatched": dispatch_pending_analyses(_send_analysis)}
+
+
 @shared_task(
     bind=True,
     soft_time_limit=settings.ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS,
     time_limit=settings.ANALYSIS_TASK_TIME_LIMIT_SECONDS,
 )
 def analyze_source(self, analysis_id: int):  # noqa: ARG001
+    if profiling_requested(analysis_id):
+        return run_profiled(analysis_id, _analyze_source, analysis_id)
+    return _analyze_source(analysis_id)
+
+
+def _analyze_source(analysis_id: int) -> dict:
     with transaction.atomic():
         analysis = (
             AnalysisRun.objects.select_for_update()
@@ -240,83 +1147,297 @@ def analyze_source(self, analysis_id: int):  # noqa: ARG001
             logger.warning("analysis task received unknown analysis_id=%s", analysis_id)
             return {"analysis_id": analysis_id, "status": "missing"}
 
-        if analysis.status == AnalysisRun.Status.COMPLETED:
+        if analysis.status in (AnalysisRun.Status.COMPLETED, AnalysisRun.Status.CANCELLED):
             return {"analysis_id": analysis_id, "status": analysis.status}
 
         if analysis.status == AnalysisRun.Status.RUNNING:
             return {"analysis_id": analysis_id, "status": analysis.status}
 
         analysis.status = AnalysisRun.Status.RUNNING
+        analysis.attempt += 1
+        analysis.heartbeat_at = timezone.now()
+        analysis.shard_count = None
         analysis.started_at = analysis.started_at or timezone.now()
         analysis.finished_at = None
         analysis.error_message = ""
-        analysis.save(update_fields=["status", "started_at", "finished_at", "error_message", "updated_at"])
+        analysis.pipeline_signature = _pipeline_signature()
+        redaction_policy = (REDACTION_POLICY_VERSION, Redactor.from_settings().policy_hash)
+        if analysis.checkpoint and redaction_policy != (
+            analysis.redaction_policy_version,
+            analysis.redaction_policy_hash,
+        ):
+            # Events written before this resume used another policy.
+            redaction_policy = (None, "")
+        analysis.redaction_policy_version, analysis.redaction_policy_hash = redaction_policy
+        if not analysis.checkpoint:
+            # A fresh start never touches what readers currently see; a resume
+            # keeps writing the generation its checkpoint belongs to.
+            analysis.latest_generation += 1
+            analysis.progress_lines = 0
+            analysis.progress_bytes = 0
+            analysis.progress_total_bytes = _progress_total_bytes(analysis.source)
+            analysis.progress_started_at = timezone.now()
+        analysis.progress_stage = AnalysisRun.ProgressStage.INGESTING
+        analysis.progress_updated_at = timezone.now()
+        analysis.save(
+            update_fields=[
+                "status",
+                "attempt",
+                "heartbeat_at",
+                "shard_count",
+                "started_at",
+                "finished_at",
+                "error_message",
+                "pipeline_signature",
+                "redaction_policy_version",
+                "redaction_policy_hash",
+                "latest_generation",
+                "progress_stage",
+                "progress_lines",
+                "progress_bytes",
+                "progress_total_bytes",
+                "progress_updated_at",
+                "progress_started_at",
+                "updated_at",
+            ]
+        )
 
+    budget_seconds = settings.ANALYSIS_TASK_INVOCATION_BUDGET_SECONDS
+    deadline = time.monotonic() + budget_seconds if budget_seconds > 0 else None
+    heartbeat = AnalysisHeartbeat(analysis.id, attempt=analysis.attempt).start()
     try:
-        computed_stats = _process_source_lines(analysis.source, analysis.id)
-        baseline_clusters = _build_baseline_clusters(analysis.id)
-        _persist_log_clusters(analysis.id, baseline_clusters)
-        computed_stats["clusters_baseline"] = baseline_clusters
-        if settings.CLUSTER_TFIDF_ENABLED:
-            computed_stats["clusters_tfidf"] = merge_clusters_tfidf(
-                baseline_clusters,
-                settings.CLUSTER_TFIDF_SIMILARITY_THRESHOLD,
-            )
-        else:
-            computed_stats["clusters_tfidf"] = baseline_clusters
-
-        ai_insight_payload = None
-        ai_status = "skipped"
-        if settings.LLM_ENABLED:
-            try:
-                cluster_context = _build_cluster_context(analysis.id)
-                ai_insight_payload = generate_ai_insight(computed_stats, cluster_context)
-                ai_status = "completed"
-            except Exception:
-                logger.exception("ai insight generation failed analysis_id=%s", analysis_id)
-                ai_status = "failed"
-        computed_stats["ai_status"] = ai_status
+        # A run that already has a checkpoint resumes serially; result reuse and
+        # shards are only considered for fresh runs, and not when profiling,
+        # which has to see the whole pipeline run in this process.
+        if not analysis.checkpoint and not profiling_active():
+            reused = _find_reusable_analysis(analysis)
+            if reused is not None:
+                return _reuse_analysis(reused, analysis.id, analysis.latest_generation)
 
-        with transaction.atomic():
-            analysis = AnalysisRun.objects.select_for_update().get(id=analysis_id)
-            analysis.status = AnalysisRun.Status.COMPLETED
-            analysis.stats = computed_stats
-            analysis.finished_at = timezone.now()
-            analysis.save(update_fields=["status", "stats", "finished_at", "updated_at"])
-            if ai_insight_payload is not None:
-                AIInsight.objects.update_or_create(
-                    analysis_run=analysis,
-                    defaults=ai_insight_payload,
-                )
-            safe_log_audit_event(
-                owner_id=analysis.source.owner_id,
-                actor_id=None,
-                event_type=AuditLogEvent.EventType.ANALYZE_FINISH,
-                source_id=analysis.source_id,
-                analysis_id=analysis.id,
-                metadata={
-                    "status": analysis.status,
-                    "error_count": computed_stats.get("error_count", 0),
-                    "truncated": bool(computed_stats.get("truncated", False)),
-                },
-            )
+            shard_plan = _plan_analysis_shards(analysis.source)
+            if shard_plan is not None:
+                return _dispatch_shards(analysis, *shard_plan)
 
-        logger.info("analysis task completed analysis_id=%s", analysis_id)
-        return {"analysis_id": analysis_id, "status": AnalysisRun.Status.COMPLETED}
+        computed_stats, clusters = _process_source_lines(
+            analysis.source,
+            analysis.id,
+            analysis.latest_generation,
+            checkpoint=analysis.checkpoint,
+            deadline=deadline,
+            attempt=analysis.attempt,
+        )
+        return _finalize_analysis(analysis.id, analysis.latest_generation, computed_stats, clusters)
+    except AnalysisCancelled:
+        current = AnalysisRun.objects.filter(id=analysis_id).values("status", "attempt", "checkpoint").first()
+        if current["attempt"] != analysis.attempt:
+            # Reaped and claimed by another invocation, which owns the events now.
+            logger.warning("analysis task superseded analysis_id=%s", analysis_id)
+            return {"analysis_id": analysis_id, "status": current["status"]}
+        # Leave exactly the events covered by the last committed checkpoint.
+        _discard_uncheckpointed_events(analysis_id, analysis.latest_generation, current["checkpoint"] or {})
+        if current["status"] == AnalysisRun.Status.CANCELLED:
+            # The collection scheduled by the cancel may have run before this
+            # invocation stopped writing.
+            schedule_generation_gc(analysis_id)
+        logger.info("analysis task stopped analysis_id=%s status=%s", analysis_id, current["status"])
+        return {"analysis_id": analysis_id, "status": current["status"]}
+    except (AnalysisSuspended, SoftTimeLimitExceeded):
+        if _requeue_from_checkpoint(analysis_id):
+            return {"analysis_id": analysis_id, "status": AnalysisRun.Status.QUEUED}
+        logger.exception("analysis task exhausted its invocations analysis_id=%s", analysis_id)
+        _mark_analysis_failed(analysis_id, "Analysis did not finish within its time budget.")
+        raise
     except Exception:
         logger.exception("analysis task failed analysis_id=%s", analysis_id)
-        with transaction.atomic():
-            analysis = AnalysisRun.objects.select_for_update().select_related("source").get(id=analysis_id)
-            analysis.status = AnalysisRun.Status.FAILED
-            analysis.error_message = "Analysis execution failed."
-            analysis.finished_at = timezone.now()
-            analysis.save(update_fields=["status", "error_message", "finished_at", "updated_at"])
-            safe_log_audit_event(
-                owner_id=analysis.source.owner_id,
-                actor_id=None,
-                event_type=AuditLogEvent.EventType.ANALYZE_FAIL,
-                source_id=analysis.source_id,
-                analysis_id=analysis.id,
-                metadata={"status": analysis.status, "error_message": analysis.error_message},
+        _mark_analysis_failed(analysis_id)
+        raise
+    finally:
+        heartbeat.stop()
+
+
+@shared_task(
+    bind=True,
+    soft_time_limit=settings.ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS,
+    time_limit=settings.ANALYSIS_TASK_TIME_LIMIT_SECONDS,
+)
+def analyze_source_shard(self, analysis_id: int, shard: dict):  # noqa: ARG001
+    # Failures are reported in the result instead of raised so the chord body
+    # always runs and can mark the whole analysis failed in one place.
+    stats = _new_line_stats()
+    stats["parser_detection"] = new_parser_detection_stats(
+        shard["parser_detection"]["locked_parser"],
+        shard["parser_detection"]["sample_lines"],
+    )
+    clusters = ClusterAccumulator()
+    try:
+        analysis = AnalysisRun.objects.select_related("source").get(id=analysis_id)
+        with AnalysisHeartbeat(analysis_id):
+            _ingest_line_batches(
+                analysis_id,
+                iter_upload_range_line_batches(
+                    analysis.source,
+                    start_offset=shard["start_offset"],
+                    end_offset=shard["end_offset"],
+                ),
+                stats,
+                generation=shard["generation"],
+                first_line_no=shard["first_line_no"],
+                start_offset=shard["start_offset"],
+                clusters=clusters,
+                on_batch=_shard_progress_publisher(analysis_id, shard),
             )
+    except AnalysisCancelled:
+        logger.info("analysis shard stopped analysis_id=%s shard=%s", analysis_id, shard["index"])
+        return {"index": shard["index"], "stats": stats, "clusters": {}, "failed": True}
+    except Exception:
+        logger.exception(
+            "analysis shard failed analysis_id=%s shard=%s", analysis_id, shard["index"]
+        )
+        return {"index": shard["index"], "stats": stats, "clusters": {}, "failed": True}
+
+    return {"index": shard["index"], "stats": stats, "clusters": clusters.state(), "failed": False}
+
+
+@shared_task(
+    bind=True,
+    soft_time_limit=settings.ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS,
+    time_limit=settings.ANALYSIS_TASK_TIME_LIMIT_SECONDS,
+)
+def finalize_sharded_analysis(  # noqa: ARG001
+    self, shard_results: list[dict], analysis_id: int, truncated_by: str | None, generation: int
+):
+    run_status = AnalysisRun.objects.filter(id=analysis_id).values_list("status", flat=True).first()
+    if run_status != AnalysisRun.Status.RUNNING:
+        # Cancelled, or failed by the reaper while shards were still pending.
+        logger.info("sharded analysis not finalized analysis_id=%s status=%s", analysis_id, run_status)
+        return {"analysis_id": analysis_id, "status": run_status}
+    try:
+        if any(result.get("failed") for result in shard_results):
+            raise RuntimeError("One or more analysis shards failed.")
+        computed_stats = _merge_shard_stats(shard_results, truncated_by)
+        with AnalysisHeartbeat(analysis_id):
+            return _finalize_analysis(
+                analysis_id, generation, computed_stats, _merge_shard_clusters(shard_results)
+            )
+    except Exception:
+        logger.exception("sharded analysis failed analysis_id=%s", analysis_id)
+        _mark_analysis_failed(analysis_id)
         raise
+
+
+@shared_task
+def collect_stale_generations(analysis_id: int) -> dict:
+    """Delete events and clusters of generations readers will never see.
+
+    That is generations the active one has replaced, and newer ones that were
+    never activated: abandoned attempts, or everything a failed or cancelled
+    run wrote. Only the generation a queued or running run is writing is left
+    alone. Deletes go in chunks of ``ANALYSIS_GENERATION_GC_CHUNK_SIZE`` rows so
+    each statement stays short.
+    """
+    with transaction.atomic():
+        analysis = AnalysisRun.objects.select_for_update().filter(id=analysis_id).first()
+        if analysis is None:
+            return {"analysis_id": analysis_id, "status": "missing"}
+        active_generation = analysis.active_generation
+        unused_below = analysis.latest_generation
+        if analysis.status not in (AnalysisRun.Status.QUEUED, AnalysisRun.Status.RUNNING):
+            unused_below += 1
+            if analysis.checkpoint:
+                # A failed run can still be claimed again; without the
+                # checkpoint it starts a new generation instead of resuming
+                # the one deleted here.
+                analysis.checkpoint = {}
+                analysis.save(update_fields=["checkpoint", "updated_at"])
+    # A run claimed again after the lock is released writes above
+    # latest_generation, outside the range being deleted.
+    unused = Q(generation__lt=active_generation) | Q(
+        generation__gt=active_generation, generation__lt=unused_below
+    )
+
+    chunk_size = max(1, settings.ANALYSIS_GENERATION_GC_CHUNK_SIZE)
+    deleted = {}
+    for model in (LogEvent, LogCluster):
+        stale = model.objects.filter(unused, analysis_run_id=analysis_id)
+        deleted[model._meta.model_name] = 0
+        while True:
+            ids = list(stale.values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                break
+            model.objects.filter(analysis_run_id=analysis_id, id__in=ids).delete()
+            deleted[model._meta.model_name] += len(ids)
+
+    logger.info(
+        "stale generations collected analysis_id=%s active_generation=%s deleted=%s",
+        analysis_id,
+        active_generation,
+        deleted,
+    )
+    return {"analysis_id": analysis_id, "active_generation": active_generation, "deleted": deleted}
+
+
+@shared_task
+def reap_stale_analyses() -> dict:
+    """Recover running analyses whose worker stopped sending heartbeats.
+
+    Runs with a checkpoint and invocations left are requeued to resume from it;
+    the rest, including sharded runs, are marked failed. Either way the source
+    can be analyzed again. Runs dispatched to the broker but never started
+    within ``ANALYSIS_DISPATCH_STALE_SECONDS`` go back to pending, freeing the
+    slots they hold. Scheduled by celery beat (CELERY_BEAT_SCHEDULE).
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.ANALYSIS_HEARTBEAT_STALE_SECONDS)
+    # Only executing shards beat, and a run's shards can all sit in the broker
+    # behind other work, so sharded runs get a longer threshold.
+    sharded_cutoff = now - timedelta(seconds=settings.ANALYSIS_SHARDED_HEARTBEAT_STALE_SECONDS)
+    stale = (
+        Q(shard_count__isnull=True)
+        & (Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, updated_at__lt=cutoff))
+    ) | Q(shard_count__isnull=False, heartbeat_at__lt=sharded_cutoff)
+    stale_ids = list(
+        AnalysisRun.objects.filter(stale, status=AnalysisRun.Status.RUNNING).values_list("id", flat=True)
+    )
+
+    requeued, failed = [], []
+    for analysis_id in stale_ids:
+        with transaction.atomic():
+            # Re-check under the lock: the run may have beaten or finished since.
+            analysis = (
+                AnalysisRun.objects.select_for_update()
+                .filter(stale, id=analysis_id, status=AnalysisRun.Status.RUNNING)
+                .first()
+            )
+            if analysis is None:
+                continue
+            if _requeue_from_checkpoint(analysis_id):
+                requeued.append(analysis_id)
+            else:
+                _mark_analysis_failed(analysis_id, "Analysis worker stopped responding.")
+                failed.append(analysis_id)
+
+    redispatched = _reset_stale_dispatches()
+
+    if requeued or failed or redispatched:
+        logger.warning(
+            "stale analyses reaped requeued=%s failed=%s redispatched=%s", requeued, failed, redispatched
+        )
+    return {"requeued": requeued, "failed": failed, "redispatched": redispatched}
+
+
+def _reset_stale_dispatches() -> list[int]:
+    # A lost broker message, or a run queued before dispatch existed, would
+    # otherwise count against its owner's and the global cap forever. The
+    # message was sent to expire at this same cutoff, so a late one is dropped
+    # by the worker instead of running the analysis twice.
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYSIS_DISPATCH_STALE_SECONDS)
+    with transaction.atomic():
+        stale_ids = list(
+            AnalysisRun.objects.select_for_update()
+            .filter(status=AnalysisRun.Status.QUEUED, dispatched_at__lt=cutoff)
+            .values_list("id", flat=True)
+        )
+        if stale_ids:
+            AnalysisRun.objects.filter(id__in=stale_ids).update(dispatched_at=None, updated_at=timezone.now())
+            schedule_dispatch()
+    return stale_ids
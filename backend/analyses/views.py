@@ -9,12 +9,12 @@ from urllib import request as urlrequest
 from django.conf import settings
 from django.core.paginator import EmptyPage, Paginator
 from django.db import transaction
-from django.db.models import Count, Max, Min, Sum
+from django.db.models import Count, F, Max, Min, Q, Sum
 from django.http import HttpResponse
 from django.http import StreamingHttpResponse
 from django.utils import timezone
-from rest_framework import status
-from rest_framework.exceptions import NotFound
+from rest_framework import permissions, serializers, status
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -32,7 +32,8 @@ from analyses.models import (
     ReportSchedule,
     WorkspacePreference,
 )
-from analyses.redaction import redact_text
+from analyses.profiling import profile_artifact_response
+from analyses.redaction import CachingRedactor, Redactor, is_current_redaction_policy
 from analyses.serializers import (
     AnalysisRunSerializer,
     IncidentSerializer,
@@ -43,7 +44,7 @@ from analyses.serializers import (
     ReportScheduleSerializer,
     WorkspacePreferenceSerializer,
 )
-from analyses.tasks import analyze_source
+from analyses.tasks import schedule_dispatch, schedule_generation_gc
 from analyses.throttles import AnalyzeRequestUserThrottle
 from sources.models import Source
 
@@ -55,6 +56,7 @@ ALLOWED_DASHBOARD_WINDOWS = {
 }
 DEFAULT_EVENT_QUERY_LIMIT = 100
 MAX_EVENT_QUERY_LIMIT = 200
+READ_REDACTION_CACHE_SIZE = 1024
 logger = logging.getLogger(__name__)
 
 
@@ -62,6 +64,51 @@ def _escape_markdown_cell(value: str) -> str:
     return str(value or "").replace("|", "\\|").replace("\n", " ").strip()
 
 
+def _owned_log_events(owner_id: int, *, include_pending: bool = False, **analysis_filters):
+    # Filtering on a run id subquery, rather than joining through the source,
+    # lets PostgreSQL probe one LogEvent partition per run and skip the others.
+    events = LogEvent.objects.filter(
+        analysis_run_id__in=AnalysisRun.objects.filter(source__owner_id=owner_id, **analysis_filters).values("id")
+    )
+    if include_pending:
+        # A running analysis shows the generation it is writing in place of the
+        # one it replaces; generations other runs never activated stay hidden.
+        running = Q(analysis_run__status=AnalysisRun.Status.RUNNING)
+        return events.filter(
+            (running & Q(generation=F("analysis_run__latest_generation")))
+            | (~running & Q(generation=F("analysis_run__active_generation")))
+        )
+    return events.filter(generation=F("analysis_run__active_generation"))
+
+
+class _ReadRedactor:
+    """Redact stored values on their way out of the API.
+
+    Event messages, trace ids and request ids were redacted at ingest, so they are
+    only redacted again for runs written under another redaction policy. Anything
+    else (services, AI text) is always redacted.
+    """
+
+    def __init__(self):
+        self._redactor = CachingRedactor(Redactor.from_settings(), READ_REDACTION_CACHE_SIZE)
+        self._current_runs: dict[int, bool] = {}
+
+    def __call__(self, value: str | None) -> str:
+        redacted, _, _ = self._redactor.redact(value or "")
+        return redacted
+
+    def ingested(self, analysis: AnalysisRun, value: str | None) -> str:
+        is_current = self._current_runs.get(analysis.id)
+        if is_current is None:
+            is_current = is_current_redaction_policy(
+                analysis.redaction_policy_version, analysis.redaction_policy_hash
+            )
+            self._current_runs[analysis.id] = is_current
+        if is_current:
+            return value or ""
+        return self(value)
+
+
 class SourceAnalysisListCreateView(APIView):
     throttle_classes = [AnalyzeRequestUserThrottle]
 
@@ -94,29 +141,29 @@ class SourceAnalysisListCreateView(APIView):
             data = AnalysisRunSerializer(active).data
             return Response(data, status=status.HTTP_200_OK)
 
-        analysis = AnalysisRun.objects.create(source=source, status=AnalysisRun.Status.QUEUED)
+        try:
+            profile_requested = serializers.BooleanField().run_validation(request.data.get("profile", False))
+        except ValidationError as exc:
+            raise ValidationError({"profile": exc.detail}) from exc
+        if profile_requested and not request.user.is_staff:
+            raise PermissionDenied("Only administrators can request profiling.")
+
+        analysis = AnalysisRun.objects.create(
+            source=source,
+            status=AnalysisRun.Status.QUEUED,
+            profile_requested=profile_requested,
+        )
         safe_log_audit_event(
             owner_id=source.owner_id,
             actor_id=request.user.id,
             event_type=AuditLogEvent.EventType.ANALYZE_START,
             source_id=source.id,
             analysis_id=analysis.id,
-            metadata={"status": AnalysisRun.Status.QUEUED},
+            metadata={"status": AnalysisRun.Status.QUEUED, "profile_requested": profile_requested},
         )
 
-        def enqueue_analysis_task():
-            try:
-                analyze_source.delay(analysis.id)
-            except Exception:
-                logger.exception("failed to enqueue analysis task analysis_id=%s", analysis.id)
-                AnalysisRun.objects.filter(id=analysis.id).update(
-                    status=AnalysisRun.Status.FAILED,
-                    error_message="Failed to enqueue analysis task.",
-                    finished_at=timezone.now(),
-                    updated_at=timezone.now(),
-                )
-
-        transaction.on_commit(enqueue_analysis_task)
+        # The run waits for its fair share of workers (see analyses.dispatch).
+        schedule_dispatch()
 
         data = AnalysisRunSerializer(analysis).data
         return Response(data, status=status.HTTP_202_ACCEPTED)
@@ -135,6 +182,53 @@ class AnalysisRunStatusView(APIView):
         return Response(AnalysisRunSerializer(analysis).data, status=status.HTTP_200_OK)
 
 
+class AnalysisCancelView(APIView):
+    @transaction.atomic
+    def post(self, request, analysis_id: int):
+        analysis = (
+            AnalysisRun.objects.select_for_update()
+            .select_related("source")
+            .filter(id=analysis_id, source__owner=request.user)
+            .first()
+        )
+        if analysis is None:
+            raise NotFound("Analysis not found.")
+        if analysis.status not in (AnalysisRun.Status.QUEUED, AnalysisRun.Status.RUNNING):
+            return Response(
+                {"detail": f"Analysis is already {analysis.status}."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # The worker notices at its next batch and stops; a queued task exits
+        # as soon as it is picked up.
+        previous_status = analysis.status
+        analysis.status = AnalysisRun.Status.CANCELLED
+        analysis.error_message = "Analysis was cancelled."
+        analysis.finished_at = timezone.now()
+        analysis.save(update_fields=["status", "error_message", "finished_at", "updated_at"])
+        safe_log_audit_event(
+            owner_id=analysis.source.owner_id,
+            actor_id=request.user.id,
+            event_type=AuditLogEvent.EventType.ANALYZE_CANCEL,
+            source_id=analysis.source_id,
+            analysis_id=analysis.id,
+            metadata={"status": analysis.status, "previous_status": previous_status},
+        )
+        schedule_generation_gc(analysis.id)
+        schedule_dispatch()
+        return Response(AnalysisRunSerializer(analysis).data, status=status.HTTP_200_OK)
+
+
+class AnalysisProfileDownloadView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, analysis_id: int):
+        response = profile_artifact_response(analysis_id)
+        if response is None:
+            raise NotFound("Profile not found.")
+        return response
+
+
 class DashboardSummaryView(APIView):
     def get(self, request):
         requested_window = request.query_params.get("window", "24h").strip().lower() or "24h"
@@ -180,6 +274,7 @@ class DashboardSummaryView(APIView):
             LogCluster.objects.filter(
                 analysis_run__source__owner=request.user,
                 analysis_run__created_at__gte=window_start,
+                generation=F("analysis_run__active_generation"),
             )
             .values("fingerprint", "title")
             .annotate(
@@ -253,10 +348,7 @@ class DashboardSummaryView(APIView):
                 bucket["failed"] += 1
 
         level_distribution_rows = (
-            LogEvent.objects.filter(
-                analysis_run__source__owner=request.user,
-                analysis_run__created_at__gte=window_start,
-            )
+            _owned_log_events(request.user.id, created_at__gte=window_start)
             .values("level")
             .annotate(count=Count("id"))
             .order_by("-count")
@@ -335,7 +427,7 @@ class LiveTailStreamView(APIView):
         cursor_id: int | None,
         batch_limit: int,
     ):
-        queryset = LogEvent.objects.filter(analysis_run__source__owner_id=owner_id).select_related(
+        queryset = _owned_log_events(owner_id, include_pending=True).select_related(
             "analysis_run",
             "analysis_run__source",
         )
@@ -354,9 +446,10 @@ class LiveTailStreamView(APIView):
 
         events = []
         newest_cursor = cursor_id or 0
+        redact = _ReadRedactor()
         for event in rows:
-            redacted_message, _, _ = redact_text(event.message or "")
-            redacted_service, _, _ = redact_text(event.service or "")
+            redacted_message = redact.ingested(event.analysis_run, event.message)
+            redacted_service = redact(event.service)
             events.append(
                 {
                     "id": event.id,
@@ -468,7 +561,7 @@ class AnomalyGroupListView(APIView):
     def get(self, request):
         now = timezone.now()
         grouped = list(
-            LogEvent.objects.filter(analysis_run__source__owner=request.user)
+            _owned_log_events(request.user.id)
             .exclude(level__in=["debug", "info"])
             .values("fingerprint", "service")
             .annotate(
@@ -536,10 +629,7 @@ class AnomalyGroupDetailView(APIView):
             raise ValidationError({"service": "service exceeds 128 characters."})
         service_key = _normalize_anomaly_service(service)
 
-        event_queryset = LogEvent.objects.filter(
-            analysis_run__source__owner=request.user,
-            fingerprint=normalized_fingerprint,
-        )
+        event_queryset = _owned_log_events(request.user.id).filter(fingerprint=normalized_fingerprint)
         if service_key:
             event_queryset = event_queryset.filter(service=service_key)
         else:
@@ -574,11 +664,12 @@ class AnomalyGroupDetailView(APIView):
         )
 
         evidence_events = []
+        redact = _ReadRedactor()
         for event in event_queryset.select_related("analysis_run", "analysis_run__source").order_by("-created_at")[
             :ANOMALY_MAX_EVIDENCE_EVENTS
         ]:
-            redacted_message, _, _ = redact_text(event.message or "")
-            redacted_service, _, _ = redact_text(event.service or "")
+            redacted_message = redact.ingested(event.analysis_run, event.message)
+            redacted_service = redact(event.service)
             evidence_events.append(
                 {
                     "id": event.id,
@@ -629,8 +720,7 @@ class AnomalyGroupReviewView(APIView):
                 }
             )
 
-        event_exists = LogEvent.objects.filter(
-            analysis_run__source__owner=request.user,
+        event_exists = _owned_log_events(request.user.id).filter(
             fingerprint=normalized_fingerprint,
             service=service_key,
         ).exists()
@@ -750,7 +840,10 @@ class IncidentDetailView(APIView):
                         "detail": f"Status: {incident.analysis_run.status}",
                     }
                 )
-            cluster_queryset = LogCluster.objects.filter(analysis_run_id=incident.analysis_run_id).order_by("-count")[:5]
+            cluster_queryset = LogCluster.objects.filter(
+                analysis_run_id=incident.analysis_run_id,
+                generation=incident.analysis_run.active_generation,
+            ).order_by("-count")[:5]
             for cluster in cluster_queryset:
                 linked_clusters.append(
                     {
@@ -1017,7 +1110,7 @@ class AnalysisClusterListView(APIView):
         if analysis is None:
             raise NotFound("Analysis not found.")
 
-        clusters = analysis.clusters.all().order_by("-count", "fingerprint")
+        clusters = analysis.clusters.filter(generation=analysis.active_generation).order_by("-count", "fingerprint")
         return Response(LogClusterSerializer(clusters, many=True).data, status=status.HTTP_200_OK)
 
 
@@ -1031,7 +1124,7 @@ class AnalysisEventListView(APIView):
         if analysis is None:
             raise NotFound("Analysis not found.")
 
-        events = LogEvent.objects.filter(analysis_run=analysis)
+        events = LogEvent.objects.filter(analysis_run=analysis, generation=analysis.active_generation)
         search_query = request.query_params.get("q", "").strip()
         if len(search_query) > 300:
             raise ValidationError({"q": "Search query exceeds 300 characters."})
@@ -1106,14 +1199,15 @@ class AnalysisExportJSONView(APIView):
         if analysis is None:
             raise NotFound("Analysis not found.")
 
-        total_events = LogEvent.objects.filter(analysis_run=analysis).count()
+        total_events = LogEvent.objects.filter(analysis_run=analysis, generation=analysis.active_generation).count()
         event_limit = settings.EXPORT_MAX_EVENTS
-        events_qs = LogEvent.objects.filter(analysis_run=analysis).order_by("line_no")
+        events_qs = LogEvent.objects.filter(analysis_run=analysis, generation=analysis.active_generation).order_by("line_no")
         export_truncated = total_events > event_limit
         if export_truncated:
             events_qs = events_qs[:event_limit]
 
         events_payload = []
+        redact = _ReadRedactor()
         for event in events_qs.values(
             "id",
             "line_no",
@@ -1125,10 +1219,10 @@ class AnalysisExportJSONView(APIView):
             "request_id",
             "tags",
         ):
-            redacted_message, _, _ = redact_text(event.get("message") or "")
-            redacted_service, _, _ = redact_text(event.get("service") or "")
-            redacted_trace_id, _, _ = redact_text(event.get("trace_id") or "")
-            redacted_request_id, _, _ = redact_text(event.get("request_id") or "")
+            redacted_message = redact.ingested(analysis, event.get("message"))
+            redacted_service = redact(event.get("service"))
+            redacted_trace_id = redact.ingested(analysis, event.get("trace_id"))
+            redacted_request_id = redact.ingested(analysis, event.get("request_id"))
             events_payload.append(
                 {
                     **event,
@@ -1170,7 +1264,7 @@ class AnalysisExportJSONView(APIView):
                 "created_at": analysis.source.created_at,
             },
             "clusters": LogClusterSerializer(
-                analysis.clusters.all().order_by("-count", "fingerprint"),
+                analysis.clusters.filter(generation=analysis.active_generation).order_by("-count", "fingerprint"),
                 many=True,
             ).data,
             "events": events_payload,
@@ -1207,17 +1301,15 @@ class AnalysisExportMarkdownView(APIView):
         markdown_event_limit = max(1, int(settings.EXPORT_MARKDOWN_MAX_EVENTS))
 
         clusters = list(
-            analysis.clusters.all().order_by("-count", "fingerprint")[:markdown_cluster_limit]
+            analysis.clusters.filter(generation=analysis.active_generation).order_by("-count", "fingerprint")[:markdown_cluster_limit]
         )
         events = list(
-            LogEvent.objects.filter(analysis_run=analysis)
+            LogEvent.objects.filter(analysis_run=analysis, generation=analysis.active_generation)
             .order_by("line_no")
             .values("line_no", "timestamp", "level", "service", "message")[:markdown_event_limit]
         )
 
-        def redact_value(value: str | None) -> str:
-            redacted, _, _ = redact_text(value or "")
-            return redacted
+        redact_value = _ReadRedactor()
 
         lines: list[str] = [
             "# LogLens Incident Report",
@@ -1309,8 +1401,8 @@ class AnalysisExportMarkdownView(APIView):
         lines.extend(["", "## Event Excerpts", ""])
         if events:
             for event in events:
-                message = redact_value(event.get("message") or "")
-                service = redact_value(event.get("service") or "")
+                message = redact_value.ingested(analysis, event.get("message"))
+                service = redact_value(event.get("service"))
                 lines.append(
                     f"- line {event.get('line_no')} [{event.get('level')}] "
                     f"{service or 'n/a'}: {message}"
@@ -1336,7 +1428,11 @@ class ClusterDetailView(APIView):
     def get(self, request, cluster_id: int):
         cluster = (
             LogCluster.objects.select_related("analysis_run", "analysis_run__source")
-            .filter(id=cluster_id, analysis_run__source__owner=request.user)
+            .filter(
+                id=cluster_id,
+                analysis_run__source__owner=request.user,
+                generation=F("analysis_run__active_generation"),
+            )
             .first()
         )
         if cluster is None:
@@ -1346,6 +1442,7 @@ class ClusterDetailView(APIView):
         sample_events = list(
             LogEvent.objects.filter(
                 analysis_run=cluster.analysis_run,
+                generation=cluster.generation,
                 line_no__in=sample_line_numbers,
             )
             .order_by("line_no")
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0002_alter_auditlogevent_event_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlogevent',
+            name='event_type',
+            field=models.CharField(choices=[('upload', 'Upload'), ('analyze_start', 'Analyze Start'), ('analyze_finish', 'Analyze Finish'), ('analyze_fail', 'Analyze Fail'), ('analyze_cancel', 'Analyze Cancel'), ('export', 'Export'), ('delete', 'Delete'), ('integration_test', 'Integration Test'), ('settings_update', 'Settings Update'), ('account_security', 'Account Security')], db_index=True, max_length=32),
+        ),
+    ]
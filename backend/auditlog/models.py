@@ -8,6 +8,7 @@ class AuditLogEvent(models.Model):
         ANALYZE_START = "analyze_start", "Analyze Start"
         ANALYZE_FINISH = "analyze_finish", "Analyze Finish"
         ANALYZE_FAIL = "analyze_fail", "Analyze Fail"
+        ANALYZE_CANCEL = "analyze_cancel", "Analyze Cancel"
         EXPORT = "export", "Export"
         DELETE = "delete", "Delete"
         INTEGRATION_TEST = "integration_test", "Integration Test"
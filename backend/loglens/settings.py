@@ -149,7 +149,7 @@ SOURCE_UPLOAD_MAX_BYTES = int(os.getenv("SOURCE_UPLOAD_MAX_BYTES", str(10 * 1024
 SOURCE_UPLOAD_ALLOWED_EXTENSIONS = {
     ext.strip().lower()
     for ext in os.getenv(
-        "SOURCE_UPLOAD_ALLOWED_EXTENSIONS", ".log,.txt,.jsonl,.gz"
+        "SOURCE_UPLOAD_ALLOWED_EXTENSIONS", ".log,.txt,.jsonl,.gz,.bz2,.xz,.zst,.zstd"
     ).split(",")
     if ext.strip()
 }
@@ -157,7 +157,10 @@ SOURCE_UPLOAD_ALLOWED_CONTENT_TYPES = {
     content_type.strip().lower()
     for content_type in os.getenv(
         "SOURCE_UPLOAD_ALLOWED_CONTENT_TYPES",
-        "text/plain,application/json,application/gzip,application/x-gzip,application/octet-stream",
+        (
+            "text/plain,application/json,application/gzip,application/x-gzip,"
+            "application/x-bzip2,application/x-xz,application/zstd,application/octet-stream"
+        ),
     ).split(",")
     if content_type.strip()
 }
@@ -169,6 +172,7 @@ SOURCE_RETENTION_ENABLED = _env_bool("SOURCE_RETENTION_ENABLED", default=True)
 SOURCE_RETENTION_DAYS = int(os.getenv("SOURCE_RETENTION_DAYS", "30"))
 SOURCE_RETENTION_BATCH_SIZE = int(os.getenv("SOURCE_RETENTION_BATCH_SIZE", "500"))
 ANALYSIS_TASK_MAX_LINES = int(os.getenv("ANALYSIS_TASK_MAX_LINES", "50000"))
+# Counted after decompression, so compressed uploads cannot bypass the limit.
 ANALYSIS_READER_MAX_BYTES = int(os.getenv("ANALYSIS_READER_MAX_BYTES", str(20 * 1024 * 1024)))
 ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS = int(
     os.getenv("ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS", "120")
@@ -176,6 +180,53 @@ ANALYSIS_TASK_SOFT_TIME_LIMIT_SECONDS = int(
 ANALYSIS_TASK_TIME_LIMIT_SECONDS = int(
     os.getenv("ANALYSIS_TASK_TIME_LIMIT_SECONDS", "180")
 )
+ANALYSIS_TASK_INVOCATION_BUDGET_SECONDS = int(
+    os.getenv("ANALYSIS_TASK_INVOCATION_BUDGET_SECONDS", "90")
+)
+ANALYSIS_TASK_MAX_INVOCATIONS = int(os.getenv("ANALYSIS_TASK_MAX_INVOCATIONS", "10"))
+ANALYSIS_SHARDING_ENABLED = _env_bool("ANALYSIS_SHARDING_ENABLED", default=True)
+ANALYSIS_SHARD_MIN_BYTES = int(os.getenv("ANALYSIS_SHARD_MIN_BYTES", str(4 * 1024 * 1024)))
+ANALYSIS_SHARD_TARGET_BYTES = int(os.getenv("ANALYSIS_SHARD_TARGET_BYTES", str(2 * 1024 * 1024)))
+ANALYSIS_SHARD_MAX_COUNT = int(os.getenv("ANALYSIS_SHARD_MAX_COUNT", "8"))
+ANALYSIS_PIPELINE_THREADED = _env_bool("ANALYSIS_PIPELINE_THREADED", default=True)
+ANALYSIS_PIPELINE_QUEUE_SIZE = int(os.getenv("ANALYSIS_PIPELINE_QUEUE_SIZE", "4"))
+# Processes used to parse, normalize and redact serial ingest, started once per worker
+# process and reused; 0 or 1 keeps it in-process.
+ANALYSIS_PARSE_WORKERS = int(os.getenv("ANALYSIS_PARSE_WORKERS", "0"))
+# Distinct strings whose redaction result each ingest task keeps; 0 disables the cache.
+ANALYSIS_REDACTION_CACHE_SIZE = int(os.getenv("ANALYSIS_REDACTION_CACHE_SIZE", "4096"))
+# Load events with COPY FROM STDIN on PostgreSQL; other databases always use bulk_create.
+ANALYSIS_EVENT_COPY_ENABLED = _env_bool("ANALYSIS_EVENT_COPY_ENABLED", default=True)
+# Rows per DELETE when removing the generations a re-analysis has replaced.
+ANALYSIS_GENERATION_GC_CHUNK_SIZE = int(os.getenv("ANALYSIS_GENERATION_GC_CHUNK_SIZE", "5000"))
+# Record wall/CPU time, rows and bytes per pipeline stage in stats["perf"]["stages"].
+ANALYSIS_PERF_ENABLED = _env_bool("ANALYSIS_PERF_ENABLED", default=True)
+# Profile every analysis with cProfile and tracemalloc; admins can also request it per run.
+ANALYSIS_PROFILING_ENABLED = _env_bool("ANALYSIS_PROFILING_ENABLED", default=False)
+# How often a worker stamps heartbeat_at on the run it is processing; 0 stamps once per batch only.
+ANALYSIS_HEARTBEAT_INTERVAL_SECONDS = int(os.getenv("ANALYSIS_HEARTBEAT_INTERVAL_SECONDS", "15"))
+# Running analyses without a heartbeat for this long are requeued or failed by the reaper.
+ANALYSIS_HEARTBEAT_STALE_SECONDS = int(os.getenv("ANALYSIS_HEARTBEAT_STALE_SECONDS", "300"))
+# Same for sharded runs, whose shards may wait in the broker without any heartbeat.
+ANALYSIS_SHARDED_HEARTBEAT_STALE_SECONDS = int(os.getenv("ANALYSIS_SHARDED_HEARTBEAT_STALE_SECONDS", "1800"))
+# How often celery beat runs the stale-run reaper.
+ANALYSIS_REAPER_INTERVAL_SECONDS = int(os.getenv("ANALYSIS_REAPER_INTERVAL_SECONDS", "60"))
+# Fair-share dispatch: runs in flight per owner and in total (0 for no limit); a
+# sharded run counts once per shard.
+ANALYSIS_OWNER_MAX_ACTIVE = int(os.getenv("ANALYSIS_OWNER_MAX_ACTIVE", "2"))
+ANALYSIS_DISPATCH_MAX_ACTIVE = int(os.getenv("ANALYSIS_DISPATCH_MAX_ACTIVE", "4"))
+# How often celery beat retries dispatching pending runs, besides when slots free up.
+ANALYSIS_DISPATCH_INTERVAL_SECONDS = int(os.getenv("ANALYSIS_DISPATCH_INTERVAL_SECONDS", "15"))
+# Dispatched runs no worker has started after this long go back to pending.
+ANALYSIS_DISPATCH_STALE_SECONDS = int(os.getenv("ANALYSIS_DISPATCH_STALE_SECONDS", "900"))
+ANALYSIS_MULTILINE_ENABLED = _env_bool("ANALYSIS_MULTILINE_ENABLED", default=True)
+ANALYSIS_MULTILINE_MAX_EVENT_LINES = int(os.getenv("ANALYSIS_MULTILINE_MAX_EVENT_LINES", "200"))
+ANALYSIS_PARSER_DETECTION_SAMPLE_LINES = int(
+    os.getenv("ANALYSIS_PARSER_DETECTION_SAMPLE_LINES", "200")
+)
+# auto uses orjson when it is installed and falls back to the stdlib json module.
+ANALYSIS_JSON_DECODER = os.getenv("ANALYSIS_JSON_DECODER", "auto").strip().lower()
+ANALYSIS_RESULT_REUSE_ENABLED = _env_bool("ANALYSIS_RESULT_REUSE_ENABLED", default=True)
 EXPORT_MAX_EVENTS = int(os.getenv("EXPORT_MAX_EVENTS", "10000"))
 EXPORT_MARKDOWN_MAX_CLUSTERS = int(os.getenv("EXPORT_MARKDOWN_MAX_CLUSTERS", "20"))
 EXPORT_MARKDOWN_MAX_EVENTS = int(os.getenv("EXPORT_MARKDOWN_MAX_EVENTS", "100"))
@@ -200,6 +251,20 @@ LLM_MAX_CLUSTER_CONTEXT = int(os.getenv("LLM_MAX_CLUSTER_CONTEXT", "20"))
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
 CELERY_TASK_TRACK_STARTED = True
+# Periodic messages expire at their next tick, so the ones queued behind a long
+# analysis are dropped rather than run back-to-back once the worker is free.
+CELERY_BEAT_SCHEDULE = {
+    "reap-stale-analyses": {
+        "task": "analyses.tasks.reap_stale_analyses",
+        "schedule": ANALYSIS_REAPER_INTERVAL_SECONDS,
+        "options": {"expires": ANALYSIS_REAPER_INTERVAL_SECONDS},
+    },
+    "dispatch-analyses": {
+        "task": "analyses.tasks.dispatch_analyses",
+        "schedule": ANALYSIS_DISPATCH_INTERVAL_SECONDS,
+        "options": {"expires": ANALYSIS_DISPATCH_INTERVAL_SECONDS},
+    },
+}
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(
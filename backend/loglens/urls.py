@@ -18,9 +18,11 @@ from analyses.views import (
     ReportScheduleDetailView,
     ReportScheduleListCreateView,
     WorkspacePreferenceView,
+    AnalysisCancelView,
     AnalysisEventListView,
     AnalysisExportJSONView,
     AnalysisExportMarkdownView,
+    AnalysisProfileDownloadView,
     AnalysisRunStatusView,
     ClusterDetailView,
     SourceAnalysisListCreateView,
@@ -46,6 +48,16 @@ urlpatterns = [
         name="source-analyze-create",
     ),
     path("api/analyses/<int:analysis_id>", AnalysisRunStatusView.as_view(), name="analysis-status"),
+    path(
+        "api/analyses/<int:analysis_id>/cancel",
+        AnalysisCancelView.as_view(),
+        name="analysis-cancel",
+    ),
+    path(
+        "api/analyses/<int:analysis_id>/profile",
+        AnalysisProfileDownloadView.as_view(),
+        name="analysis-profile-download",
+    ),
     path(
         "api/dashboard/summary",
         DashboardSummaryView.as_view(),
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.8 on 2026-10-16 22:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sources', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='content_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='source',
+            index=models.Index(fields=['owner', 'content_digest'], name='source_owner_digest_idx'),
+        ),
+    ]
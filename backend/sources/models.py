@@ -17,6 +17,7 @@ class Source(models.Model):
     type = models.CharField(max_length=16, choices=SourceType.choices, db_index=True)
     file_object_key = models.CharField(max_length=1024, null=True, blank=True)
     content_text = models.TextField(blank=True, default="")
+    content_digest = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -24,6 +25,7 @@ class Source(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["owner", "-created_at"], name="source_owner_created_idx"),
+            models.Index(fields=["owner", "content_digest"], name="source_owner_digest_idx"),
         ]
         constraints = [
             models.CheckConstraint(
@@ -5,8 +5,9 @@ from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.utils import timezone
 
+from analyses.profiling import delete_profile_artifacts
 from sources.models import Source
-from sources.storage import get_source_upload_storage
+from sources.storage import get_source_upload_storage, release_source_upload
 
 logger = logging.getLogger(__name__)
 
@@ -36,18 +37,24 @@ def purge_expired_upload_sources(*, dry_run: bool = False, limit: int | None = N
     storage_delete_failures = 0
     storage = get_source_upload_storage()
     for source in candidates:
+        if dry_run:
+            continue
+        source_id = source.id
+        profile_keys = list(
+            source.analyses.exclude(profile_object_key="").values_list("profile_object_key", flat=True)
+        )
+        source.delete()
+        delete_profile_artifacts(profile_keys)
+        deleted_count += 1
+
         if source.file_object_key:
             try:
-                storage.delete_upload(source.file_object_key)
+                release_source_upload(storage, source)
             except (ImproperlyConfigured, NotImplementedError):
                 storage_delete_failures += 1
             except Exception:
                 storage_delete_failures += 1
-                logger.exception("retention cleanup storage delete failed source_id=%s", source.id)
-
-        if not dry_run:
-            source.delete()
-            deleted_count += 1
+                logger.exception("retention cleanup storage delete failed source_id=%s", source_id)
 
     return {
         "retention_enabled": True,
@@ -2,9 +2,11 @@ from pathlib import Path
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import APIException
 
+from analyses.line_reader import get_codec_for_extension
 from sources.models import Source
 from sources.storage import get_source_upload_storage
 
@@ -17,6 +19,7 @@ class SourceSerializer(serializers.ModelSerializer):
             "name",
             "type",
             "file_object_key",
+            "content_digest",
             "created_at",
             "updated_at",
         ]
@@ -49,23 +52,40 @@ class SourceUploadSerializer(serializers.Serializer):
                 f"Unsupported content type '{content_type}'."
             )
 
+        codec = get_codec_for_extension(suffix)
+        if codec is not None:
+            if not codec.is_available():
+                raise serializers.ValidationError(
+                    f"{codec.name} uploads are not supported on this server."
+                )
+            header = uploaded_file.read(len(codec.magic))
+            uploaded_file.seek(0)
+            if header != codec.magic:
+                raise serializers.ValidationError(
+                    f"File extension '{suffix}' does not match a {codec.name} stream."
+                )
+
         return uploaded_file
 
     def create(self, validated_data):
         request = self.context["request"]
         uploaded_file = validated_data["file"]
         source_name = validated_data.get("name", Path(uploaded_file.name).name)
-        try:
-            file_object_key = get_source_upload_storage().save_upload(
-                owner_id=request.user.id,
-                uploaded_file=uploaded_file,
-            )
-        except (ImproperlyConfigured, NotImplementedError) as error:
-            raise APIException(str(error)) from error
+        # One transaction, so a deduplicated upload stays locked until its
+        # source exists (see sources.storage.lock_owner_uploads).
+        with transaction.atomic():
+            try:
+                file_object_key, content_digest = get_source_upload_storage().save_upload(
+                    owner_id=request.user.id,
+                    uploaded_file=uploaded_file,
+                )
+            except (ImproperlyConfigured, NotImplementedError) as error:
+                raise APIException(str(error)) from error
 
-        return Source.objects.create(
-            owner=request.user,
-            name=source_name,
-            type=Source.SourceType.UPLOAD,
-            file_object_key=file_object_key,
-        )
+            return Source.objects.create(
+                owner=request.user,
+                name=source_name,
+                type=Source.SourceType.UPLOAD,
+                file_object_key=file_object_key,
+                content_digest=content_digest,
+            )
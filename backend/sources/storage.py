@@ -1,24 +1,84 @@
+import hashlib
+import os
 from pathlib import Path
 from typing import Protocol
 from uuid import uuid4
 
 from django.conf import settings
-from django.core.files.storage import default_storage
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from sources.models import Source
+
+CONTENT_DIGEST_ALGORITHM = "sha256"
 
 
 class SourceUploadStorage(Protocol):
-    def save_upload(self, owner_id: int, uploaded_file) -> str: ...
+    def save_upload(self, owner_id: int, uploaded_file) -> tuple[str, str]: ...
     def delete_upload(self, object_key: str) -> None: ...
 
 
+class _DigestingFile(File):
+    """File wrapper that hashes chunks as storage pulls them."""
+
+    def __init__(self, uploaded_file):
+        super().__init__(uploaded_file, name=uploaded_file.name)
+        self.hasher = hashlib.new(CONTENT_DIGEST_ALGORITHM)
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self.hasher.update(chunk)
+            yield chunk
+
+
+def lock_owner_uploads(owner_id: int) -> None:
+    """Serialize reuse and release of an owner's stored uploads until the transaction ends.
+
+    Object keys are per owner, so locking the owner's row is enough to keep a
+    reused upload from being deleted before the source referencing it exists.
+    """
+    get_user_model().objects.select_for_update().filter(id=owner_id).first()
+
+
+def _promote_upload(temp_key: str, object_key: str) -> str:
+    if isinstance(default_storage, FileSystemStorage):
+        # Renaming in place avoids writing the upload a second time.
+        os.replace(default_storage.path(temp_key), default_storage.path(object_key))
+        return object_key
+    with default_storage.open(temp_key) as temp_file:
+        object_key = default_storage.save(object_key, temp_file)
+    default_storage.delete(temp_key)
+    return object_key
+
+
 class LocalSourceUploadStorage:
-    def save_upload(self, owner_id: int, uploaded_file) -> str:
+    def save_upload(self, owner_id: int, uploaded_file) -> tuple[str, str]:
+        """Store an upload under its content digest and return ``(object_key, digest)``.
+
+        The file is hashed in the same pass that writes it to a temporary key; it
+        is then moved to ``sources/<owner>/<digest><ext>`` unless an identical
+        upload from the same owner is already stored there. Call it inside the
+        transaction that creates the source: the owner then stays locked (see
+        :func:`lock_owner_uploads`) until the source exists, so the stored upload
+        cannot be released in between.
+        """
         safe_filename = Path(uploaded_file.name).name
         extension = Path(safe_filename).suffix.lower()
-        object_key = f"sources/{owner_id}/{uuid4()}{extension}"
-        saved_path = default_storage.save(object_key, uploaded_file)
-        return str(saved_path)
+        digesting_file = _DigestingFile(uploaded_file)
+        temp_key = default_storage.save(f"sources/{owner_id}/.incoming-{uuid4()}{extension}", digesting_file)
+        content_digest = digesting_file.hasher.hexdigest()
+
+        object_key = f"sources/{owner_id}/{content_digest}{extension}"
+        with transaction.atomic():
+            lock_owner_uploads(owner_id)
+            if default_storage.exists(object_key):
+                default_storage.delete(temp_key)
+            else:
+                object_key = _promote_upload(temp_key, object_key)
+        return object_key, content_digest
 
     def delete_upload(self, object_key: str) -> None:
         if default_storage.exists(object_key):
@@ -26,7 +86,7 @@ class LocalSourceUploadStorage:
 
 
 class S3CompatibleSourceUploadStorage:
-    def save_upload(self, owner_id: int, uploaded_file) -> str:  # noqa: ARG002
+    def save_upload(self, owner_id: int, uploaded_file) -> tuple[str, str]:  # noqa: ARG002
         if not settings.SOURCE_S3_BUCKET:
             raise ImproperlyConfigured(
                 "SOURCE_S3_BUCKET is required when SOURCE_STORAGE_BACKEND=s3"
@@ -56,3 +116,20 @@ def get_source_upload_storage() -> SourceUploadStorage:
     raise ImproperlyConfigured(
         "Unsupported SOURCE_STORAGE_BACKEND. Use one of: local, s3."
     )
+
+
+def release_source_upload(storage: SourceUploadStorage, source) -> None:
+    """Delete a source's stored upload unless another source still references it.
+
+    Call it after the source row is deleted. Checking before would let two
+    sources sharing an upload, deleted at the same time, each still see the
+    other and both keep the file.
+    """
+    if not source.file_object_key:
+        return
+    with transaction.atomic():
+        # An upload reusing this object either committed its source already or
+        # finds the object gone and stores its own copy.
+        lock_owner_uploads(source.owner_id)
+        if not Source.objects.filter(file_object_key=source.file_object_key).exists():
+            storage.delete_upload(source.file_object_key)
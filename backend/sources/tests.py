@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import InMemoryStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from sources.models import Source
+from sources.storage import LocalSourceUploadStorage, release_source_upload
+
+
+class SourceUploadStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.owner = get_user_model().objects.create(username="owner")
+        self.storage = LocalSourceUploadStorage()
+
+    def _save(self, name: str, payload: bytes) -> Source:
+        object_key, content_digest = self.storage.save_upload(self.owner.id, SimpleUploadedFile(name, payload))
+        return Source.objects.create(
+            owner=self.owner,
+            name=name,
+            type=Source.SourceType.UPLOAD,
+            file_object_key=object_key,
+            content_digest=content_digest,
+        )
+
+    def test_deduplicates_on_storage_without_local_paths(self):
+        storage = InMemoryStorage()
+        with mock.patch("sources.storage.default_storage", storage):
+            first = self._save("a.log", b"same\n")
+            second = self._save("b.log", b"same\n")
+
+        self.assertEqual(first.file_object_key, second.file_object_key)
+        self.assertEqual(storage.open(first.file_object_key).read(), b"same\n")
+        _, stored = storage.listdir(f"sources/{self.owner.id}")
+        self.assertEqual(stored, [first.file_object_key.rsplit("/", 1)[-1]])
+
+    def test_upload_after_release_stores_its_own_copy(self):
+        first = self._save("a.log", b"same\n")
+        first.delete()
+        release_source_upload(self.storage, first)
+        self.assertFalse(default_storage.exists(first.file_object_key))
+
+        second = self._save("b.log", b"same\n")
+        self.assertTrue(default_storage.exists(second.file_object_key))
+
+        third = self._save("c.log", b"same\n")
+        self.assertEqual(third.file_object_key, second.file_object_key)
+        third.delete()
+        release_source_upload(self.storage, third)
+        self.assertTrue(default_storage.exists(second.file_object_key))
+
+    def test_sources_deleted_together_release_their_shared_upload(self):
+        first = self._save("a.log", b"same\n")
+        second = self._save("b.log", b"same\n")
+
+        first.delete()
+        second.delete()
+        release_source_upload(self.storage, first)
+        release_source_upload(self.storage, second)
+
+        self.assertFalse(default_storage.exists(first.file_object_key))
+
+
+class SourceUploadStorageTransactionTests(TransactionTestCase):
+    def test_save_upload_needs_no_surrounding_transaction(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        owner = get_user_model().objects.create(username="owner")
+
+        with override_settings(MEDIA_ROOT=media_root):
+            object_key, _ = LocalSourceUploadStorage().save_upload(owner.id, SimpleUploadedFile("a.log", b"a\n"))
+
+            self.assertTrue(default_storage.exists(object_key))
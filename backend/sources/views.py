@@ -5,9 +5,10 @@ from rest_framework.response import Response
 
 from auditlog.models import AuditLogEvent
 from auditlog.service import safe_log_audit_event
+from analyses.profiling import delete_profile_artifacts
 from sources.serializers import SourceSerializer, SourceUploadSerializer
 from sources.models import Source
-from sources.storage import get_source_upload_storage
+from sources.storage import get_source_upload_storage, release_source_upload
 
 
 class SourceListCreateView(generics.GenericAPIView):
@@ -49,15 +50,19 @@ class SourceDetailView(generics.RetrieveDestroyAPIView):
         source_type = instance.type
         source_name = instance.name
 
+        profile_keys = list(
+            instance.analyses.exclude(profile_object_key="").values_list("profile_object_key", flat=True)
+        )
+        instance.delete()
+        delete_profile_artifacts(profile_keys)
+
         storage = get_source_upload_storage()
-        if instance.type == Source.SourceType.UPLOAD and instance.file_object_key:
+        if source_type == Source.SourceType.UPLOAD and instance.file_object_key:
             try:
-                storage.delete_upload(instance.file_object_key)
+                release_source_upload(storage, instance)
             except (ImproperlyConfigured, NotImplementedError):
                 # File deletion is best-effort for non-local storage placeholders.
                 pass
-
-        instance.delete()
         safe_log_audit_event(
             owner_id=owner_id,
             actor_id=self.request.user.id if self.request.user.is_authenticated else None,
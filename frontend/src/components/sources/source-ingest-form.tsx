@@ -133,7 +133,7 @@ export function SourceIngestForm() {
               <input
                 className="mt-1 block w-full rounded-lg border border-input bg-background px-3 py-2 text-sm text-foreground file:mr-3 file:rounded-md file:border-0 file:bg-muted file:px-3 file:py-1 file:text-sm file:text-foreground"
                 type="file"
-                accept=".log,.txt,.jsonl,.gz"
+                accept=".log,.txt,.jsonl,.gz,.bz2,.xz,.zst,.zstd"
                 onChange={(event) => setSelectedFile(event.target.files?.[0] || null)}
               />
             </label>